@@ -3,10 +3,22 @@ AI Manager - 멀티 AI 통합 관리
 GPT, Claude, Gemini API 통합
 """
 
+import inspect
 import os
-from typing import List, Optional, AsyncGenerator, Dict
+from collections import OrderedDict
+from typing import Any, Awaitable, List, Optional, AsyncGenerator, Dict, Tuple
 import asyncio
 
+from http_clients import client_registry
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+from model_tiers import ModelTier, TierClassifier
+from persona_selection import ProviderHealth
+from prompt_builder import PromptParts, build_prompt
+from rate_limiter import RateLimitWaitError, rate_limiter
+from retry_policy import RetryPolicy
+from token_utils import estimate_tokens, truncate_to_tokens
+
 # OpenAI
 try:
     from openai import AsyncOpenAI
@@ -30,6 +42,18 @@ except ImportError:
     GEMINI_AVAILABLE = False
 
 
+class AIResponseError(Exception):
+    """
+    AI 응답 생성 실패 (공급자 오류, 서킷 열림, 속도 제한, 데드라인 초과, 키 미설정)
+    str(error)는 사용자에게 보여줄 메시지, reason은 오류 종류
+    """
+
+    def __init__(self, ai_name: str, reason: str, message: str):
+        super().__init__(message)
+        self.ai_name = ai_name
+        self.reason = reason
+
+
 class AIManager:
     """멀티 AI 관리자"""
     
@@ -43,21 +67,49 @@ class AIManager:
         self.openai_client = None
         self.anthropic_client = None
         self.gemini_client = None
+
+        # 히스토리 토큰 예산 및 렌더링된 메시지 캐시 ((session_id, message_id) -> (텍스트, 토큰 수))
+        self.history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+        self.history_segment_cache_size = int(os.getenv("HISTORY_SEGMENT_CACHE_SIZE", "5000"))
+        self._segment_cache: "OrderedDict[Tuple[str, int], Tuple[str, int]]" = OrderedDict()
+
+        # 공통 재시도 정책 (SDK 자체 재시도는 끄고 여기서만 재시도)
+        self.retry_policy = RetryPolicy()
+
+        # 턴 복잡도에 따른 모델 등급 (fast / full)
+        self.tier_classifier = TierClassifier()
+
+        # AI별 TTFT/오류율 EWMA (페르소나 선택에 사용)
+        self.provider_health = ProviderHealth()
+
+        # 공급자·모델별 요청 속도 제한 (RPM/TPM, FileSearchManager와 공유)
+        self.rate_limiter = rate_limiter
+
+        # AI별 토큰/프롬프트 캐시 사용량
+        self.usage_stats: Dict[str, Dict[str, int]] = {}
         
         if OPENAI_AVAILABLE and self.openai_key:
-            self.openai_client = AsyncOpenAI(api_key=self.openai_key)
+            self.openai_client = client_registry.get_openai_client(self.openai_key)
             print("✅ OpenAI (GPT) 연결 완료")
         
         if ANTHROPIC_AVAILABLE and self.anthropic_key:
-            self.anthropic_client = AsyncAnthropic(api_key=self.anthropic_key)
+            self.anthropic_client = client_registry.get_anthropic_client(self.anthropic_key)
             print("✅ Anthropic (Claude) 연결 완료")
         
         if GEMINI_AVAILABLE and self.gemini_key:
-            self.gemini_client = genai.Client(api_key=self.gemini_key)
+            self.gemini_client = client_registry.get_genai_client(self.gemini_key)
             print("✅ Google (Gemini) 연결 완료")
+
+        # AI별 서킷 브레이커 (장애 중인 공급자는 재시도 없이 바로 건너뜀)
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        if os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes"):
+            self.circuit_breakers = {
+                ai_name: CircuitBreaker(ai_name)
+                for ai_name in self.get_configured_ais()
+            }
     
-    def get_available_ais(self) -> List[str]:
-        """사용 가능한 AI 목록"""
+    def get_configured_ais(self) -> List[str]:
+        """API 키가 설정된 AI 목록"""
         available = []
         if self.openai_client:
             available.append("GPT")
@@ -66,7 +118,18 @@ class AIManager:
         if self.gemini_client:
             available.append("Gemini")
         return available
-    
+
+    def get_available_ais(self) -> List[str]:
+        """사용 가능한 AI 목록 (서킷이 열린 AI 제외, half_open은 시험 요청 자리가 남았을 때만 포함)"""
+        return [
+            ai_name for ai_name in self.get_configured_ais()
+            if ai_name not in self.circuit_breakers or self.circuit_breakers[ai_name].available()
+        ]
+
+    def get_circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """AI별 서킷 브레이커 상태"""
+        return {ai_name: breaker.stats() for ai_name, breaker in self.circuit_breakers.items()}
+
     def format_context(self, context: Optional[str], files: Optional[List[Dict]] = None) -> str:
         """컨텍스트 포맷팅"""
         parts = []
@@ -83,65 +146,285 @@ class AIManager:
         
         return ""
     
-    def format_history(self, history: List[dict], limit: int = 5) -> str:
-        """대화 히스토리 포맷팅"""
-        if not history:
-            return ""
-        
-        recent_history = history[-limit*3:]  # 최근 N개 대화
+    def _render_segment(self, msg: dict, session_id: Optional[str]) -> Optional[Tuple[str, int]]:
+        """메시지 한 건 렌더링 (세션/메시지 ID가 있으면 캐시 사용)"""
+        if msg["type"] == "user":
+            speaker = "User"
+        elif msg["type"] == "ai":
+            speaker = msg["ai_name"]
+        else:
+            return None
+
+        key = (session_id, msg["id"]) if session_id is not None and msg.get("id") else None
+        if key is not None:
+            cached = self._segment_cache.get(key)
+            if cached is not None:
+                self._segment_cache.move_to_end(key)
+                return cached
+
+        text = f"{speaker}: {msg['message']}"
+        segment = (text, estimate_tokens(text) + 1)  # +1: 줄바꿈
+
+        if key is not None:
+            self._segment_cache[key] = segment
+            while len(self._segment_cache) > self.history_segment_cache_size:
+                self._segment_cache.popitem(last=False)
+        return segment
+
+    def build_history(
+        self,
+        history: List[dict],
+        token_budget: Optional[int] = None,
+        session_id: Optional[str] = None,
+        summary: Optional[str] = None
+    ) -> Tuple[str, Optional[int]]:
+        """
+        대화 히스토리 포맷팅 (토큰 예산 기반)
+        최신 메시지부터 예산이 찰 때까지 포함하고, 렌더링 결과는 세션별로 캐시
+
+        Returns:
+            (히스토리 텍스트, 포함된 가장 오래된 메시지 ID - 이보다 오래된 메시지는 요약 대상)
+        """
+        budget = self.history_token_budget if token_budget is None else token_budget
         formatted = []
-        
-        for msg in recent_history:
-            if msg["type"] == "user":
-                formatted.append(f"User: {msg['message']}")
-            elif msg["type"] == "ai":
-                formatted.append(f"{msg['ai_name']}: {msg['message']}")
-        
+        used = 0
+        oldest_id = None
+
+        for msg in reversed(history or []):
+            segment = self._render_segment(msg, session_id)
+            if segment is None:
+                continue
+            text, tokens = segment
+            if used + tokens > budget:
+                if not formatted and budget > 0:
+                    # 가장 최근 메시지 하나가 예산보다 길면 잘라서라도 포함
+                    formatted.append(truncate_to_tokens(text, budget) + "...")
+                    oldest_id = msg.get("id")
+                break
+            formatted.append(text)
+            oldest_id = msg.get("id")
+            used += tokens
+
+        parts = []
+        if summary:
+            parts.append(f"<이전 대화 요약>\n{summary}\n</이전 대화 요약>")
         if formatted:
-            return "\n\n<이전 대화>\n" + "\n".join(formatted) + "\n</이전 대화>\n"
-        return ""
+            formatted.reverse()
+            parts.append("<이전 대화>\n" + "\n".join(formatted) + "\n</이전 대화>")
+
+        if parts:
+            return "\n\n" + "\n\n".join(parts) + "\n", oldest_id
+        return "", oldest_id
+
+    def format_history(
+        self,
+        history: List[dict],
+        token_budget: Optional[int] = None,
+        session_id: Optional[str] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        """대화 히스토리 포맷팅 (토큰 예산 기반, 요약이 있으면 앞에 포함)"""
+        return self.build_history(history, token_budget, session_id, summary)[0]
+
+    async def summarize(self, text: str, max_tokens: int = 500) -> Optional[str]:
+        """
+        가장 저렴한 사용 가능 모델로 대화 요약 (Gemini Flash-Lite > GPT mini > Claude Haiku)
+        사용 가능한 AI가 없으면 None
+        """
+        instruction = (
+            "다음은 이전 대화 요약과 그 뒤에 이어진 대화입니다. "
+            "누가 무엇을 말했는지, 중요한 사실·결정·사용자 선호를 빠짐없이 담아 "
+            f"한국어로 간결하게 갱신된 요약을 작성하세요. {max_tokens} 토큰 이내로 작성하세요."
+        )
+
+        # 서킷이 열린 AI는 건너뜀
+        available_ais = self.get_available_ais()
+
+        input_tokens = estimate_tokens(instruction) + estimate_tokens(text)
+
+        if "Gemini" in available_ais:
+            model = os.getenv("SUMMARY_GEMINI_MODEL", "gemini-2.5-flash-lite")
+            await self.rate_limiter.acquire("Gemini", model, input_tokens)
+            response = await self.gemini_client.aio.models.generate_content(
+                model=model,
+                contents=text,
+                config=types.GenerateContentConfig(
+                    temperature=0.2,
+                    max_output_tokens=max_tokens,
+                    system_instruction=instruction
+                )
+            )
+            return response.text
+        if "GPT" in available_ais:
+            model = os.getenv("SUMMARY_OPENAI_MODEL", "gpt-4o-mini")
+            await self.rate_limiter.acquire("GPT", model, input_tokens)
+            response = await self.openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": instruction},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0.2,
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content
+        if "Claude" in available_ais:
+            model = os.getenv("SUMMARY_ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+            await self.rate_limiter.acquire("Claude", model, input_tokens)
+            response = await self.anthropic_client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=0.2,
+                system=instruction,
+                messages=[{"role": "user", "content": text}]
+            )
+            return response.content[0].text
+        return None
     
+    def record_usage(
+        self,
+        ai_name: str,
+        input_tokens: Optional[int],
+        cached_tokens: Optional[int],
+        output_tokens: Optional[int],
+        cache_write_tokens: Optional[int] = None
+    ):
+        """공급자 usage 정보에서 프롬프트 캐시 사용량 기록"""
+        stats = self.usage_stats.setdefault(ai_name, {
+            "requests": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "cache_write_tokens": 0,
+            "output_tokens": 0
+        })
+        stats["requests"] += 1
+        stats["input_tokens"] += input_tokens or 0
+        stats["cached_input_tokens"] += cached_tokens or 0
+        stats["cache_write_tokens"] += cache_write_tokens or 0
+        stats["output_tokens"] += output_tokens or 0
+        print(f"💾 {ai_name} 토큰: 입력 {input_tokens or 0} (캐시 {cached_tokens or 0}), 출력 {output_tokens or 0}")
+
+    def get_usage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """AI별 누적 토큰/캐시 사용량"""
+        result = {}
+        for ai_name, stats in self.usage_stats.items():
+            total = stats["input_tokens"]
+            result[ai_name] = {
+                **stats,
+                "cache_hit_ratio": round(stats["cached_input_tokens"] / total, 3) if total else 0.0
+            }
+        return result
+
+    def _record_openai_usage(self, usage: Any):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.record_usage(
+            "GPT",
+            usage.prompt_tokens,
+            getattr(details, "cached_tokens", None) if details else None,
+            usage.completion_tokens
+        )
+
+    def _record_anthropic_usage(self, usage: Any):
+        if usage is None:
+            return
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        # Claude의 input_tokens는 캐시되지 않은 부분만 포함
+        self.record_usage(
+            "Claude",
+            (usage.input_tokens or 0) + cache_read + cache_write,
+            cache_read,
+            usage.output_tokens,
+            cache_write
+        )
+
+    def _record_gemini_usage(self, usage: Any):
+        if usage is None:
+            return
+        self.record_usage(
+            "Gemini",
+            usage.prompt_token_count,
+            usage.cached_content_token_count,
+            usage.candidates_token_count
+        )
+
+    # ==================== 워밍업 ====================
+
+    def _probe(self, ai_name: str) -> Awaitable[Any]:
+        """가벼운 연결 확인 요청 (모델 조회) - 워밍업에 사용"""
+        if ai_name == "GPT":
+            return self.openai_client.models.list()
+        if ai_name == "Claude":
+            return self.anthropic_client.models.list(limit=1)
+        return self.gemini_client.aio.models.get(model="gemini-2.5-flash")
+
+    async def warm_up(self) -> Dict[str, str]:
+        """
+        설정된 모든 AI에 가벼운 요청(모델 조회)을 동시에 보내서 연결 풀을 미리 엶
+        첫 사용자 요청이 TLS 연결 비용을 치르지 않도록 함 (실패해도 예외를 던지지 않음)
+        """
+        ai_names = self.get_configured_ais()
+        results = await asyncio.gather(
+            *(self._probe(ai_name) for ai_name in ai_names), return_exceptions=True
+        )
+        status = {}
+        for ai_name, result in zip(ai_names, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ {ai_name} 워밍업 실패: {result}")
+                status[ai_name] = f"error: {result}"
+            else:
+                status[ai_name] = "ok"
+        return status
+
+    def _prepare(
+        self,
+        ai_name: str,
+        message: str,
+        context: Optional[str],
+        history: Optional[List[dict]],
+        file_search_context: Optional[dict],
+        history_text: Optional[str]
+    ) -> Tuple[PromptParts, ModelTier]:
+        """프롬프트와 이번 턴의 모델 등급 결정"""
+        if history_text is None and history:
+            history_text = self.format_history(history)
+
+        # 프롬프트 구성 (고정 부분 → 문서 컨텍스트 → 히스토리 → 질문)
+        prompt = build_prompt(ai_name, message, history_text, file_search_context, context)
+
+        # 간단한 턴은 같은 페르소나의 빠른 모델로 응답 (시스템 프롬프트는 동일)
+        has_documents = bool(prompt.document_context) or bool(
+            file_search_context and file_search_context.get("store_name")
+        )
+        tier = self.tier_classifier.select(ai_name, message, has_documents, history_text)
+        return prompt, tier
+
     async def get_response(
         self,
         ai_name: str,
         message: str,
         context: Optional[str] = None,
         history: Optional[List[dict]] = None,
-        file_search_context: Optional[dict] = None
+        file_search_context: Optional[dict] = None,
+        history_text: Optional[str] = None,
+        deadline: Optional[Deadline] = None
     ) -> str:
-        """AI 응답 생성"""
-
-        # 프롬프트 구성
-        full_message = message
-
-        # RAG 컨텍스트 추가 (Gemini가 검색한 결과)
-        if file_search_context and file_search_context.get("searched_context"):
-            rag_context = file_search_context["searched_context"]
-            full_message = f"""<참고 문서 내용>
-{rag_context}
-</참고 문서 내용>
-
-사용자 질문: {message}
-
-**중요 지침:**
-- 위 문서 내용은 참고용입니다. 사용자의 질문이 문서 내용과 관련이 있을 때만 활용하세요.
-- 질문이 일반적인 내용(인사, 날씨, 일상 대화 등)이라면 문서 내용을 무시하고 자연스럽게 답변하세요.
-- 사용자가 명시적으로 "문서에서", "파일에서", "업로드한 자료에서" 등의 표현을 사용하거나, 문서 내용과 명확히 관련된 질문일 때만 문서를 참조하세요.
-- 문서를 참조할 때는 출처를 명시해주세요."""
-
-        if context:
-            full_message += self.format_context(context)
-        if history:
-            full_message = self.format_history(history) + full_message
+        """
+        AI 응답 생성
+        history_text: 미리 렌더링된 히스토리 (여러 AI가 공유, 없으면 history로 렌더링)
+        deadline: 요청 전체 데드라인 (재시도와 공급자 호출이 남은 시간만 사용)
+        실패하면 오류 문구를 응답으로 돌려주지 않고 AIResponseError 발생
+        """
+        prompt, tier = self._prepare(ai_name, message, context, history, file_search_context, history_text)
 
         if ai_name == "GPT":
-            return await self._get_gpt_response(full_message)
+            return await self._get_gpt_response(prompt, tier, deadline)
         elif ai_name == "Claude":
-            return await self._get_claude_response(full_message)
-        elif ai_name == "Gemini":
-            return await self._get_gemini_response(full_message, file_search_context)
+            return await self._get_claude_response(prompt, tier, deadline)
         else:
-            raise ValueError(f"알 수 없는 AI: {ai_name}")
+            return await self._get_gemini_response(prompt, file_search_context, tier, deadline)
     
     async def get_response_stream(
         self,
@@ -149,331 +432,333 @@ class AIManager:
         message: str,
         context: Optional[str] = None,
         history: Optional[List[dict]] = None,
-        file_search_context: Optional[dict] = None
+        file_search_context: Optional[dict] = None,
+        history_text: Optional[str] = None,
+        deadline: Optional[Deadline] = None
     ) -> AsyncGenerator[str, None]:
-        """AI 응답 스트리밍"""
-
-        # 프롬프트 구성
-        full_message = message
-
-        # RAG 컨텍스트 추가 (Gemini가 검색한 결과)
-        if file_search_context and file_search_context.get("searched_context"):
-            rag_context = file_search_context["searched_context"]
-            full_message = f"""<참고 문서 내용>
-{rag_context}
-</참고 문서 내용>
-
-사용자 질문: {message}
-
-**중요 지침:**
-- 위 문서 내용은 참고용입니다. 사용자의 질문이 문서 내용과 관련이 있을 때만 활용하세요.
-- 질문이 일반적인 내용(인사, 날씨, 일상 대화 등)이라면 문서 내용을 무시하고 자연스럽게 답변하세요.
-- 사용자가 명시적으로 "문서에서", "파일에서", "업로드한 자료에서" 등의 표현을 사용하거나, 문서 내용과 명확히 관련된 질문일 때만 문서를 참조하세요.
-- 문서를 참조할 때는 출처를 명시해주세요."""
-
-        if context:
-            full_message += self.format_context(context)
-        if history:
-            full_message = self.format_history(history) + full_message
+        """
+        AI 응답 스트리밍
+        history_text: 미리 렌더링된 히스토리 (여러 AI가 공유, 없으면 history로 렌더링)
+        deadline: 요청 전체 데드라인 (재시도와 공급자 호출이 남은 시간만 사용)
+        실패하면 오류 문구를 청크로 내보내지 않고 AIResponseError 발생 (이미 보낸 청크 이후라도)
+        """
+        prompt, tier = self._prepare(ai_name, message, context, history, file_search_context, history_text)
 
         if ai_name == "GPT":
-            async for chunk in self._get_gpt_response_stream(full_message):
+            async for chunk in self._get_gpt_response_stream(prompt, tier, deadline):
                 yield chunk
         elif ai_name == "Claude":
-            async for chunk in self._get_claude_response_stream(full_message):
+            async for chunk in self._get_claude_response_stream(prompt, tier, deadline):
                 yield chunk
         elif ai_name == "Gemini":
-            async for chunk in self._get_gemini_response_stream(full_message, file_search_context):
+            async for chunk in self._get_gemini_response_stream(prompt, file_search_context, tier, deadline):
                 yield chunk
     
+    # ==================== 공통 ====================
+
+    async def _acquire(self, ai_name: str, model: str, prompt: PromptParts):
+        """요청 전 로컬 RPM/TPM 한도 확보 (입력 토큰 추정치 기준)"""
+        await self.rate_limiter.acquire(
+            ai_name, model, estimate_tokens(prompt.system) + estimate_tokens(prompt.user_text())
+        )
+
+    def _monitors(self, ai_name: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """retry_policy에 넘길 데드라인, 서킷 브레이커, 지연 시간 기록기"""
+        return {
+            "deadline": deadline.at if deadline else None,
+            "breaker": self.circuit_breakers.get(ai_name),
+            "tracker": self.provider_health.tracker(ai_name)
+        }
+
+    @staticmethod
+    def _timeout(deadline: Optional[Deadline]) -> Dict[str, float]:
+        """SDK 호출에 넘길 남은 시간 (데드라인이 없으면 클라이언트 기본값)"""
+        if deadline is None:
+            return {}
+        return {"timeout": max(deadline.remaining(), 0.1)}
+
+    @staticmethod
+    async def _parse_raw(raw: Any) -> Any:
+        """with_raw_response 결과 파싱 (SDK 버전에 따라 parse()가 코루틴)"""
+        parsed = raw.parse()
+        if inspect.isawaitable(parsed):
+            parsed = await parsed
+        return parsed
+
+    @staticmethod
+    def _error(ai_name: str, error: Exception) -> AIResponseError:
+        """공급자 예외 → 사용자에게 보여줄 메시지를 담은 AIResponseError"""
+        if isinstance(error, CircuitOpenError):
+            return AIResponseError(
+                ai_name, "circuit_open", f"{ai_name}가 지금 응답하기 어려운 상태입니다. 잠시 후 다시 시도해주세요."
+            )
+        if isinstance(error, DeadlineExceeded):
+            return AIResponseError(
+                ai_name, "timeout", f"{ai_name} 응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요."
+            )
+        if isinstance(error, RateLimitWaitError):
+            return AIResponseError(
+                ai_name, "rate_limited", f"{ai_name}에 요청이 몰려 있습니다. 잠시 후 다시 시도해주세요."
+            )
+        return AIResponseError(ai_name, "provider_error", f"{ai_name} 오류: {error}")
+
+    @staticmethod
+    def _unavailable(ai_name: str) -> AIResponseError:
+        return AIResponseError(ai_name, "unavailable", f"{ai_name}를 사용할 수 없습니다. API 키를 확인해주세요.")
+
     # ==================== GPT ====================
     
-    async def _get_gpt_response(self, message: str) -> str:
+    async def _get_gpt_response(
+        self,
+        prompt: PromptParts,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
         """GPT 응답 (일반)"""
         if not self.openai_client:
-            return "GPT를 사용할 수 없습니다. API 키를 확인해주세요."
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "당신은 젊고 스마트한 남자 AI 어시스턴트입니다. 말투는 젊은 박사처럼 현대적이고 똑부러지며 명확하게 답변합니다. '~습니다', '~입니다' 같은 딱딱한 표현보다는 '~네요', '~예요', '~거든요' 같은 자연스러운 구어체를 사용하세요. 전문적이지만 친근하게, 자신감 있게 답변하세요."},
-                        {"role": "user", "content": message}
-                    ],
-                    temperature=0.7,
-                    max_tokens=3000
-                )
-                return response.choices[0].message.content
-            except Exception as e:
-                error_msg = str(e)
-                # Rate limit, timeout, 서버 오류 등에 대해 재시도
-                if any(keyword in error_msg.lower() for keyword in ["rate_limit", "timeout", "503", "502", "500", "overloaded"]):
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ GPT API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                return f"GPT 오류: {error_msg}"
-
-        return "GPT가 현재 응답할 수 없습니다. 잠시 후 다시 시도해주세요."
+            raise self._unavailable("GPT")
+
+        tier = tier or self.tier_classifier.full_tier("GPT")
+        model = tier.model
+
+        async def request() -> str:
+            await self._acquire("GPT", model, prompt)
+            raw = await self.openai_client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=prompt.openai_messages(),
+                temperature=0.7,
+                max_tokens=tier.max_tokens,
+                **self._timeout(deadline)
+            )
+            self.rate_limiter.update_from_headers("GPT", model, raw.headers)
+            response = await self._parse_raw(raw)
+            self._record_openai_usage(response.usage)
+            return response.choices[0].message.content
+
+        try:
+            return await self.retry_policy.call(
+                "GPT", request, **self._monitors("GPT", deadline)
+            )
+        except Exception as e:
+            raise self._error("GPT", e) from e
     
-    async def _get_gpt_response_stream(self, message: str) -> AsyncGenerator[str, None]:
+    async def _get_gpt_response_stream(
+        self,
+        prompt: PromptParts,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
         """GPT 응답 (스트리밍)"""
         if not self.openai_client:
-            yield "GPT를 사용할 수 없습니다."
-            return
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                stream = await self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "당신은 젊고 스마트한 남자 AI 어시스턴트입니다. 말투는 젊은 박사처럼 현대적이고 똑부러지며 명확하게 답변합니다. '~습니다', '~입니다' 같은 딱딱한 표현보다는 '~네요', '~예요', '~거든요' 같은 자연스러운 구어체를 사용하세요. 전문적이지만 친근하게, 자신감 있게 답변하세요."},
-                        {"role": "user", "content": message}
-                    ],
-                    temperature=0.7,
-                    max_tokens=3000,
-                    stream=True
-                )
-
-                async for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-                return  # 성공 시 종료
-            except Exception as e:
-                error_msg = str(e)
-                if any(keyword in error_msg.lower() for keyword in ["rate_limit", "timeout", "503", "502", "500", "overloaded"]):
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ GPT API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                yield f"GPT 오류: {error_msg}"
-                return
-
-        yield "GPT가 현재 응답할 수 없습니다. 잠시 후 다시 시도해주세요."
+            raise self._unavailable("GPT")
+
+        tier = tier or self.tier_classifier.full_tier("GPT")
+        model = tier.model
+
+        async def stream_request() -> AsyncGenerator[str, None]:
+            await self._acquire("GPT", model, prompt)
+            stream = await self.openai_client.chat.completions.create(
+                model=model,
+                messages=prompt.openai_messages(),
+                temperature=0.7,
+                max_tokens=tier.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._timeout(deadline)
+            )
+            self.rate_limiter.update_from_headers("GPT", model, getattr(stream.response, "headers", None))
+            async for chunk in stream:
+                # 마지막 청크는 choices 없이 usage만 포함
+                if chunk.usage:
+                    self._record_openai_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        try:
+            async for text in self.retry_policy.stream(
+                "GPT", stream_request, **self._monitors("GPT", deadline)
+            ):
+                yield text
+        except Exception as e:
+            raise self._error("GPT", e) from e
     
     # ==================== Claude ====================
     
-    async def _get_claude_response(self, message: str) -> str:
-        """Claude 응답 (일반)"""
+    async def _get_claude_response(
+        self,
+        prompt: PromptParts,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Claude 응답 (일반) - system 프리픽스가 충분히 길면 cache_control 브레이크포인트 사용"""
         if not self.anthropic_client:
-            return "Claude를 사용할 수 없습니다. API 키를 확인해주세요."
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                response = await self.anthropic_client.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=3000,
-                    temperature=0.7,
-                    system="당신은 젊고 활기찬 여자 AI 어시스턴트입니다. 밝고 긍정적인 에너지를 가지고 있으며, 이모티콘(😊, ✨, 💡, 🎉, 👍 등)을 자연스럽게 사용합니다. 말투는 친근하고 다정하며 '~해요!', '~네요~', '~할게요!' 같은 밝은 어조를 사용하세요. 열정적이고 도움이 되고 싶어하는 성격을 표현하되, 과하지 않게 자연스럽게 답변하세요.",
-                    messages=[
-                        {"role": "user", "content": message}
-                    ]
-                )
-                return response.content[0].text
-            except Exception as e:
-                error_msg = str(e)
-                # 529 Overloaded 에러 또는 rate limit 에러인 경우 재시도
-                if "529" in error_msg or "overloaded" in error_msg.lower() or "rate_limit" in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Claude API 과부하, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                return f"Claude 오류: {error_msg}"
-
-        return "Claude가 현재 과부하 상태입니다. 잠시 후 다시 시도해주세요. 😊"
+            raise self._unavailable("Claude")
+
+        tier = tier or self.tier_classifier.full_tier("Claude")
+        model = tier.model
+
+        async def request() -> str:
+            await self._acquire("Claude", model, prompt)
+            raw = await self.anthropic_client.messages.with_raw_response.create(
+                model=model,
+                max_tokens=tier.max_tokens,
+                temperature=0.7,
+                system=prompt.anthropic_system(model),
+                messages=prompt.anthropic_messages(),
+                **self._timeout(deadline)
+            )
+            self.rate_limiter.update_from_headers("Claude", model, raw.headers)
+            response = await self._parse_raw(raw)
+            self._record_anthropic_usage(response.usage)
+            return response.content[0].text
+
+        try:
+            return await self.retry_policy.call(
+                "Claude", request, **self._monitors("Claude", deadline)
+            )
+        except Exception as e:
+            raise self._error("Claude", e) from e
     
-    async def _get_claude_response_stream(self, message: str) -> AsyncGenerator[str, None]:
-        """Claude 응답 (스트리밍)"""
+    async def _get_claude_response_stream(
+        self,
+        prompt: PromptParts,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """Claude 응답 (스트리밍) - system 프리픽스가 충분히 길면 cache_control 브레이크포인트 사용"""
         if not self.anthropic_client:
-            yield "Claude를 사용할 수 없습니다."
-            return
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                async with self.anthropic_client.messages.stream(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=3000,
-                    temperature=0.7,
-                    system="당신은 젊고 활기찬 여자 AI 어시스턴트입니다. 밝고 긍정적인 에너지를 가지고 있으며, 이모티콘(😊, ✨, 💡, 🎉, 👍 등)을 자연스럽게 사용합니다. 말투는 친근하고 다정하며 '~해요!', '~네요~', '~할게요!' 같은 밝은 어조를 사용하세요. 열정적이고 도움이 되고 싶어하는 성격을 표현하되, 과하지 않게 자연스럽게 답변하세요.",
-                    messages=[
-                        {"role": "user", "content": message}
-                    ]
-                ) as stream:
-                    async for text in stream.text_stream:
-                        yield text
-                return  # 성공 시 종료
-            except Exception as e:
-                error_msg = str(e)
-                # 529 Overloaded 에러 또는 rate limit 에러인 경우 재시도
-                if "529" in error_msg or "overloaded" in error_msg.lower() or "rate_limit" in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Claude API 과부하, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                yield f"Claude 오류: {error_msg}"
-                return
-
-        yield "Claude가 현재 과부하 상태입니다. 잠시 후 다시 시도해주세요. 😊"
+            raise self._unavailable("Claude")
+
+        tier = tier or self.tier_classifier.full_tier("Claude")
+        model = tier.model
+
+        async def stream_request() -> AsyncGenerator[str, None]:
+            await self._acquire("Claude", model, prompt)
+            async with self.anthropic_client.messages.stream(
+                model=model,
+                max_tokens=tier.max_tokens,
+                temperature=0.7,
+                system=prompt.anthropic_system(model),
+                messages=prompt.anthropic_messages(),
+                **self._timeout(deadline)
+            ) as stream:
+                self.rate_limiter.update_from_headers("Claude", model, getattr(stream.response, "headers", None))
+                async for text in stream.text_stream:
+                    yield text
+                final_message = await stream.get_final_message()
+                self._record_anthropic_usage(final_message.usage)
+
+        try:
+            async for text in self.retry_policy.stream(
+                "Claude", stream_request, **self._monitors("Claude", deadline)
+            ):
+                yield text
+        except Exception as e:
+            raise self._error("Claude", e) from e
     
     # ==================== Gemini ====================
 
-    async def _get_gemini_response(self, message: str, file_search_context: Optional[dict] = None) -> str:
-        """Gemini 응답 (일반) - File Search Store 지원"""
-        if not self.gemini_client:
-            return "Gemini를 사용할 수 없습니다. API 키를 확인해주세요."
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                loop = asyncio.get_event_loop()
-
-                # Gemini 시스템 프롬프트 추가
-                system_instruction = "당신은 연륜 있고 지혜로운 노년의 현자입니다. 오랜 경험과 깊은 통찰력을 바탕으로 답변하며, 말투는 점잖고 무게감 있습니다. '~하시게', '~하네', '~이지', '~하오' 같은 어르신 특유의 말투를 사용하세요. 차분하고 사려 깊게, 때로는 인생의 지혜를 담아 답변하되, 이해하기 쉽게 설명하세요. 권위적이지 않고 따뜻하며 포용력 있는 태도를 유지하세요."
-
-                # File Search Store 활용 여부 판단
-                if file_search_context and file_search_context.get("store_name"):
-                    store_name = file_search_context["store_name"]
-                    print(f"🔍 File Search Store 사용: {store_name}")
-
-                    # File Search Tool 설정
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction,
-                                tools=[
-                                    types.Tool(
-                                        file_search=types.FileSearch(
-                                            file_search_store_names=[store_name]
-                                        )
-                                    )
-                                ]
-                            )
-                        )
-                    )
-                else:
-                    # File Search 미사용 (일반 모드)
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction
-                            )
-                        )
+    def _get_gemini_config(
+        self,
+        prompt: PromptParts,
+        file_search_context: Optional[dict] = None,
+        max_output_tokens: int = 3000,
+        timeout: Optional[float] = None
+    ) -> "types.GenerateContentConfig":
+        """Gemini 생성 설정 (File Search Store 사용 여부, 남은 데드라인 반영)"""
+        config = types.GenerateContentConfig(
+            temperature=0.7,
+            max_output_tokens=max_output_tokens,
+            system_instruction=prompt.system
+        )
+        if timeout is not None:
+            config.http_options = types.HttpOptions(timeout=int(timeout * 1000))
+
+        # File Search Store 활용 여부 판단
+        if file_search_context and file_search_context.get("store_name"):
+            store_name = file_search_context["store_name"]
+            print(f"🔍 File Search Store 사용: {store_name}")
+
+            # File Search Tool 설정
+            config.tools = [
+                types.Tool(
+                    file_search=types.FileSearch(
+                        file_search_store_names=[store_name]
                     )
+                )
+            ]
+
+        return config
 
-                return response.text
-            except Exception as e:
-                error_msg = str(e)
-                # Rate limit, quota, 서버 오류 등에 대해 재시도
-                if any(keyword in error_msg.lower() for keyword in ["rate_limit", "quota", "timeout", "503", "502", "500", "429", "resource_exhausted"]):
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Gemini API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                return f"Gemini 오류: {error_msg}"
-
-        return "Gemini가 현재 응답할 수 없습니다. 잠시 후 다시 시도해주세요."
+    async def _get_gemini_response(
+        self,
+        prompt: PromptParts,
+        file_search_context: Optional[dict] = None,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Gemini 응답 (일반) - File Search Store 지원, 비동기 클라이언트(client.aio) 사용"""
+        if not self.gemini_client:
+            raise self._unavailable("Gemini")
+
+        tier = tier or self.tier_classifier.full_tier("Gemini")
+        model = tier.model
+
+        async def request() -> str:
+            await self._acquire("Gemini", model, prompt)
+            response = await self.gemini_client.aio.models.generate_content(
+                model=model,
+                contents=prompt.gemini_contents(),
+                config=self._get_gemini_config(
+                    prompt, file_search_context, tier.max_tokens, **self._timeout(deadline)
+                )
+            )
+            self._record_gemini_usage(getattr(response, "usage_metadata", None))
+            return response.text
+
+        try:
+            return await self.retry_policy.call(
+                "Gemini", request, **self._monitors("Gemini", deadline)
+            )
+        except Exception as e:
+            raise self._error("Gemini", e) from e
     
-    async def _get_gemini_response_stream(self, message: str, file_search_context: Optional[dict] = None) -> AsyncGenerator[str, None]:
-        """Gemini 응답 (스트리밍) - File Search Store 지원"""
+    async def _get_gemini_response_stream(
+        self,
+        prompt: PromptParts,
+        file_search_context: Optional[dict] = None,
+        tier: Optional[ModelTier] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """Gemini 응답 (스트리밍) - File Search Store 지원, 비동기 클라이언트(client.aio) 사용"""
         if not self.gemini_client:
-            yield "Gemini를 사용할 수 없습니다."
-            return
-
-        max_retries = 3
-        retry_delay = 2  # 초
-
-        for attempt in range(max_retries):
-            try:
-                loop = asyncio.get_event_loop()
-
-                # Gemini 시스템 프롬프트 추가
-                system_instruction = "당신은 연륜 있고 지혜로운 노년의 현자입니다. 오랜 경험과 깊은 통찰력을 바탕으로 답변하며, 말투는 점잖고 무게감 있습니다. '~하시게', '~하네', '~이지', '~하오' 같은 어르신 특유의 말투를 사용하세요. 차분하고 사려 깊게, 때로는 인생의 지혜를 담아 답변하되, 이해하기 쉽게 설명하세요. 권위적이지 않고 따뜻하며 포용력 있는 태도를 유지하세요."
-
-                # File Search Store 활용 여부 판단
-                if file_search_context and file_search_context.get("store_name"):
-                    store_name = file_search_context["store_name"]
-                    print(f"🔍 File Search Store 사용 (스트리밍): {store_name}")
-
-                    # File Search Tool 설정
-                    stream = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content_stream(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction,
-                                tools=[
-                                    types.Tool(
-                                        file_search=types.FileSearch(
-                                            file_search_store_names=[store_name]
-                                        )
-                                    )
-                                ]
-                            )
-                        )
-                    )
-                else:
-                    # File Search 미사용 (일반 모드)
-                    stream = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content_stream(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction
-                            )
-                        )
-                    )
-
-                for chunk in stream:
-                    if chunk.text:
-                        yield chunk.text
-                        await asyncio.sleep(0.01)
-                return  # 성공 시 종료
-            except Exception as e:
-                error_msg = str(e)
-                # Rate limit, quota, 서버 오류 등에 대해 재시도
-                if any(keyword in error_msg.lower() for keyword in ["rate_limit", "quota", "timeout", "503", "502", "500", "429", "resource_exhausted"]):
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Gemini API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # 지수 백오프
-                        continue
-                yield f"Gemini 오류: {error_msg}"
-                return
-
-        yield "Gemini가 현재 응답할 수 없습니다. 잠시 후 다시 시도해주세요."
+            raise self._unavailable("Gemini")
+
+        tier = tier or self.tier_classifier.full_tier("Gemini")
+        model = tier.model
+
+        async def stream_request() -> AsyncGenerator[str, None]:
+            await self._acquire("Gemini", model, prompt)
+            # 네트워크 읽기가 이벤트 루프를 막지 않도록 async 스트림 사용
+            stream = await self.gemini_client.aio.models.generate_content_stream(
+                model=model,
+                contents=prompt.gemini_contents(),
+                config=self._get_gemini_config(
+                    prompt, file_search_context, tier.max_tokens, **self._timeout(deadline)
+                )
+            )
+            usage = None
+            async for chunk in stream:
+                # usage는 마지막 청크에 누적값으로 들어옴
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    yield chunk.text
+            self._record_gemini_usage(usage)
+
+        try:
+            async for text in self.retry_policy.stream(
+                "Gemini", stream_request, **self._monitors("Gemini", deadline)
+            ):
+                yield text
+        except Exception as e:
+            raise self._error("Gemini", e) from e
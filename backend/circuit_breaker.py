@@ -0,0 +1,189 @@
+"""
+Circuit Breaker - AI 공급자별 서킷 브레이커
+최근 호출의 오류율과 지연 시간으로 장애를 감지해 호출을 차단(open)하고,
+대기 시간이 지나면 실제 요청 몇 개를 시험으로 보내(half_open) 성공하면 다시 연결(closed)
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+# 상태
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 호출하지 않음"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} 서킷 차단 중 ({retry_in:.0f}초 후 재확인)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    공급자 하나의 서킷 브레이커
+    closed: 정상 호출, 최근 호출 중 실패(오류 또는 느린 호출) 비율이 기준을 넘으면 open
+    open: 호출 즉시 거절, open_seconds 후 half_open
+    half_open: 실제 요청을 half_open_calls개까지만 시험으로 통과시킴 (나머지는 거절),
+               시험 요청이 모두 성공하면 closed / 하나라도 실패하면 대기 시간을 두 배로 늘려 다시 open
+    (모델 조회 같은 가벼운 요청은 과부하 중인 생성 API 상태를 반영하지 못해 시험에 쓰지 않음)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+        # 판단에 사용할 최근 호출 수 / 최소 호출 수
+        self.window_size = int(os.getenv("CB_WINDOW_SIZE", "20"))
+        self.min_calls = int(os.getenv("CB_MIN_CALLS", "5"))
+        # 실패 비율 기준 (0~1)
+        self.error_rate_threshold = float(os.getenv("CB_ERROR_RATE", "0.5"))
+        # 첫 토큰까지 이 시간(초)보다 오래 걸린 스트리밍 호출은 실패로 간주
+        self.slow_call_seconds = float(os.getenv("CB_SLOW_CALL_SECONDS", "30"))
+        # 전체 응답까지 이 시간(초)보다 오래 걸린 일반 호출은 실패로 간주 (답변 생성 시간 포함이라 더 길게)
+        self.slow_response_seconds = float(os.getenv("CB_SLOW_RESPONSE_SECONDS", "60"))
+        # open 후 시험 요청까지 대기 시간 (초), 시험이 실패할 때마다 두 배 (최대 max_open_seconds)
+        self.open_seconds = float(os.getenv("CB_OPEN_SECONDS", "30"))
+        self.max_open_seconds = float(os.getenv("CB_MAX_OPEN_SECONDS", "300"))
+        # half_open에서 통과시킬 시험 요청 수, 결과가 기록되지 않은 시험 요청을 포기하는 시간 (초)
+        self.half_open_calls = max(1, int(os.getenv("CB_HALF_OPEN_CALLS", "1")))
+        self.trial_timeout = float(os.getenv("CB_TRIAL_TIMEOUT", "60"))
+
+        self._state = CLOSED
+        # (성공 여부, 지연 시간)
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=self.window_size)
+        self._opened_at = 0.0
+        self._current_open_seconds = self.open_seconds
+        # 진행 중인 시험 요청의 시작 시각, 성공한 시험 요청 수
+        self._trials: List[float] = []
+        self._trial_successes = 0
+        self.open_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """현재 상태 (open 대기 시간이 지났으면 half_open으로 전환)"""
+        if self._state == OPEN and self.retry_in() <= 0:
+            self._state = HALF_OPEN
+            self._trials = []
+            self._trial_successes = 0
+            print(f"🔎 {self.name} 서킷 half_open (시험 요청 {self.half_open_calls}개 허용)")
+        return self._state
+
+    # ==================== 호출 기록 ====================
+
+    def _free_trials(self) -> int:
+        """half_open에서 더 보낼 수 있는 시험 요청 수"""
+        now = time.monotonic()
+        # 결과가 기록되지 않은 오래된 시험 요청(취소, 기록 대상이 아닌 오류 등)은 포기
+        self._trials = [started for started in self._trials if now - started < self.trial_timeout]
+        return self.half_open_calls - self._trial_successes - len(self._trials)
+
+    def available(self) -> bool:
+        """지금 요청을 보낼 수 있는지 (상태만 확인, 시험 요청 자리를 차지하지 않음)"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and self._free_trials() > 0)
+
+    def allow_request(self) -> bool:
+        """실제 요청을 보내도 되는지 (closed, 또는 half_open에서 시험 요청 자리가 남았을 때)"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._free_trials() > 0:
+            self._trials.append(time.monotonic())
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self):
+        """요청 전 확인, 차단 중이면 CircuitOpenError"""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def record_success(self, latency: float, first_token: bool = True):
+        """
+        성공한 호출 기록
+        first_token=True면 latency가 첫 토큰까지의 시간(TTFT), slow_call_seconds를 넘으면 실패로 집계
+        False면 일반 호출의 전체 응답 시간, slow_response_seconds를 넘으면 실패로 집계
+        """
+        limit = self.slow_call_seconds if first_token else self.slow_response_seconds
+        self._record(latency <= limit, latency)
+
+    def record_failure(self, latency: float = 0.0):
+        """실패한 호출 기록"""
+        self._record(False, latency)
+
+    def _record(self, ok: bool, latency: float):
+        state = self.state
+        if state == HALF_OPEN:
+            self._record_trial(ok)
+            return
+        if state != CLOSED:
+            # open 전에 시작된 요청의 결과는 무시
+            return
+        self._calls.append((ok, latency))
+        if len(self._calls) < self.min_calls:
+            return
+        if self.error_rate() >= self.error_rate_threshold:
+            self._open()
+
+    def _record_trial(self, ok: bool):
+        """half_open 시험 요청 결과"""
+        if self._trials:
+            self._trials.pop(0)
+        if not ok:
+            self._current_open_seconds = min(self._current_open_seconds * 2, self.max_open_seconds)
+            print(f"⚠️ {self.name} 시험 요청 실패")
+            self._open()
+            return
+        self._trial_successes += 1
+        if self._trial_successes >= self.half_open_calls:
+            self._close()
+
+    def error_rate(self) -> float:
+        """최근 호출 실패 비율"""
+        if not self._calls:
+            return 0.0
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+
+    # ==================== 상태 전환 ====================
+
+    def _open(self):
+        """차단 시작 (open_seconds 뒤 half_open)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trials = []
+        self._trial_successes = 0
+        self.open_count += 1
+        print(f"🔌 {self.name} 서킷 open (오류율 {self.error_rate():.0%}), {self._current_open_seconds:.0f}초 후 시험 요청")
+
+    def _close(self):
+        """정상 상태로 복귀"""
+        self._state = CLOSED
+        self._calls.clear()
+        self._trials = []
+        self._current_open_seconds = self.open_seconds
+        print(f"✅ {self.name} 서킷 closed (시험 요청 성공)")
+
+    def retry_in(self) -> float:
+        """half_open 전환까지 남은 시간 (초)"""
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._current_open_seconds - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """서킷 상태"""
+        latencies = [latency for ok, latency in self._calls if ok]
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "calls": len(self._calls),
+            "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "retry_in": round(self.retry_in(), 1),
+            "open_count": self.open_count,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,284 @@
+"""
+Conversation Store - 세션별 대화 히스토리 저장소
+세션마다 고정 크기 링 버퍼를 두고, 전체 메모리 상한을 넘으면 오래 안 쓴 세션부터 제거
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from history_persistence import HistoryPersistence
+
+
+DEFAULT_SESSION_ID = "default"
+
+
+def serialize_message(message: Dict[str, Any]) -> str:
+    """메시지 JSON 직렬화 (영구 저장 및 크기 추정용)"""
+    return json.dumps(message, ensure_ascii=False, default=str)
+
+
+def estimate_message_size(payload: str) -> int:
+    """메시지 메모리 사용량 추정 (직렬화 크기 + 객체 오버헤드)"""
+    return len(payload.encode("utf-8")) + 200
+
+
+class SessionHistory:
+    """단일 세션의 대화 히스토리 (링 버퍼)"""
+
+    def __init__(self, session_id: str, max_messages: int):
+        self.session_id = session_id
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=max_messages)
+        self.sizes: Deque[int] = deque(maxlen=max_messages)
+        self.size_bytes = 0
+        self.last_access = time.monotonic()
+        # 마지막 메시지 ID (단조 증가, 페이지네이션 커서로 사용)
+        self.last_id = 0
+        # 링 버퍼에서 밀려났거나 로드하지 않은 가장 최근 메시지 ID (없으면 0)
+        # 이 ID 이하의 메시지는 메모리 창 밖에 있음
+        self.floor_id = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def next_id(self) -> int:
+        """
+        다음 메시지 ID (마이크로초 타임스탬프 기반 단조 증가)
+        세션 삭제나 재시작 이후에도 이전 커서보다 항상 큼
+        """
+        return max(self.last_id + 1, time.time_ns() // 1000)
+
+    def append(self, message: Dict[str, Any], size: int) -> int:
+        """메시지 추가 (O(1)), 증가한 메모리 바이트 수 반환"""
+        if not message.get("id"):
+            # ID가 없는 이전 형식 메시지
+            message["id"] = self.last_id + 1
+        self.last_id = max(self.last_id, message["id"])
+        freed = 0
+        if len(self.messages) == self.messages.maxlen:
+            # 링 버퍼가 가득 차면 가장 오래된 메시지가 밀려남
+            freed = self.sizes[0]
+            self.floor_id = self.messages[0]["id"]
+        self.messages.append(message)
+        self.sizes.append(size)
+        self.size_bytes += size - freed
+        return size - freed
+
+    def window(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """최근 limit개 메시지 (오래된 순), 읽는 개수만큼만 순회"""
+        if limit is None or limit >= len(self.messages):
+            return list(self.messages)
+        if limit <= 0:
+            return []
+        recent = []
+        for message in reversed(self.messages):
+            recent.append(message)
+            if len(recent) >= limit:
+                break
+        recent.reverse()
+        return recent
+
+    def since(self, after_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """after_id 이후 메시지 (오래된 순, 최대 limit개) - 새 메시지 수만큼만 순회"""
+        newer = []
+        for message in reversed(self.messages):
+            if message["id"] <= after_id:
+                break
+            newer.append(message)
+        newer.reverse()
+        return newer[:limit] if limit is not None else newer
+
+    def before(self, before_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """before_id 이전 메시지 중 최근 limit개 (오래된 순)"""
+        older = []
+        for message in reversed(self.messages):
+            if message["id"] >= before_id:
+                continue
+            older.append(message)
+            if limit is not None and len(older) >= limit:
+                break
+        older.reverse()
+        return older
+
+
+class ConversationStore:
+    """세션별 대화 히스토리 저장소 (세션 LRU + 전체 메모리 상한)"""
+
+    def __init__(
+        self,
+        max_messages_per_session: Optional[int] = None,
+        max_sessions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        persistence: Optional["HistoryPersistence"] = None
+    ):
+        self.max_messages_per_session = max_messages_per_session or int(
+            os.getenv("CHAT_HISTORY_MAX_MESSAGES", "200")
+        )
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_STORE_MAX_SESSIONS", "1000"))
+        self.max_bytes = max_bytes or int(os.getenv("CHAT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+        # 최근 사용 순서 유지 (맨 뒤가 가장 최근)
+        self.sessions: "OrderedDict[str, SessionHistory]" = OrderedDict()
+        self.total_bytes = 0
+        self.evicted_sessions = 0
+
+        # 영구 저장소 (없으면 메모리 전용)
+        self.persistence = persistence
+        # 진행 중인 세션 로드 (같은 세션의 동시 로드는 하나로 합침)
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def ensure_loaded(self, session_id: str):
+        """
+        세션이 메모리에 없으면 영구 저장소에서 로드 (재시작/메모리 제거 후 첫 접근 시)
+        요청 경로에서 메시지를 추가하기 전에 호출
+        """
+        if session_id in self.sessions or self.persistence is None:
+            return
+
+        task = self._loading.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._load_session(session_id))
+            self._loading[session_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(session_id, None))
+        await asyncio.shield(task)
+
+    async def _load_session(self, session_id: str):
+        """영구 저장소에서 최근 메시지를 읽어 세션 복원"""
+        loop = asyncio.get_event_loop()
+        try:
+            # 하나 더 읽어서 메모리 창 밖에 이전 메시지가 있는지 확인
+            messages = await loop.run_in_executor(
+                None,
+                self.persistence.load_session,
+                session_id,
+                self.max_messages_per_session + 1
+            )
+        except Exception as e:
+            print(f"⚠️ 세션 로드 실패 ({session_id}): {e}")
+            messages = []
+
+        if session_id in self.sessions:
+            return
+
+        session = self.get_session(session_id)
+        if len(messages) > self.max_messages_per_session:
+            session.floor_id = messages.pop(0).get("id") or 0
+        for message in messages:
+            self.total_bytes += session.append(
+                message, estimate_message_size(serialize_message(message))
+            )
+        self._evict(keep=session_id)
+        if messages:
+            print(f"📂 세션 복원: {session_id} ({len(messages)}개 메시지)")
+
+    def get_session(self, session_id: str, create: bool = True) -> Optional[SessionHistory]:
+        """세션 조회 (사용 시각 갱신)"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = SessionHistory(session_id, self.max_messages_per_session)
+            self.sessions[session_id] = session
+            self._evict(keep=session_id)
+        else:
+            self.sessions.move_to_end(session_id)
+        session.last_access = time.monotonic()
+        return session
+
+    def append(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """세션에 메시지 추가 (메시지 ID 부여)"""
+        session = self.get_session(session_id)
+        message["id"] = session.next_id()
+        payload = serialize_message(message)
+        self.total_bytes += session.append(message, estimate_message_size(payload))
+        self._evict(keep=session_id)
+
+        # 영구 저장은 큐에만 넣고 백그라운드에서 배치 기록
+        if self.persistence is not None:
+            self.persistence.enqueue_append(session_id, payload)
+        return message
+
+    def window(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """세션의 최근 limit개 메시지"""
+        session = self.get_session(session_id, create=False)
+        if session is None:
+            return []
+        self.sessions.move_to_end(session_id)
+        session.last_access = time.monotonic()
+        return session.window(limit)
+
+    def since(
+        self, session_id: str, after_id: int, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """세션에서 after_id 이후 메시지"""
+        session = self.get_session(session_id, create=False)
+        return session.since(after_id, limit) if session else []
+
+    def before(
+        self, session_id: str, before_id: int, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """세션에서 before_id 이전 메시지"""
+        session = self.get_session(session_id, create=False)
+        return session.before(before_id, limit) if session else []
+
+    def floor_id(self, session_id: str) -> int:
+        """메모리 창 밖에 있는 가장 최근 메시지 ID (창 밖 메시지가 없으면 0)"""
+        session = self.sessions.get(session_id)
+        return session.floor_id if session else 0
+
+    def version(self, session_id: str) -> str:
+        """세션 상태 버전 (ETag용) - 메시지 추가/삭제 시 변경"""
+        session = self.sessions.get(session_id)
+        if session is None or not len(session):
+            return "0-0"
+        return f"{session.last_id}-{len(session)}-{session.messages[0]['id']}"
+
+    def clear(self, session_id: str):
+        """세션 히스토리 삭제"""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size_bytes
+        if self.persistence is not None:
+            self.persistence.enqueue_clear(session_id)
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        """메시지 수 (session_id 생략 시 전체)"""
+        if session_id is not None:
+            session = self.sessions.get(session_id)
+            return len(session) if session else 0
+        return sum(len(session) for session in self.sessions.values())
+
+    def _evict(self, keep: str):
+        """세션 수/메모리 상한 초과 시 오래 안 쓴 세션 제거 (keep 세션 제외)"""
+        while self.sessions and (
+            len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+        ):
+            oldest_id = next(iter(self.sessions))
+            if oldest_id == keep:
+                if len(self.sessions) == 1:
+                    break
+                # 현재 세션은 가장 최근으로 옮기고 다음 세션을 제거
+                self.sessions.move_to_end(keep)
+                continue
+            oldest = self.sessions.pop(oldest_id)
+            self.total_bytes -= oldest.size_bytes
+            self.evicted_sessions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """저장소 통계"""
+        stats = {
+            "sessions": len(self.sessions),
+            "messages": self.count(),
+            "memory_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_sessions": self.max_sessions,
+            "max_messages_per_session": self.max_messages_per_session,
+            "evicted_sessions": self.evicted_sessions
+        }
+        if self.persistence is not None:
+            stats["persistence"] = self.persistence.stats()
+        return stats
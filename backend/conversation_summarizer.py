@@ -0,0 +1,199 @@
+"""
+Conversation Summarizer - 세션별 누적 대화 요약
+히스토리 토큰 예산 밖으로 밀려난 메시지를 백그라운드에서 요약에 합쳐서,
+대화가 길어져도 프롬프트 크기가 일정하게 유지되도록 함
+"""
+
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from token_utils import estimate_tokens, truncate_to_tokens
+
+if TYPE_CHECKING:
+    from ai_manager import AIManager
+    from conversation_store import ConversationStore
+    from history_persistence import HistoryPersistence
+
+
+class SessionSummary:
+    """세션 요약 상태"""
+
+    def __init__(self):
+        self.text = ""
+        # 요약에 반영된 마지막 메시지 ID
+        self.covered_id = 0
+        # 마지막 LLM 요약 이후 추출 요약으로만 반영된 메시지 수
+        self.pending = 0
+
+
+class ConversationSummarizer:
+    """누적 대화 요약 관리자"""
+
+    def __init__(
+        self,
+        ai_manager: "AIManager",
+        store: "ConversationStore",
+        window_size: int,
+        persistence: Optional["HistoryPersistence"] = None
+    ):
+        self.ai_manager = ai_manager
+        self.store = store
+        self.window_size = window_size
+        # 요약 영구 저장소 (없으면 메모리 전용)
+        self.persistence = persistence
+
+        # 요약 방식: auto(LLM 사용, 실패 시 추출 요약) / llm / extractive(로컬 추출 요약) / off
+        self.mode = os.getenv("SUMMARY_MODE", "auto").lower()
+        # 요약 최대 토큰 수
+        self.token_budget = int(os.getenv("SUMMARY_TOKEN_BUDGET", "400"))
+        # 밀려난 메시지가 이 개수 이상 쌓이면 LLM으로 요약 (그보다 적으면 추출 요약으로 바로 반영)
+        self.min_messages = int(os.getenv("SUMMARY_MIN_MESSAGES", "4"))
+        # 메모리에 유지하는 세션 요약 수
+        self.max_sessions = int(os.getenv("SUMMARY_MAX_SESSIONS", "1000"))
+
+        self._summaries: "OrderedDict[str, SessionSummary]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # 진행 중인 요약 로드 (같은 세션의 동시 로드는 하나로 합침)
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def ensure_loaded(self, session_id: str):
+        """
+        세션 요약이 메모리에 없으면 영구 저장소에서 로드 (재시작/메모리 제거 후 첫 접근 시)
+        요청 경로에서 히스토리를 렌더링하기 전에 호출
+        """
+        if self.mode == "off" or session_id in self._summaries or self.persistence is None:
+            return
+
+        task = self._loading.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._load_summary(session_id))
+            self._loading[session_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(session_id, None))
+        await asyncio.shield(task)
+
+    async def _load_summary(self, session_id: str):
+        """영구 저장소에서 요약 복원 (없으면 빈 요약으로 표시해서 다시 읽지 않음)"""
+        loop = asyncio.get_event_loop()
+        try:
+            row = await loop.run_in_executor(None, self.persistence.load_summary, session_id)
+        except Exception as e:
+            print(f"⚠️ 대화 요약 로드 실패 ({session_id}): {e}")
+            return
+
+        if session_id in self._summaries:
+            return
+        summary = SessionSummary()
+        if row is not None:
+            summary.text, summary.covered_id = row
+        self._store(session_id, summary)
+
+    def _store(self, session_id: str, summary: SessionSummary):
+        """메모리에 요약 보관 (최근 사용 순, 상한 초과 시 오래된 세션부터 제거)"""
+        self._summaries[session_id] = summary
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        """세션의 현재 요약 (없으면 None)"""
+        summary = self._summaries.get(session_id)
+        if summary is None or not summary.text:
+            return None
+        self._summaries.move_to_end(session_id)
+        return summary.text
+
+    def clear(self, session_id: str):
+        """세션 요약 삭제 (영구 저장된 요약은 히스토리 삭제와 함께 지워짐)"""
+        self._summaries.pop(session_id, None)
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    def schedule(self, session_id: str):
+        """
+        히스토리 창 밖으로 밀려난 메시지를 백그라운드에서 요약에 반영 (턴 응답을 기다리게 하지 않음)
+        프롬프트에서 빠진 메시지는 개수와 상관없이 항상 요약에 들어감
+        - 마지막 LLM 요약 이후 min_messages 이상 쌓였으면 LLM 요약 (추출 요약으로 반영된 줄도 다시 압축)
+        - 그보다 적으면 추출 요약으로 바로 반영
+        """
+        if self.mode == "off" or session_id in self._tasks:
+            return
+
+        window = self.store.window(session_id, self.window_size)
+        summary = self._summaries.get(session_id)
+        _, boundary_id = self.ai_manager.build_history(
+            window,
+            session_id=session_id,
+            summary=summary.text if summary else None
+        )
+        if boundary_id is None:
+            return
+
+        covered_id = summary.covered_id if summary else 0
+        aged = [
+            msg for msg in self.store.since(session_id, covered_id)
+            if msg["id"] < boundary_id and msg["type"] in ("user", "ai")
+        ]
+        if not aged:
+            return
+
+        pending = summary.pending if summary else 0
+        use_llm = pending + len(aged) >= self.min_messages
+        task = asyncio.create_task(self._update(session_id, aged, use_llm))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def _update(self, session_id: str, messages: List[dict], use_llm: bool = True):
+        """기존 요약 + 밀려난 메시지로 새 요약 생성"""
+        summary = self._summaries.get(session_id) or SessionSummary()
+        previous = summary.text
+
+        text = None
+        if use_llm and self.mode in ("auto", "llm"):
+            try:
+                text = await self.ai_manager.summarize(
+                    self._summary_input(previous, messages), max_tokens=self.token_budget
+                )
+            except Exception as e:
+                print(f"⚠️ 대화 요약 실패, 추출 요약 사용: {e}")
+        if not text:
+            text = self.extractive_summary(previous, messages)
+
+        summary.text = truncate_to_tokens(text.strip(), self.token_budget)
+        summary.covered_id = messages[-1]["id"]
+        summary.pending = 0 if use_llm else summary.pending + len(messages)
+        self._store(session_id, summary)
+        if self.persistence is not None:
+            self.persistence.enqueue_summary(session_id, summary.text, summary.covered_id)
+
+        print(f"📝 대화 요약 갱신: {session_id} (+{len(messages)}개 메시지, {estimate_tokens(summary.text)} 토큰)")
+
+    @staticmethod
+    def _speaker(msg: dict) -> str:
+        return "User" if msg["type"] == "user" else msg.get("ai_name", "AI")
+
+    def _summary_input(self, previous: str, messages: List[dict]) -> str:
+        """LLM 요약 입력 구성"""
+        lines = [f"{self._speaker(msg)}: {msg['message']}" for msg in messages]
+        return (
+            f"<이전 요약>\n{previous or '(없음)'}\n</이전 요약>\n\n"
+            f"<이어진 대화>\n" + "\n".join(lines) + "\n</이어진 대화>"
+        )
+
+    def extractive_summary(self, previous: str, messages: List[dict]) -> str:
+        """
+        로컬 추출 요약 (네트워크 없이 동작, 오프라인 테스트용)
+        메시지마다 첫 문장을 남기고, 예산을 넘으면 오래된 줄부터 제거
+        """
+        line_budget = max(20, self.token_budget // 8)
+        lines = [line for line in previous.split("\n") if line.strip()] if previous else []
+        for msg in messages:
+            first_sentence = re.split(r"(?<=[.!?。])\s+|\n", msg["message"].strip(), maxsplit=1)[0]
+            lines.append(f"- {self._speaker(msg)}: {truncate_to_tokens(first_sentence, line_budget)}")
+
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.token_budget:
+            lines.pop(0)
+        return "\n".join(lines)
@@ -0,0 +1,64 @@
+"""
+Deadline - 요청 하나의 전체 시간 예산
+RAG 검색 → 재시도/백오프 → 공급자 호출로 같은 데드라인을 넘기고,
+각 단계는 남은 시간만 사용
+"""
+
+import math
+import os
+import time
+from typing import Optional
+
+# 기본 요청 예산 (초) 및 헤더로 요청할 수 있는 범위
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))
+MIN_REQUEST_DEADLINE = float(os.getenv("MIN_REQUEST_DEADLINE", "1"))
+MAX_REQUEST_DEADLINE = float(os.getenv("MAX_REQUEST_DEADLINE", "180"))
+
+# RAG 검색에 쓸 수 있는 최대 시간 (초, 전체 예산 대비 비율과 둘 중 작은 값)
+RAG_DEADLINE = float(os.getenv("RAG_DEADLINE", "8"))
+RAG_DEADLINE_FRACTION = float(os.getenv("RAG_DEADLINE_FRACTION", "0.3"))
+
+
+class DeadlineExceeded(Exception):
+    """요청 예산을 다 써서 더 진행하지 않음 (재시도하지 않음)"""
+
+
+class Deadline:
+    """time.monotonic 기준 절대 마감 시각"""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.at = time.monotonic() + seconds
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """
+        X-Request-Timeout 헤더(초)로 데드라인 생성
+        헤더가 없거나 잘못되면(숫자가 아니거나 nan/inf) REQUEST_DEADLINE, 허용 범위를 벗어나면 잘라냄
+        """
+        seconds = REQUEST_DEADLINE
+        if value:
+            try:
+                parsed = float(value)
+            except ValueError:
+                parsed = None
+            if parsed is not None and math.isfinite(parsed):
+                seconds = parsed
+            else:
+                print(f"⚠️ 잘못된 X-Request-Timeout 헤더 무시: {value}")
+        return cls(min(max(seconds, MIN_REQUEST_DEADLINE), MAX_REQUEST_DEADLINE))
+
+    def remaining(self) -> float:
+        """남은 시간 (초, 음수 없음)"""
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, seconds: float) -> float:
+        """seconds와 남은 시간 중 작은 값"""
+        return min(seconds, self.remaining())
+
+    def rag_budget(self) -> float:
+        """RAG 검색에 쓸 시간 (생성 단계 몫을 남겨둠)"""
+        return self.cap(min(RAG_DEADLINE, self.budget * RAG_DEADLINE_FRACTION))
@@ -5,12 +5,95 @@ File Search Manager - Gemini File Search Store API 통합
 import os
 import time
 import json
+import re
 import asyncio
+import hashlib
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, List, Tuple
 from google import genai
 from google.genai import types
 
+from http_clients import client_registry
+from rate_limiter import rate_limiter
+from retrieval_gate import RetrievalGate
+from token_utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from deadline import Deadline
+
+
+class RetrievalCache:
+    """검색 결과 캐시 (LRU + TTL)"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """캐시 조회 (만료된 항목은 제거)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Tuple, value: Dict[str, Any]):
+        """캐시 저장 (용량 초과 시 가장 오래 안 쓴 항목 제거)"""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """전체 캐시 비우기"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 통계"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화 (소문자, 공백 정리, 끝 문장부호 제거)"""
+    normalized = re.sub(r"\s+", " ", query.strip().lower())
+    return normalized.rstrip(" ?!.~")
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """파일 내용의 SHA-256 (청크 단위로 읽음)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class FileSearchManager:
     """Gemini File Search Store 관리자"""
@@ -21,8 +104,8 @@ class FileSearchManager:
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다")
 
-        # 클라이언트 초기화
-        self.client = genai.Client(api_key=self.api_key)
+        # 클라이언트 초기화 (AIManager와 같은 키면 연결 풀 공유)
+        self.client = client_registry.get_genai_client(self.api_key)
 
         # 메타데이터 저장 경로
         self.data_dir = Path("data")
@@ -37,8 +120,46 @@ class FileSearchManager:
         self.store_name = None
         self._initialized = False
 
+        # RAG 검색 게이트 (문서가 필요 없는 메시지는 검색 생략)
+        self.retrieval_gate = RetrievalGate()
+
+        # 검색 결과 캐시 (store 내용이 바뀌면 store_version이 증가해 기존 키가 무효화됨)
+        self.retrieval_cache = RetrievalCache(
+            max_size=int(os.getenv("RAG_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("RAG_CACHE_TTL", "600"))
+        )
+        self.store_version = 0
+
+        # 진행 중인 동일 검색 (single-flight: 같은 키의 동시 요청은 하나의 작업을 공유)
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        # 검색별로 결과를 기다리는 호출자 수 (모두 떠나면 검색 취소)
+        self._inflight_waiters: Dict[Tuple, int] = {}
+        # 진행 중인 업로드 (같은 SHA-256의 동시 업로드는 하나의 인덱싱 작업을 공유)
+        self._uploads_inflight: Dict[str, asyncio.Task] = {}
+        # 인덱싱 operation 폴링 간격 (초, 처음엔 짧게 시작해서 배수로 늘림)
+        self.poll_initial = float(os.getenv("INGEST_POLL_INITIAL", "0.5"))
+        self.poll_max = float(os.getenv("INGEST_POLL_MAX", "10"))
+        self.poll_multiplier = float(os.getenv("INGEST_POLL_MULTIPLIER", "1.5"))
+        # 요청 데드라인 때문에 컨텍스트 없이 진행한 횟수
+        self.timeouts = 0
+        # Store 초기화 직렬화 (동시 요청이 각자 store를 만들지 않도록)
+        self._store_lock = asyncio.Lock()
+
         print(f"✅ Gemini File Search Manager 초기화 완료")
 
+    def _bump_store_version(self):
+        """Store 내용 변경 시 버전 증가 (캐시 무효화)"""
+        self.store_version += 1
+        self.retrieval_cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """검색 캐시 통계"""
+        return {
+            **self.retrieval_cache.stats(),
+            "store_version": self.store_version,
+            "deadline_timeouts": self.timeouts
+        }
+
     def _load_metadata(self) -> Dict[str, Any]:
         """메타데이터 파일 로드"""
         if self.metadata_file.exists():
@@ -63,17 +184,20 @@ class FileSearchManager:
         if self._initialized:
             return
 
-        loop = asyncio.get_event_loop()
+        async with self._store_lock:
+            # 락 대기 중 다른 요청이 초기화를 끝냈을 수 있음
+            if self._initialized:
+                return
+            await self._initialize_store()
 
+    async def _initialize_store(self):
+        """기존 Store 로드 또는 새로 생성 (_store_lock 안에서 호출)"""
         try:
             # 기존 store 확인
             if self.metadata.get("store_name"):
                 try:
-                    self.store = await loop.run_in_executor(
-                        None,
-                        lambda: self.client.file_search_stores.get(
-                            name=self.metadata["store_name"]
-                        )
+                    self.store = await self.client.aio.file_search_stores.get(
+                        name=self.metadata["store_name"]
                     )
                     self.store_name = self.store.name
                     print(f"✅ 기존 File Search Store 로드: {self.store_name}")
@@ -83,11 +207,8 @@ class FileSearchManager:
                     print(f"⚠️ 기존 store 로드 실패, 새로 생성: {e}")
 
             # 새로운 store 생성
-            self.store = await loop.run_in_executor(
-                None,
-                lambda: self.client.file_search_stores.create(
-                    config={'display_name': 'RAG File Search Store'}
-                )
+            self.store = await self.client.aio.file_search_stores.create(
+                config={'display_name': 'RAG File Search Store'}
             )
             self.store_name = self.store.name
             self.metadata["store_name"] = self.store_name
@@ -100,104 +221,270 @@ class FileSearchManager:
             print(f"❌ File Search Store 초기화 실패: {e}")
             raise
     
-    async def upload_file(self, file_path: str, display_name: str) -> Dict[str, Any]:
+    async def warm_up(self) -> str:
+        """앱 시작 시 Store 로드/생성 (첫 업로드·채팅의 지연 제거)"""
+        await self._ensure_store_initialized()
+        return self.store_name
+
+    def find_by_hash(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """같은 내용(SHA-256)으로 이미 인덱싱된 문서"""
+        for file_info in self.metadata.get('uploaded_files', []):
+            if file_info.get('sha256') == sha256:
+                return file_info
+        return None
+
+    async def upload_file(
+        self,
+        file_path: str,
+        display_name: str,
+        sha256: Optional[str] = None,
+        replace: bool = False,
+        operation_name: Optional[str] = None,
+        on_operation: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         파일을 File Search Store에 업로드
+        같은 내용(SHA-256)의 문서가 이미 있으면 Gemini 호출 없이 기존 문서 반환
+        replace=True면 같은 이름의 이전 버전 문서를 삭제
+
+        operation_name이 주어지면 다시 업로드하지 않고 그 인덱싱 작업의 완료만 기다림
+        (재시작 후 작업 재개용, 새로 시작한 작업 이름은 on_operation으로 전달)
         """
         try:
-            # Store 초기화 확인
-            await self._ensure_store_initialized()
-
-            loop = asyncio.get_event_loop()
-
-            # File Search Store에 파일 업로드
-            print(f"📤 File Search Store에 파일 업로드 중: {display_name}")
-
-            operation = await loop.run_in_executor(
-                None,
-                lambda: self.client.file_search_stores.upload_to_file_search_store(
-                    file=file_path,
-                    file_search_store_name=self.store_name,
-                    config={'display_name': display_name}
-                )
-            )
-
-            # 업로드 완료 대기
-            print(f"⏳ 파일 처리 중 (청킹, 임베딩, 인덱싱)...")
-            while not operation.done:
-                await asyncio.sleep(2)
-                operation = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.operations.get(operation)
-                )
-
-            # 완료된 operation에서 파일 정보 가져오기
-            response = operation.response
-
-            # 파일 정보 저장
-            file_info = {
-                'name': response.document_name,  # 문서의 전체 경로
-                'display_name': display_name,
-                'uri': response.document_name,  # 문서 이름이 URI 역할
-                'mime_type': 'application/pdf',  # 기본값
-                'state': 'ACTIVE',
-                'upload_time': time.time()
-            }
-
-            print(f"✅ File Search Store에 파일 업로드 완료: {response.document_name}")
+            if sha256 is None:
+                loop = asyncio.get_event_loop()
+                sha256 = await loop.run_in_executor(None, file_sha256, file_path)
+
+            file_info = self.find_by_hash(sha256)
+            duplicate = file_info is not None
+            if duplicate:
+                print(f"♻️ 동일한 내용의 문서가 이미 있음: {file_info['name']} (sha256={sha256[:12]})")
+            else:
+                # 같은 파일이 이미 업로드 중이면 그 결과를 함께 기다림
+                task = self._uploads_inflight.get(sha256)
+                if task is None:
+                    task = asyncio.create_task(
+                        self._upload_new(file_path, display_name, sha256, operation_name, on_operation)
+                    )
+                    self._uploads_inflight[sha256] = task
+                    task.add_done_callback(lambda _: self._uploads_inflight.pop(sha256, None))
+                else:
+                    duplicate = True
+                    print(f"🔗 진행 중인 동일 파일 업로드에 합류 (sha256={sha256[:12]})")
+                file_info = await asyncio.shield(task)
 
-            # 메타데이터에 추가
-            if 'uploaded_files' not in self.metadata:
-                self.metadata['uploaded_files'] = []
-            self.metadata['uploaded_files'].append(file_info)
-            self._save_metadata()
+            replaced = []
+            if replace:
+                replaced = await self._remove_previous_versions(display_name, keep=file_info['name'])
 
             return {
-                "file_name": response.document_name,
-                "display_name": display_name,
-                "uri": response.document_name,
-                "state": "ACTIVE"
+                "file_name": file_info['name'],
+                "display_name": file_info['display_name'],
+                "uri": file_info['uri'],
+                "state": file_info['state'],
+                "sha256": sha256,
+                "duplicate": duplicate,
+                "replaced": replaced
             }
 
         except Exception as e:
             raise Exception(f"파일 업로드 실패: {str(e)}")
-    
-    async def get_context(self, query: str, max_results: int = 5) -> Optional[Dict[str, Any]]:
+
+    async def _upload_new(
+        self,
+        file_path: str,
+        display_name: str,
+        sha256: str,
+        operation_name: Optional[str] = None,
+        on_operation: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """새 문서 업로드 및 인덱싱 완료 대기"""
+        # Store 초기화 확인
+        await self._ensure_store_initialized()
+
+        if operation_name:
+            print(f"🔁 진행 중이던 인덱싱 작업 재개: {display_name} ({operation_name})")
+            operation = types.UploadToFileSearchStoreOperation(name=operation_name)
+        else:
+            # File Search Store에 파일 업로드
+            print(f"📤 File Search Store에 파일 업로드 중: {display_name}")
+            operation = await self.client.aio.file_search_stores.upload_to_file_search_store(
+                file=file_path,
+                file_search_store_name=self.store_name,
+                config={'display_name': display_name}
+            )
+            if on_operation and operation.name:
+                on_operation(operation.name)
+
+        # 업로드 완료 대기 (짧은 간격부터 시작해서 점점 늘림)
+        print(f"⏳ 파일 처리 중 (청킹, 임베딩, 인덱싱)...")
+        delay = self.poll_initial
+        while not operation.done:
+            await asyncio.sleep(delay)
+            delay = min(delay * self.poll_multiplier, self.poll_max)
+            operation = await self.client.aio.operations.get(operation)
+
+        if operation.error:
+            raise Exception(f"인덱싱 실패: {operation.error}")
+
+        # 완료된 operation에서 파일 정보 가져오기
+        response = operation.response
+
+        # 파일 정보 저장
+        file_info = {
+            'name': response.document_name,  # 문서의 전체 경로
+            'display_name': display_name,
+            'uri': response.document_name,  # 문서 이름이 URI 역할
+            'mime_type': 'application/pdf',  # 기본값
+            'state': 'ACTIVE',
+            'upload_time': time.time(),
+            'sha256': sha256
+        }
+
+        print(f"✅ File Search Store에 파일 업로드 완료: {response.document_name}")
+
+        # 메타데이터에 추가
+        if 'uploaded_files' not in self.metadata:
+            self.metadata['uploaded_files'] = []
+        self.metadata['uploaded_files'].append(file_info)
+        self._save_metadata()
+        self._bump_store_version()
+
+        return file_info
+
+    async def _remove_previous_versions(self, display_name: str, keep: str) -> List[str]:
+        """같은 이름의 이전 버전 문서를 Store와 메타데이터에서 삭제"""
+        previous = [
+            f for f in self.metadata.get('uploaded_files', [])
+            if f['display_name'] == display_name and f['name'] != keep
+        ]
+        if not previous:
+            return []
+
+        removed = []
+        for file_info in previous:
+            try:
+                await self._delete_store_document(file_info['name'])
+                removed.append(file_info['name'])
+                print(f"🔄 이전 버전 문서 삭제: {file_info['name']}")
+            except Exception as e:
+                print(f"⚠️ 이전 버전 삭제 실패 ({file_info['name']}): {e}")
+
+        if removed:
+            self.metadata['uploaded_files'] = [
+                f for f in self.metadata.get('uploaded_files', [])
+                if f['name'] not in removed
+            ]
+            self._save_metadata()
+            self._bump_store_version()
+        return removed
+
+    async def get_context(
+        self,
+        query: str,
+        max_results: int = 5,
+        deadline: Optional["Deadline"] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         File Search Store를 사용하여 쿼리와 관련된 컨텍스트 반환
         Gemini를 사용해 실제로 검색하고 텍스트 추출
+        deadline이 주어지면 RAG 몫의 시간 안에 끝나지 않을 때 None (컨텍스트 없이 답변)
 
         Returns:
             컨텍스트 정보 (store_name, 검색된 텍스트 포함)
         """
+        uploaded_files = self.metadata.get('uploaded_files', [])
+        if not uploaded_files:
+            return None
+
+        # 네트워크 호출 전에 검색이 필요한 메시지인지 로컬에서 판단
+        if not self.retrieval_gate.should_retrieve(query, uploaded_files):
+            return None
+
+        # 캐시 확인 (히트 시 Gemini 호출 없이 바로 반환)
+        cache_key = (normalize_query(query), self.store_version, max_results)
+        cached = self.retrieval_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ RAG 캐시 히트 (쿼리: {query[:50]})")
+            return dict(cached)
+
+        budget = deadline.rag_budget() if deadline is not None else None
+
+        # 같은 검색이 이미 진행 중이면 그 결과를 함께 기다림
+        task = self._inflight.get(cache_key)
+        if task is None:
+            # 검색 요청 자체에도 처음 요청한 호출자의 RAG 예산을 타임아웃으로 적용
+            task = asyncio.create_task(
+                self._search_context(query, cache_key, uploaded_files, max_results, timeout=budget)
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        else:
+            print(f"🔗 진행 중인 RAG 검색에 합류 (쿼리: {query[:50]})")
+
+        # 한 호출자가 취소되거나 시간 초과되어도 다른 호출자가 기다리는 동안은 공유 작업 유지,
+        # 마지막 호출자가 떠나면 검색 요청도 취소
+        self._inflight_waiters[cache_key] = self._inflight_waiters.get(cache_key, 0) + 1
         try:
-            # Store 초기화 확인
-            await self._ensure_store_initialized()
+            if budget is None:
+                result = await asyncio.shield(task)
+                return dict(result)
 
-            uploaded_files = self.metadata.get('uploaded_files', [])
-            if not uploaded_files:
+            # 검색이 느리면 기다리지 않고 컨텍스트 없이 진행
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=budget)
+            except asyncio.TimeoutError:
+                print(f"⏱️ RAG 검색 시간 초과 ({budget:.1f}초), 컨텍스트 없이 응답")
+                self.timeouts += 1
                 return None
+            return dict(result)
+        finally:
+            waiters = self._inflight_waiters[cache_key] - 1
+            if waiters:
+                self._inflight_waiters[cache_key] = waiters
+            else:
+                del self._inflight_waiters[cache_key]
+                if not task.done():
+                    task.cancel()
+
+    async def _search_context(
+        self,
+        query: str,
+        cache_key: Tuple,
+        uploaded_files: List[Dict[str, Any]],
+        max_results: int,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Gemini File Search로 실제 검색 수행 (get_context의 single-flight 작업)
+        timeout: 검색 요청의 HTTP 타임아웃 (초, 요청 데드라인의 RAG 몫)
+        """
+        try:
+            # Store 초기화 확인
+            await self._ensure_store_initialized()
 
             # Gemini를 사용해 File Search 수행하고 관련 텍스트 추출
-            loop = asyncio.get_event_loop()
-
+            # (비동기 클라이언트: 호출자가 취소되면 요청도 함께 취소되어 스레드를 붙잡지 않음)
             search_query = f"다음 질문과 관련된 정보를 문서에서 찾아서 원문 그대로 인용해주세요: {query}"
 
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=search_query,
-                    config=types.GenerateContentConfig(
-                        temperature=0.1,  # 낮은 temperature로 정확한 인용
-                        max_output_tokens=2000,
-                        tools=[
-                            types.Tool(
-                                file_search=types.FileSearch(
-                                    file_search_store_names=[self.store_name]
-                                )
+            # AIManager와 같은 Gemini 한도를 공유
+            await rate_limiter.acquire("Gemini", "gemini-2.5-flash", estimate_tokens(search_query))
+            response = await self.client.aio.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=search_query,
+                config=types.GenerateContentConfig(
+                    temperature=0.1,  # 낮은 temperature로 정확한 인용
+                    max_output_tokens=2000,
+                    tools=[
+                        types.Tool(
+                            file_search=types.FileSearch(
+                                file_search_store_names=[self.store_name]
                             )
-                        ]
+                        )
+                    ],
+                    http_options=(
+                        types.HttpOptions(timeout=max(int(timeout * 1000), 1))
+                        if timeout is not None else None
                     )
                 )
             )
@@ -205,16 +492,25 @@ class FileSearchManager:
             # 검색 결과 텍스트 추출
             searched_text = response.text if hasattr(response, 'text') and response.text else ""
 
+            # 검색 결과 용어를 게이트에 학습 (후속 질문 판단용)
+            self.retrieval_gate.learn(searched_text)
+
             print(f"🔍 RAG 검색 완료 (쿼리: {query[:50]}...)")
             print(f"📝 추출된 컨텍스트: {searched_text[:200]}...")
 
-            return {
+            result = {
                 "store_name": self.store_name,
                 "file_count": len(uploaded_files),
                 "files": uploaded_files[-max_results:],
                 "searched_context": searched_text  # 검색된 텍스트 추가
             }
 
+            # 검색 도중 store가 바뀌지 않았을 때만 캐시에 저장
+            if cache_key[1] == self.store_version:
+                self.retrieval_cache.set(cache_key, result)
+
+            return result
+
         except Exception as e:
             print(f"⚠️ 컨텍스트 검색 오류: {e}")
             # 오류 시에도 store_name은 반환 (Gemini가 직접 검색할 수 있도록)
@@ -251,16 +547,18 @@ class FileSearchManager:
                 "count": 0
             }
 
+    async def _delete_store_document(self, name: str):
+        """File Search Store 문서 삭제 (청크까지 함께 삭제)"""
+        await self.client.aio.file_search_stores.documents.delete(
+            name=name,
+            config={'force': True}
+        )
+
     async def delete_document(self, document_id: str) -> Dict[str, Any]:
         """문서 삭제"""
         try:
-            loop = asyncio.get_event_loop()
-
-            # File Search Store에서 파일 삭제
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.files.delete(name=document_id)
-            )
+            # File Search Store에서 문서 삭제
+            await self._delete_store_document(document_id)
 
             # 메타데이터에서 제거
             uploaded_files = self.metadata.get('uploaded_files', [])
@@ -269,6 +567,7 @@ class FileSearchManager:
                 if f['name'] != document_id
             ]
             self._save_metadata()
+            self._bump_store_version()
 
             return {
                 "success": True,
@@ -287,14 +586,9 @@ class FileSearchManager:
             uploaded_files = self.metadata.get('uploaded_files', [])
             deleted_count = 0
 
-            loop = asyncio.get_event_loop()
-
             for file_info in uploaded_files:
                 try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda name=file_info['name']: self.client.files.delete(name=name)
-                    )
+                    await self._delete_store_document(file_info['name'])
                     deleted_count += 1
                 except Exception as e:
                     print(f"⚠️ 파일 삭제 실패 ({file_info['name']}): {e}")
@@ -302,6 +596,7 @@ class FileSearchManager:
             # 메타데이터 초기화
             self.metadata['uploaded_files'] = []
             self._save_metadata()
+            self._bump_store_version()
 
             return {
                 "success": True,
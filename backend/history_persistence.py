@@ -0,0 +1,261 @@
+"""
+History Persistence - 대화 히스토리 영구 저장 (SQLite WAL)
+요청 경로에서는 큐에 넣기만 하고, 백그라운드 스레드가 모아서 한 번에 기록 (write-behind)
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 큐 작업 종류
+_APPEND = "append"
+_CLEAR = "clear"
+_SUMMARY = "summary"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class HistoryPersistence:
+    """SQLite 기반 대화 히스토리 저장소 (배치 쓰기)"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.db_path = Path(db_path or os.getenv("CHAT_DB_PATH", "data/chat_history.db"))
+        self.batch_size = batch_size or int(os.getenv("CHAT_DB_BATCH_SIZE", "200"))
+        self.flush_interval = flush_interval or float(os.getenv("CHAT_DB_FLUSH_INTERVAL", "0.5"))
+
+        self._queue: "queue.Queue[Tuple[str, Optional[str], Any, float]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.batches = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """SQLite 연결 (WAL 모드)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        """테이블 생성 및 쓰기 스레드 시작"""
+        if self._thread is not None:
+            return
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)"
+            )
+            # 세션별 누적 요약 (재시작 후 처음부터 다시 요약하지 않도록)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    session_id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    covered_id INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._thread = threading.Thread(
+            target=self._writer_loop, name="history-writer", daemon=True
+        )
+        self._thread.start()
+        print(f"✅ 대화 히스토리 DB 연결: {self.db_path}")
+
+    # ==================== 쓰기 (요청 경로) ====================
+
+    def enqueue_append(self, session_id: str, payload: str):
+        """메시지 저장 예약 (JSON 직렬화된 payload, 즉시 반환)"""
+        self._queue.put_nowait((_APPEND, session_id, payload, time.time()))
+
+    def enqueue_clear(self, session_id: str):
+        """세션 삭제 예약"""
+        self._queue.put_nowait((_CLEAR, session_id, None, time.time()))
+
+    def enqueue_summary(self, session_id: str, text: str, covered_id: int):
+        """세션 요약 저장 예약 (기존 요약 덮어씀)"""
+        self._queue.put_nowait((_SUMMARY, session_id, (text, covered_id), time.time()))
+
+    def flush(self, timeout: float = 30.0):
+        """
+        이 호출 전에 예약된 쓰기가 반영될 때까지 대기 (블로킹)
+        큐 전체가 비기를 기다리지 않고 표시 작업(marker)을 넣어 그 지점까지만 대기
+        (다른 세션이 계속 쓰고 있어도 끝남)
+        """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put_nowait((_FLUSH, None, done, time.time()))
+        if not done.wait(timeout):
+            print(f"⚠️ 대화 히스토리 flush 대기 시간 초과 ({timeout:.0f}초)")
+
+    def close(self):
+        """남은 쓰기를 반영하고 스레드 종료"""
+        if self._thread is None:
+            return
+        self._queue.put((_STOP, None, None, time.time()))
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    # ==================== 쓰기 스레드 ====================
+
+    def _writer_loop(self):
+        """큐 작업을 모아서 한 트랜잭션으로 기록"""
+        conn = self._connect()
+        try:
+            while True:
+                ops = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                # flush 표시가 들어오면 더 모으지 않고 바로 기록
+                while len(ops) < self.batch_size and ops[-1][0] not in (_STOP, _FLUSH):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        ops.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                try:
+                    self._write_batch(conn, ops)
+                except Exception as e:
+                    print(f"⚠️ 대화 히스토리 저장 실패 ({len(ops)}건): {e}")
+                finally:
+                    for kind, _, payload, _ in ops:
+                        if kind == _FLUSH:
+                            payload.set()
+                        self._queue.task_done()
+
+                if ops[-1][0] == _STOP:
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, ops: List[Tuple]):
+        """작업 순서를 유지하며 연속된 append는 executemany로 묶어서 기록"""
+        pending: List[Tuple[str, str, float]] = []
+        with conn:
+            for kind, session_id, payload, created_at in ops:
+                if kind == _APPEND:
+                    pending.append((session_id, payload, created_at))
+                    continue
+                if pending:
+                    self._insert(conn, pending)
+                    pending = []
+                if kind == _CLEAR:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+                elif kind == _SUMMARY:
+                    text, covered_id = payload
+                    conn.execute(
+                        "INSERT OR REPLACE INTO summaries (session_id, text, covered_id, updated_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (session_id, text, covered_id, created_at)
+                    )
+            if pending:
+                self._insert(conn, pending)
+        self.batches += 1
+
+    def _insert(self, conn: sqlite3.Connection, rows: List[Tuple[str, str, float]]):
+        conn.executemany(
+            "INSERT INTO messages (session_id, payload, created_at) VALUES (?, ?, ?)", rows
+        )
+        self.written += len(rows)
+
+    # ==================== 읽기 ====================
+
+    def load_session(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """세션의 최근 limit개 메시지 로드 (블로킹 - executor에서 호출)"""
+        # 아직 기록되지 않은 메시지까지 포함되도록 먼저 flush
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT payload FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(payload) for (payload,) in reversed(rows)]
+
+    def load_before(
+        self, session_id: str, before_id: int, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        메시지 ID가 before_id보다 작은 메시지 중 최근 limit개 (오래된 순, 블로킹 - executor에서 호출)
+        메모리 창 밖의 이전 페이지 조회용 (메시지 ID는 저장 순서대로 증가)
+        """
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT payload FROM messages "
+                "WHERE session_id = ? AND json_extract(payload, '$.id') < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, before_id, -1 if limit is None else limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(payload) for (payload,) in reversed(rows)]
+
+    def load_summary(self, session_id: str) -> Optional[Tuple[str, int]]:
+        """세션 요약 로드 - (요약, 반영된 마지막 메시지 ID), 없으면 None (블로킹 - executor에서 호출)"""
+        self.flush()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT text, covered_id FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return (row[0], row[1]) if row else None
+
+    def load_page(
+        self, session_id: str, after_row: int = 0, limit: int = 500
+    ) -> List[Tuple[int, str]]:
+        """세션 메시지를 저장 순서대로 페이지 단위 조회 (블로킹 - executor에서 호출)"""
+        if after_row == 0:
+            self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT id, payload FROM messages WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (session_id, after_row, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """저장소 통계"""
+        return {
+            "db_path": str(self.db_path),
+            "pending_writes": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches
+        }
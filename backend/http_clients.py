@@ -0,0 +1,145 @@
+"""
+HTTP Clients - 프로세스 전역 HTTP 연결 풀 레지스트리
+OpenAI, Anthropic, Gemini, Perplexity 클라이언트가 keep-alive 연결 풀을 공유하고
+종료 시 한 번에 정리
+"""
+
+import importlib
+import importlib.util
+import os
+from typing import Any, Dict
+
+import httpx
+
+# h2 패키지가 있으면 HTTP/2 사용
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """공유 HTTP 클라이언트 레지스트리"""
+
+    def __init__(self):
+        # 연결 풀 설정 (공급자별로 {NAME}_MAX_CONNECTIONS 등으로 재정의 가능)
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        # 타임아웃 (초)
+        self.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+        self.read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+        self.http2 = HTTP2_AVAILABLE and os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._genai_clients: Dict[str, Any] = {}
+
+    def _setting(self, name: str, key: str, default: Any) -> str:
+        """공급자별 설정 (예: OPENAI_MAX_CONNECTIONS), 없으면 공통값"""
+        return os.getenv(f"{name.upper()}_{key}", str(default))
+
+    def limits(self, name: str, httpx_module=httpx):
+        """공급자별 연결 풀 한도"""
+        return httpx_module.Limits(
+            max_connections=int(self._setting(name, "MAX_CONNECTIONS", self.max_connections)),
+            max_keepalive_connections=int(self._setting(name, "MAX_KEEPALIVE", self.max_keepalive)),
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self, name: str, httpx_module=httpx):
+        """공급자별 타임아웃"""
+        read_timeout = float(self._setting(name, "READ_TIMEOUT", self.read_timeout))
+        return httpx_module.Timeout(read_timeout, connect=self.connect_timeout)
+
+    def get_async_client(self, name: str, client_cls=None) -> httpx.AsyncClient:
+        """
+        이름별 공유 AsyncClient (최초 요청 시 생성)
+        client_cls: SDK 기본 클라이언트 클래스 (SDK 버전에 따라 httpx 또는 httpx2 기반)
+        """
+        client = self._async_clients.get(name)
+        if client is None or client.is_closed:
+            client_cls = client_cls or httpx.AsyncClient
+            # 클라이언트와 같은 패키지의 Limits/Timeout 사용
+            base = next(c for c in client_cls.__mro__ if c.__name__ == "AsyncClient")
+            httpx_module = importlib.import_module(base.__module__.split(".")[0])
+            options = {"limits": self.limits(name, httpx_module), "timeout": self.timeout(name, httpx_module)}
+            if self.http2:
+                options["http2"] = True
+            client = client_cls(**options)
+            self._async_clients[name] = client
+        return client
+
+    def get_openai_client(self, api_key: str):
+        """공유 연결 풀을 사용하는 AsyncOpenAI"""
+        import openai
+
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=self.get_async_client("openai", openai.DefaultAsyncHttpxClient),
+            # 재시도는 retry_policy.RetryPolicy가 담당
+            max_retries=0
+        )
+
+    def get_anthropic_client(self, api_key: str):
+        """공유 연결 풀을 사용하는 AsyncAnthropic"""
+        import anthropic
+
+        return anthropic.AsyncAnthropic(
+            api_key=api_key,
+            http_client=self.get_async_client("anthropic", anthropic.DefaultAsyncHttpxClient),
+            # 재시도는 retry_policy.RetryPolicy가 담당
+            max_retries=0
+        )
+
+    def get_genai_client(self, api_key: str):
+        """
+        공유 genai.Client (API 키별 하나)
+        AIManager와 FileSearchManager가 같은 동기/비동기 연결 풀을 사용
+        """
+        client = self._genai_clients.get(api_key)
+        if client is None:
+            from google import genai
+            from google.genai import types
+
+            pool_args = {"limits": self.limits("gemini"), "http2": self.http2}
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    timeout=int(self.timeout("gemini").read * 1000),  # 밀리초
+                    client_args=pool_args,
+                    async_client_args=pool_args
+                )
+            )
+            self._genai_clients[api_key] = client
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        """열려 있는 클라이언트 목록"""
+        return {
+            "http2": self.http2,
+            "httpx_clients": sorted(name for name, c in self._async_clients.items() if not c.is_closed),
+            "genai_clients": len(self._genai_clients)
+        }
+
+    async def aclose(self):
+        """모든 클라이언트 연결 종료 (앱 종료 시)"""
+        for name, client in list(self._async_clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"⚠️ HTTP 클라이언트 종료 실패 ({name}): {e}")
+        self._async_clients.clear()
+
+        for client in list(self._genai_clients.values()):
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                print(f"⚠️ Gemini 클라이언트 종료 실패: {e}")
+        self._genai_clients.clear()
+
+
+# 프로세스 전역 레지스트리
+client_registry = ClientRegistry()
+
+
+def get_client_registry() -> ClientRegistry:
+    """전역 클라이언트 레지스트리"""
+    return client_registry
@@ -0,0 +1,283 @@
+"""
+Ingestion Jobs - 백그라운드 문서 인덱싱 작업 큐
+업로드 요청은 파일을 디스크에 저장하고 작업 ID만 바로 반환,
+제한된 수의 워커가 FileSearchManager.upload_file로 인덱싱을 진행
+작업 상태는 data/ingestion_jobs.json에 기록되어 재시작 후에도 이어서 처리
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# 작업 상태
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATES = (COMPLETED, FAILED)
+
+
+class IngestionQueue:
+    """업로드 인덱싱 작업 큐 (asyncio 워커 풀)"""
+
+    def __init__(
+        self,
+        file_search_manager,
+        on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        data_dir: Optional[Path] = None,
+        workers: Optional[int] = None
+    ):
+        self.file_search_manager = file_search_manager
+        # 인덱싱 완료 시 호출 (대화 히스토리 기록 등)
+        self.on_complete = on_complete
+
+        self.data_dir = Path(data_dir or file_search_manager.data_dir)
+        self.jobs_file = self.data_dir / "ingestion_jobs.json"
+        # 인덱싱 대기 중인 업로드 파일 보관 위치 (재시작 후에도 남아 있어야 함)
+        self.upload_dir = self.data_dir / "uploads"
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+
+        # 동시에 인덱싱하는 파일 수
+        self.worker_count = workers or int(os.getenv("INGEST_WORKERS", "2"))
+        # 보관할 완료/실패 작업 수 (오래된 것부터 삭제)
+        self.history_limit = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+        self.jobs: Dict[str, Dict[str, Any]] = self._load_jobs()
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        # 작업 상태가 바뀔 때마다 깨우는 조건 변수 (SSE 구독용)
+        self._changed = asyncio.Condition()
+        # 작업별 구독(watch/hold) 수 - 구독 중인 작업은 정리하지 않음
+        self._watchers: Dict[str, int] = {}
+
+    def _load_jobs(self) -> Dict[str, Dict[str, Any]]:
+        """저장된 작업 목록 로드"""
+        if self.jobs_file.exists():
+            try:
+                with open(self.jobs_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ 인덱싱 작업 목록 로드 실패: {e}")
+        return {}
+
+    def _save_jobs(self):
+        """작업 목록 저장 (임시 파일에 쓰고 교체)"""
+        try:
+            tmp_file = self.jobs_file.with_suffix(".json.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.jobs_file)
+        except Exception as e:
+            print(f"⚠️ 인덱싱 작업 목록 저장 실패: {e}")
+
+    def _prune(self):
+        """오래된 완료/실패 작업 정리 (최종 상태를 아직 받지 못한 구독자가 있는 작업은 남김)"""
+        finished = sorted(
+            (
+                job for job in self.jobs.values()
+                if job["status"] in TERMINAL_STATES and not self._watchers.get(job["id"])
+            ),
+            key=lambda job: job["updated_at"]
+        )
+        for job in finished[:max(0, len(finished) - self.history_limit)]:
+            del self.jobs[job["id"]]
+
+    async def start(self):
+        """워커 시작 및 재시작 전에 끝나지 않은 작업 재등록"""
+        if self._workers:
+            return
+        # 큐와 조건 변수는 실행 중인 이벤트 루프에서 새로 만듦 (남은 작업은 아래에서 다시 채움)
+        self._queue = asyncio.Queue()
+        self._changed = asyncio.Condition()
+
+        resumed = 0
+        for job in self.jobs.values():
+            if job["status"] in TERMINAL_STATES:
+                continue
+            if not job.get("operation_name") and not os.path.exists(job["file_path"]):
+                job["status"] = FAILED
+                job["error"] = "재시작 후 업로드 파일을 찾을 수 없음"
+                job["updated_at"] = time.time()
+                continue
+            job["status"] = QUEUED
+            self._queue.put_nowait(job["id"])
+            resumed += 1
+        self._save_jobs()
+        if resumed:
+            print(f"🔁 끝나지 않은 인덱싱 작업 {resumed}개 재개")
+
+        self._workers = [
+            asyncio.create_task(self._worker(index))
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        """워커 종료 (진행 중이던 작업은 다음 시작 때 재개)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        file_path: str,
+        filename: str,
+        sha256: str,
+        file_size: int,
+        replace: bool = False,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        작업 등록 (file_path는 upload_dir 안의 파일, 작업이 끝나면 삭제됨)
+        같은 내용의 문서가 이미 있으면 큐를 거치지 않고 바로 완료
+        """
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "filename": filename,
+            "file_path": str(file_path),
+            "file_size": file_size,
+            "sha256": sha256,
+            "replace": replace,
+            "session_id": session_id,
+            "operation_name": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        duplicate = not replace and self.file_search_manager.find_by_hash(sha256)
+        self.jobs[job["id"]] = job
+
+        if duplicate:
+            await self._run(job)
+        else:
+            self._save_jobs()
+            self._queue.put_nowait(job["id"])
+            print(f"📥 인덱싱 작업 등록: {filename} (job={job['id']}, 대기 {self._queue.qsize()}개)")
+        return self.public(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return self.public(job) if job else None
+
+    def hold(self, job_id: str):
+        """release할 때까지 작업을 정리 대상에서 제외 (최종 상태를 나중에 기다릴 때)"""
+        self._watchers[job_id] = self._watchers.get(job_id, 0) + 1
+
+    def release(self, job_id: str):
+        count = self._watchers.get(job_id, 0) - 1
+        if count > 0:
+            self._watchers[job_id] = count
+        else:
+            self._watchers.pop(job_id, None)
+
+    @staticmethod
+    def public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """API 응답용 작업 정보 (로컬 파일 경로 제외)"""
+        return {key: value for key, value in job.items() if key != "file_path"}
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """작업 상태가 바뀔 때마다 yield, 완료/실패하면 종료"""
+        # 작업 객체를 직접 잡고 있어 목록에서 정리되더라도 최종 상태를 받음
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        self.hold(job_id)
+        try:
+            last_update = None
+            while True:
+                if job["updated_at"] != last_update:
+                    last_update = job["updated_at"]
+                    yield self.public(job)
+                if job["status"] in TERMINAL_STATES:
+                    return
+                async with self._changed:
+                    await self._changed.wait()
+        finally:
+            self.release(job_id)
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """작업이 완료/실패할 때까지 기다린 뒤 최종 상태"""
+        job = None
+        async for job in self.watch(job_id):
+            pass
+        return job
+
+    async def _notify(self, job: Dict[str, Any], **changes):
+        """작업 상태 변경 저장 및 구독자 깨우기"""
+        job.update(changes, updated_at=time.time())
+        if job["status"] in TERMINAL_STATES:
+            self._prune()
+        self._save_jobs()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job and job["status"] not in TERMINAL_STATES:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]):
+        """작업 하나 처리 (인덱싱 → 완료 콜백 → 파일 삭제)"""
+        await self._notify(job, status=PROCESSING)
+
+        def record_operation(name: str):
+            # 재시작 후 같은 파일을 다시 올리지 않고 이 작업의 완료만 기다리도록 기록
+            job["operation_name"] = name
+            self._save_jobs()
+
+        try:
+            result = await self.file_search_manager.upload_file(
+                job["file_path"],
+                job["filename"],
+                sha256=job["sha256"],
+                replace=job["replace"],
+                operation_name=job.get("operation_name"),
+                on_operation=record_operation
+            )
+        except asyncio.CancelledError:
+            # 종료 중: 상태를 queued로 남겨 다음 시작 때 재개
+            job["status"] = QUEUED
+            self._save_jobs()
+            raise
+        except Exception as e:
+            print(f"❌ 인덱싱 작업 실패: {job['filename']} (job={job['id']}): {e}")
+            await self._notify(job, status=FAILED, error=str(e))
+            self._remove_file(job)
+            return
+
+        await self._notify(job, status=COMPLETED, result=result)
+        self._remove_file(job)
+        if self.on_complete:
+            try:
+                await self.on_complete(self.public(job))
+            except Exception as e:
+                print(f"⚠️ 인덱싱 완료 처리 실패 (job={job['id']}): {e}")
+
+    @staticmethod
+    def _remove_file(job: Dict[str, Any]):
+        try:
+            os.unlink(job["file_path"])
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.worker_count,
+            "queue_size": self._queue.qsize(),
+            "jobs": counts
+        }
@@ -3,28 +3,43 @@ Multi-AI Chat System with Gemini File Search RAG
 FastAPI Backend Server
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, Form, Header, Query, Request, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, AsyncGenerator, Set
 import os
-import tempfile
 import time
 import asyncio
 import json
+import hashlib
 from datetime import datetime
 import re
+from email.utils import formatdate
 from dotenv import load_dotenv
 
 # .env 파일 로드
 load_dotenv()
 
-from ai_manager import AIManager
+from ai_manager import AIManager, AIResponseError
 from file_search_manager import FileSearchManager
+from conversation_store import ConversationStore, DEFAULT_SESSION_ID
+from history_persistence import HistoryPersistence
+from conversation_summarizer import ConversationSummarizer
+from deadline import Deadline
+from http_clients import client_registry
+from ingestion_jobs import TERMINAL_STATES, IngestionQueue
+from persona_selection import PersonaSelector
+from resumable_uploads import TUS_VERSION, ResumableUploadStore, parse_checksum, parse_upload_metadata
+from upload_utils import (
+    ALLOWED_EXTENSIONS, StoredUpload, UploadSizeLimitMiddleware, extract_zip, save_stream, save_upload
+)
 
 app = FastAPI(title="Multi-AI RAG Chat System")
 
+# 업로드 본문 크기 제한 (수신 도중 초과 시 413, CORS보다 안쪽에 둬서 413에도 CORS 헤더가 붙도록)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -32,19 +47,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 이어 올리기(tus) 클라이언트가 읽어야 하는 응답 헤더
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires", "Tus-Resumable"],
 )
 
 # AI Manager 및 File Search Manager 초기화
 ai_manager = AIManager()
 file_search_manager = FileSearchManager()
 
-# 대화 히스토리 (메모리 저장 - 프로덕션에서는 DB 사용)
-chat_history: List[Dict[str, Any]] = []
+# 대화 히스토리 (세션별 링 버퍼, 전체 메모리 상한 + 오래 안 쓴 세션 제거)
+# SQLite(WAL)에 배치로 영구 저장하고, 재시작 후 첫 접근 시 세션을 로드
+history_persistence = (
+    HistoryPersistence()
+    if os.getenv("CHAT_HISTORY_PERSISTENCE", "true").lower() in ("1", "true", "yes")
+    else None
+)
+conversation_store = ConversationStore(persistence=history_persistence)
+
+# 히스토리 렌더링 시 살펴보는 최근 메시지 수 (실제 포함 범위는 토큰 예산으로 결정)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "50"))
+
+# 히스토리 창 밖으로 밀려난 대화의 누적 요약 (백그라운드 갱신)
+# 요약도 히스토리와 같은 DB에 저장해서 재시작 후 이어서 사용
+conversation_summarizer = ConversationSummarizer(
+    ai_manager, conversation_store, CHAT_HISTORY_WINDOW, persistence=history_persistence
+)
+
+# @지명이 없을 때 응답할 AI 선택 (PERSONA_SELECTION_POLICY: latency / uniform)
+persona_selector = PersonaSelector(ai_manager.provider_health)
+
+
+async def record_ingested_upload(job: Dict[str, Any]):
+    """인덱싱이 끝난 업로드를 해당 세션 히스토리에 기록"""
+    session_id = resolve_session_id(job.get("session_id"))
+    await conversation_store.ensure_loaded(session_id)
+    conversation_store.append(session_id, {
+        "type": "system",
+        "message": f"📎 파일 업로드: {job['filename']}",
+        "timestamp": datetime.now().isoformat(),
+        "file_info": job["result"]
+    })
+
+# 업로드 인덱싱 작업 큐 (INGEST_WORKERS개 워커, 작업 상태는 data/ingestion_jobs.json)
+ingestion_queue = IngestionQueue(file_search_manager, on_complete=record_ingested_upload)
+
+# 이어 올리기 업로드의 미완료 데이터 (RESUMABLE_UPLOAD_TTL 동안 PATCH가 없으면 삭제)
+resumable_uploads = ResumableUploadStore(ingestion_queue.upload_dir / "partial")
 
 # Request Models
 class ChatRequest(BaseModel):
     message: str
     include_context: bool = True
+    # 대화 세션 ID (생략 시 기본 세션)
+    session_id: Optional[str] = None
+    # 스트리밍 모드: sequential(AI 하나씩 순서대로) / multiplex(모든 AI 동시 스트리밍)
+    stream_mode: Literal["sequential", "multiplex"] = "sequential"
 
 class AIResponse(BaseModel):
     ai_name: str
@@ -54,15 +111,108 @@ class AIResponse(BaseModel):
 
 # ==================== 시작 시 초기화 ====================
 
+# 시작 시 워밍업 (전체 시간 상한, 초)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "20"))
+# 필수 구성 요소가 실패했을 때 /ready 요청 시 워밍업을 다시 시도하는 최소 간격 (초)
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "30"))
+
+# 워밍업 상태: pending → running → ready / degraded / failed (또는 skipped)
+#   ready: 모든 구성 요소 정상
+#   degraded: 필수 구성 요소(File Search Store, AI 최소 1개)는 정상, 일부 AI 실패
+#   failed: 필수 구성 요소 실패 (/ready 503)
+warmup_state: Dict[str, Any] = {
+    "status": "pending", "components": {}, "duration": None, "task": None, "finished_at": None
+}
+
+
+def warmup_result(components: Dict[str, str]) -> str:
+    """구성 요소별 결과로 워밍업 상태 결정"""
+    ai_results = [components.get(ai_name) for ai_name in ai_manager.get_configured_ais()]
+    required_ok = components.get("file_search_store") == "ok" and "ok" in ai_results
+    if not required_ok:
+        return "failed"
+    if all(result == "ok" for result in components.values()):
+        return "ready"
+    return "degraded"
+
+
+async def run_warmup():
+    """
+    File Search Store 로드/생성과 AI 연결을 동시에 수행
+    실패하거나 시간을 넘겨도 앱은 계속 동작 (해당 구성 요소는 첫 요청 시 다시 초기화)
+    """
+    warmup_state["status"] = "running"
+    start = time.perf_counter()
+    components = warmup_state["components"] = {}
+
+    async def warm_store():
+        try:
+            store_name = await file_search_manager.warm_up()
+            components["file_search_store"] = "ok"
+            print(f"🔥 File Search Store 워밍업 완료: {store_name}")
+        except Exception as e:
+            components["file_search_store"] = f"error: {e}"
+
+    async def warm_ais():
+        components.update(await ai_manager.warm_up())
+
+    try:
+        await asyncio.wait_for(asyncio.gather(warm_store(), warm_ais()), timeout=WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"⚠️ 워밍업 시간 초과 ({WARMUP_TIMEOUT:.0f}초)")
+        for name in ["file_search_store", *ai_manager.get_configured_ais()]:
+            components.setdefault(name, "timeout")
+
+    warmup_state["duration"] = round(time.perf_counter() - start, 3)
+    warmup_state["finished_at"] = time.monotonic()
+    warmup_state["status"] = warmup_result(components)
+    if warmup_state["status"] == "failed":
+        print(f"❌ 워밍업 실패 - 필수 구성 요소 오류 ({warmup_state['duration']}초): {components}")
+    else:
+        print(f"🔥 워밍업 완료 [{warmup_state['status']}] ({warmup_state['duration']}초): {components}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """앱 시작 시 초기화"""
     print("🚀 Trinity AI Friend 시작")
+
+    # 대화 히스토리 저장소 시작
+    if history_persistence:
+        history_persistence.start()
     
+    # 업로드 인덱싱 워커 시작 (재시작 전에 끝나지 않은 작업 재개)
+    await ingestion_queue.start()
+    # 만료된 이어 올리기 업로드 정리 시작
+    resumable_uploads.start()
+
     # AI 연결 확인
     available_ais = ai_manager.get_available_ais()
     print(f"✅ 사용 가능한 AI: {', '.join(available_ais)}")
 
+    # Store 로드와 AI 연결을 백그라운드에서 미리 수행 (시작을 막지 않음, 준비 상태는 /ready)
+    if WARMUP_ENABLED:
+        warmup_state["task"] = asyncio.create_task(run_warmup())
+    else:
+        warmup_state["status"] = "skipped"
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """앱 종료 시 정리"""
+    # 인덱싱 워커 중단 (진행 중이던 작업은 다음 시작 때 재개)
+    await ingestion_queue.stop()
+    await resumable_uploads.stop()
+    # 남은 히스토리 쓰기 반영
+    if history_persistence:
+        await asyncio.get_event_loop().run_in_executor(None, history_persistence.close)
+    # 진행 중인 워밍업 중단
+    task = warmup_state.get("task")
+    if task and not task.done():
+        task.cancel()
+    # 공유 HTTP 연결 풀 종료
+    await client_registry.aclose()
+
 # ==================== 헬스 체크 ====================
 
 @app.get("/health")
@@ -72,69 +222,388 @@ async def health_check():
         "status": "healthy",
         "available_ais": ai_manager.get_available_ais(),
         "uploaded_files_count": len(file_search_manager.get_uploaded_files()),
-        "chat_history_count": len(chat_history)
+        "chat_history_count": conversation_store.count(),
+        "conversation_store": conversation_store.stats(),
+        "rag_cache": file_search_manager.get_cache_stats(),
+        "prompt_cache": ai_manager.get_usage_stats(),
+        "retries": ai_manager.retry_policy.stats(),
+        "circuit_breakers": ai_manager.get_circuit_stats(),
+        "rate_limits": ai_manager.rate_limiter.stats(),
+        "persona_selection": persona_selector.stats(ai_manager.get_available_ais()),
+        "model_tiers": ai_manager.tier_classifier.stats(),
+        "ingestion": ingestion_queue.stats(),
+        "resumable_uploads": resumable_uploads.stats(),
+        "http_clients": client_registry.stats()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    준비 상태 확인 (시작 워밍업 결과)
+    워밍업 중이거나 필수 구성 요소가 실패했으면 503 - 로드 밸런서가 트래픽을 보내기 전 확인용
+    일부 AI만 실패한 경우는 200 + status "degraded" (구성 요소별 오류는 components)
+    실패 상태에서는 WARMUP_RETRY_INTERVAL마다 워밍업을 다시 시도
+    """
+    task = warmup_state.get("task")
+    if (
+        warmup_state["status"] == "failed"
+        and (task is None or task.done())
+        and time.monotonic() - warmup_state["finished_at"] >= WARMUP_RETRY_INTERVAL
+    ):
+        print("🔁 워밍업 재시도")
+        warmup_state["task"] = asyncio.create_task(run_warmup())
+
+    ready = warmup_state["status"] in ("ready", "degraded", "skipped")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "status": warmup_state["status"],
+            "components": warmup_state["components"],
+            "duration": warmup_state["duration"]
+        }
+    )
+
 # ==================== 파일 업로드 ====================
 
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def submit_upload(
+    stored: StoredUpload,
+    filename: str,
+    replace: bool,
+    session_id: str
+) -> Dict[str, Any]:
+    """디스크에 저장한 업로드를 인덱싱 작업으로 등록 (등록 실패 시 파일 삭제)"""
+    print(f"📤 업로드 수신: {filename} ({stored.size} bytes, sha256={stored.sha256[:12]})")
+    try:
+        job = await ingestion_queue.submit(
+            stored.path,
+            filename,
+            sha256=stored.sha256,
+            file_size=stored.size,
+            replace=replace,
+            session_id=session_id
+        )
+    except BaseException:
+        # 작업 등록 전에 실패하면 저장한 파일 삭제 (이후 파일 삭제는 작업 큐가 담당)
+        stored.remove()
+        raise
+
+    duplicate = bool(job["result"] and job["result"].get("duplicate"))
+    return {
+        "success": job["status"] != "failed",
+        "message": "이미 업로드된 파일입니다" if duplicate else "인덱싱 대기 중",
+        "job_id": job["id"],
+        **job
+    }
+
+@app.post("/api/upload", status_code=202)
+async def upload_file(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    replace: bool = Form(False)
+):
     """
-    파일 업로드 및 File Search Store에 인덱싱
+    파일 업로드 후 인덱싱 작업 등록 (인덱싱 완료를 기다리지 않고 작업 ID 반환)
+    파일은 청크 단위로 디스크에 스트리밍 저장 (크기 초과 시 즉시 413)
+    같은 내용의 파일은 다시 인덱싱하지 않고 바로 completed,
+    replace=true면 같은 이름의 이전 버전 문서를 새 버전으로 교체
+    진행 상태는 GET /api/upload/jobs/{job_id} 또는 /events (SSE)
+    multipart 본문은 Starlette가 먼저 임시 파일로 받아 두므로 디스크에 두 번 기록됨
+    (큰 파일은 한 번만 기록하는 POST /api/upload/raw 사용)
     """
+    session_id = resolve_session_id(session_id)
+
     try:
         # 파일 검증
-        allowed_extensions = {'.pdf', '.docx', '.txt', '.json', '.png', '.jpg', '.jpeg'}
         file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(400, f"지원하지 않는 파일 형식: {file_ext}")
         
-        # 파일 읽기
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 100 * 1024 * 1024:  # 100MB
-            raise HTTPException(400, "파일 크기는 100MB 이하여야 합니다")
-        
-        # 임시 파일 저장
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        # File Search Store에 업로드
-        print(f"📤 업로드 시작: {file.filename}")
-        result = await file_search_manager.upload_file(tmp_path, file.filename)
-        
-        # 임시 파일 삭제
-        os.unlink(tmp_path)
-        
-        # 히스토리에 기록
-        chat_history.append({
-            "type": "system",
-            "message": f"📎 파일 업로드: {file.filename}",
-            "timestamp": datetime.now().isoformat(),
-            "file_info": result
-        })
-        
-        return {
-            "success": True,
-            "message": "파일 업로드 완료",
-            "filename": file.filename,
-            "file_size": file_size,
-            **result
-        }
+        # 작업 폴더로 스트리밍 저장 (SHA-256 동시 계산)
+        stored = await save_upload(file, suffix=file_ext, directory=ingestion_queue.upload_dir)
+        return await submit_upload(stored, file.filename, replace, session_id)
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"업로드 실패: {str(e)}")
+
+@app.post("/api/upload/raw", status_code=202)
+async def upload_raw_file(
+    request: Request,
+    filename: str = Query(..., description="원본 파일 이름 (확장자로 형식 검사)"),
+    session_id: Optional[str] = Query(None),
+    replace: bool = Query(False)
+):
+    """
+    요청 본문 전체를 파일 내용으로 받는 업로드 (응답은 /api/upload와 같음)
+    multipart 파싱/임시 파일 없이 request.stream()을 받는 대로 작업 폴더에 기록 (디스크 기록 한 번)
+    """
+    session_id = resolve_session_id(session_id)
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(400, f"지원하지 않는 파일 형식: {file_ext}")
+
+    try:
+        stored = await save_stream(
+            request.stream(), suffix=file_ext, directory=ingestion_queue.upload_dir
+        )
+        return await submit_upload(stored, filename, replace, session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"업로드 실패: {str(e)}")
+
+@app.post("/api/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    replace: bool = Form(False)
+):
+    """
+    여러 파일(zip 포함) 업로드 - 파일마다 인덱싱 작업을 등록하고 결과를 끝나는 순서대로 NDJSON으로 전달
+    인덱싱 동시 실행 수는 작업 큐 워커 수(INGEST_WORKERS)로 제한
+
+    이벤트:
+        accepted - 작업 등록 (job_id)
+        rejected - 등록하지 않은 파일 (형식/크기/zip 오류)
+        result   - 작업 완료/실패
+        summary  - 전체 결과 및 처리량 (files/min)
+    """
+    session_id = resolve_session_id(session_id)
+    start = time.perf_counter()
+    loop = asyncio.get_event_loop()
+
+    # 요청 본문은 스트림을 시작하기 전에 모두 디스크로 옮김 (응답 중에는 업로드 파일이 닫힘)
+    accepted: List[Dict[str, Any]] = []
+    events: List[Dict[str, Any]] = []
+    for upload in files:
+        file_ext = os.path.splitext(upload.filename or "")[1].lower()
+        if file_ext != ".zip" and file_ext not in ALLOWED_EXTENSIONS:
+            events.append({"type": "rejected", "filename": upload.filename, "error": f"지원하지 않는 파일 형식: {file_ext}"})
+            continue
+        try:
+            stored = await save_upload(upload, suffix=file_ext, directory=ingestion_queue.upload_dir)
+        except HTTPException as e:
+            events.append({"type": "rejected", "filename": upload.filename, "error": e.detail})
+            continue
+
+        # 작업으로 등록하지 못한 파일은 finally에서 삭제
+        extracted = [(upload.filename, stored)]
+        try:
+            if file_ext == ".zip":
+                extracted = []
+                try:
+                    extracted, skipped = await loop.run_in_executor(
+                        None, extract_zip, stored.path, str(ingestion_queue.upload_dir)
+                    )
+                except ValueError as e:
+                    events.append({"type": "rejected", "filename": upload.filename, "error": str(e)})
+                    continue
+                finally:
+                    stored.remove()
+                events.extend(
+                    {"type": "rejected", "filename": f"{upload.filename}/{name}", "error": reason}
+                    for name, reason in skipped
+                )
+
+            while extracted:
+                filename, item = extracted.pop(0)
+                try:
+                    job = await ingestion_queue.submit(
+                        item.path,
+                        filename,
+                        sha256=item.sha256,
+                        file_size=item.size,
+                        replace=replace,
+                        session_id=session_id
+                    )
+                except Exception as e:
+                    print(f"❌ 인덱싱 작업 등록 실패: {filename}: {e}")
+                    item.remove()
+                    events.append({"type": "rejected", "filename": filename, "error": f"인덱싱 작업 등록 실패: {e}"})
+                    continue
+                if job["status"] not in TERMINAL_STATES:
+                    # 결과를 보내기 전에 작업 목록에서 정리되지 않도록 고정 (generate에서 해제)
+                    ingestion_queue.hold(job["id"])
+                accepted.append(job)
+                events.append({"type": "accepted", "filename": filename, "job_id": job["id"], "status": job["status"]})
+        finally:
+            for _, item in extracted:
+                item.remove()
+
+    print(f"📦 일괄 업로드: {len(accepted)}개 작업 등록, {len(events) - len(accepted)}개 제외")
+
+    async def generate() -> AsyncGenerator[str, None]:
+        for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        counts = {"completed": 0, "failed": 0, "duplicates": 0}
+
+        def result_event(job: Dict[str, Any]) -> str:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+            if job["result"] and job["result"].get("duplicate"):
+                counts["duplicates"] += 1
+            return json.dumps({"type": "result", "job_id": job["id"], **job}, ensure_ascii=False) + "\n"
+
+        # 등록 중에 바로 끝난 작업(중복 등)은 등록 결과를 그대로 사용
+        pending = []
+        for job in accepted:
+            if job["status"] in TERMINAL_STATES:
+                yield result_event(job)
+            else:
+                pending.append(job["id"])
+
+        try:
+            for finished in asyncio.as_completed([ingestion_queue.wait(job_id) for job_id in pending]):
+                job = await finished
+                if job is not None:
+                    yield result_event(job)
+        finally:
+            for job_id in pending:
+                ingestion_queue.release(job_id)
+
+        elapsed = time.perf_counter() - start
+        yield json.dumps({
+            "type": "summary",
+            "total": len(accepted),
+            "rejected": len(events) - len(accepted),
+            **counts,
+            "elapsed": round(elapsed, 3),
+            "files_per_minute": round(len(accepted) / elapsed * 60, 1) if elapsed > 0 else None
+        }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/api/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """인덱싱 작업 상태 (queued / processing / completed / failed)"""
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"작업을 찾을 수 없음: {job_id}")
+    return job
+
+@app.get("/api/upload/jobs/{job_id}/events")
+async def stream_upload_job(job_id: str):
+    """인덱싱 작업 상태 변경을 SSE로 전달 (완료/실패하면 종료)"""
+    if ingestion_queue.get(job_id) is None:
+        raise HTTPException(404, f"작업을 찾을 수 없음: {job_id}")
+
+    async def generate() -> AsyncGenerator[str, None]:
+        async for job in ingestion_queue.watch(job_id):
+            yield sse_event({'type': 'job', **job})
+        yield "data: [COMPLETE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+# ==================== 이어 올리기 업로드 (tus) ====================
+
+def tus_headers(info: Dict[str, Any]) -> Dict[str, str]:
+    """이어 올리기 응답 공통 헤더"""
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(info["offset"]),
+        "Upload-Length": str(info["length"]),
+        "Upload-Expires": formatdate(info["expires_at"], usegmt=True),
+        "Cache-Control": "no-store"
+    }
+
+@app.post("/api/upload/resumable", status_code=201)
+async def create_resumable_upload(
+    upload_length: int = Header(...),
+    upload_metadata: Optional[str] = Header(None)
+):
+    """
+    이어 올리기 업로드 생성
+    Upload-Metadata: filename, sha256(전체 파일 hex), session_id, replace (값은 base64)
+    """
+    info = resumable_uploads.create(upload_length, parse_upload_metadata(upload_metadata))
+    location = f"/api/upload/resumable/{info['id']}"
+    return JSONResponse(
+        {"upload_id": info["id"], "location": location, "offset": 0, "length": info["length"]},
+        status_code=201,
+        headers={"Location": location, **tus_headers(info)}
+    )
+
+@app.head("/api/upload/resumable/{upload_id}")
+async def get_resumable_offset(upload_id: str):
+    """받은 바이트 수 확인 (끊긴 뒤 이어서 보낼 위치)"""
+    return Response(status_code=200, headers=tus_headers(resumable_uploads.get(upload_id)))
+
+@app.patch("/api/upload/resumable/{upload_id}")
+async def patch_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: Optional[str] = Header(None),
+    content_type: Optional[str] = Header(None)
+):
+    """
+    Upload-Offset 위치부터 본문 바이트를 이어 씀 (본문은 청크 단위로 디스크에 기록)
+    Upload-Checksum: sha256 <base64> 로 이번 구간 검증 가능 (불일치 시 460)
+    """
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(415, "Content-Type은 application/offset+octet-stream이어야 합니다")
+    info = await resumable_uploads.append(
+        upload_id,
+        upload_offset,
+        request.stream(),
+        checksum=parse_checksum(upload_checksum)
+    )
+    return Response(status_code=204, headers=tus_headers(info))
+
+@app.post("/api/upload/resumable/{upload_id}/finalize", status_code=202)
+async def finalize_resumable_upload(upload_id: str):
+    """전체 파일의 SHA-256을 검증하고 인덱싱 작업 등록 (응답은 /api/upload와 같음)"""
+    info, path, size = await resumable_uploads.finalize(upload_id, ingestion_queue.upload_dir)
+    try:
+        job = await ingestion_queue.submit(
+            path,
+            info["filename"],
+            sha256=info["sha256"],
+            file_size=size,
+            replace=info["replace"],
+            session_id=resolve_session_id(info["session_id"])
+        )
     except Exception as e:
-        if 'tmp_path' in locals():
+        print(f"❌ 인덱싱 작업 등록 실패: {info['filename']} (upload={upload_id}): {e}")
+        # 옮긴 파일이 고아가 되지 않도록 업로드 상태를 되돌려 다시 finalize할 수 있게 함
+        try:
+            resumable_uploads.restore(info, path)
+        except OSError as restore_error:
+            print(f"⚠️ 이어 올리기 업로드 복구 실패 (upload={upload_id}): {restore_error}")
             try:
-                os.unlink(tmp_path)
-            except:
+                os.unlink(path)
+            except FileNotFoundError:
                 pass
-        raise HTTPException(500, f"업로드 실패: {str(e)}")
+        raise HTTPException(500, f"인덱싱 작업 등록 실패: {str(e)}")
+    duplicate = bool(job["result"] and job["result"].get("duplicate"))
+    return {
+        "success": job["status"] != "failed",
+        "message": "이미 업로드된 파일입니다" if duplicate else "인덱싱 대기 중",
+        "job_id": job["id"],
+        **job
+    }
+
+@app.delete("/api/upload/resumable/{upload_id}", status_code=204)
+async def delete_resumable_upload(upload_id: str):
+    """이어 올리기 업로드 취소"""
+    resumable_uploads.get(upload_id)
+    resumable_uploads.remove(upload_id)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
 
 # ==================== 채팅 ====================
 
+def resolve_session_id(session_id: Optional[str]) -> str:
+    """세션 ID 정규화 (생략 시 기본 세션)"""
+    if not session_id or not session_id.strip():
+        return DEFAULT_SESSION_ID
+    session_id = session_id.strip()
+    if len(session_id) > 128:
+        raise HTTPException(400, "session_id는 128자 이하여야 합니다")
+    return session_id
+
 def parse_message(message: str) -> tuple[str, List[str]]:
     """
     메시지에서 AI 지명 파싱
@@ -154,14 +623,95 @@ def parse_message(message: str) -> tuple[str, List[str]]:
     
     return clean_message, mentioned_ais
 
+# AI별 응답 타임아웃 (초) - 느린 AI 하나가 전체 응답을 붙잡지 않도록
+AI_RESPONSE_TIMEOUT = float(os.getenv("AI_RESPONSE_TIMEOUT", "90"))
+AI_RESPONSE_TIMEOUTS = {
+    ai_name: float(os.getenv(f"{ai_name.upper()}_RESPONSE_TIMEOUT", AI_RESPONSE_TIMEOUT))
+    for ai_name in ("GPT", "Claude", "Gemini")
+}
+
+def select_ais(mentioned_ais: List[str]) -> List[str]:
+    """
+    지명된 AI가 있으면 그대로, 없으면 선택 정책으로 1~3개 AI 선택
+    (서킷이 열린 AI 제외, 빠르고 오류가 적은 AI 우선)
+    """
+    if mentioned_ais:
+        # 중복 지명 제거 (순서 유지)
+        return list(dict.fromkeys(mentioned_ais))
+
+    return persona_selector.select(ai_manager.get_available_ais())
+
+def render_history(session_id: str) -> str:
+    """세션 히스토리를 토큰 예산 안에서 렌더링 (턴마다 한 번, 선택된 AI가 공유)"""
+    return ai_manager.format_history(
+        conversation_store.window(session_id, CHAT_HISTORY_WINDOW),
+        session_id=session_id,
+        summary=conversation_summarizer.get_summary(session_id)
+    )
+
+async def get_ai_response(
+    ai_name: str,
+    clean_message: str,
+    history_text: str,
+    file_search_context: Optional[dict],
+    deadline: Deadline
+) -> Dict[str, Any]:
+    """
+    단일 AI 응답 생성 (AI별 타임아웃과 요청 데드라인 중 짧은 쪽 적용)
+    실패/타임아웃 시에도 예외 대신 error(오류 종류)가 표시된 응답을 반환 (히스토리에는 저장하지 않음)
+    """
+    timeout = deadline.cap(AI_RESPONSE_TIMEOUTS.get(ai_name, AI_RESPONSE_TIMEOUT))
+    error = None
+
+    try:
+        response = await asyncio.wait_for(
+            ai_manager.get_response(
+                ai_name,
+                clean_message,
+                context=None,  # 기존 문자열 컨텍스트는 사용 안함
+                file_search_context=file_search_context,  # File Search Store 컨텍스트
+                history_text=history_text,
+                deadline=deadline
+            ),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        print(f"⏱️ {ai_name} 응답 시간 초과 ({timeout:.0f}초)")
+        error = "timeout"
+        response = f"{ai_name} 응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요."
+    except AIResponseError as e:
+        print(f"⚠️ {ai_name} 응답 실패 ({e.reason}): {e.__cause__ or e}")
+        error = e.reason
+        response = str(e)
+    except Exception as e:
+        print(f"⚠️ {ai_name} 응답 실패: {e}")
+        error = str(e)
+        response = f"{ai_name} 오류: {str(e)}"
+
+    result = {
+        "ai_name": ai_name,
+        "response": response,
+        "timestamp": datetime.now().isoformat(),
+        "has_context": file_search_context is not None
+    }
+    if error:
+        result["error"] = error
+    return result
+
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_request_timeout: Optional[str] = Header(None)):
     """
     채팅 요청 처리 (일반 응답)
+    선택된 AI들을 동시에 호출하고, 응답은 선택 순서대로 반환
+    X-Request-Timeout 헤더(초) 또는 REQUEST_DEADLINE 안에서 RAG와 생성을 마침
     """
+    deadline = Deadline.from_header(x_request_timeout)
     try:
         # 메시지 파싱
         clean_message, mentioned_ais = parse_message(request.message)
+        session_id = resolve_session_id(request.session_id)
+        await conversation_store.ensure_loaded(session_id)
+        await conversation_summarizer.ensure_loaded(session_id)
         
         # 사용자 메시지 히스토리에 추가
         user_message = {
@@ -169,86 +719,128 @@ async def chat(request: ChatRequest):
             "message": request.message,
             "timestamp": datetime.now().isoformat()
         }
-        chat_history.append(user_message)
+        conversation_store.append(session_id, user_message)
         
         # File Search 컨텍스트 가져오기
         file_search_context = None
         if request.include_context:
-            file_search_context = await file_search_manager.get_context(clean_message)
+            # 검색이 느리면 컨텍스트 없이 진행
+            file_search_context = await file_search_manager.get_context(clean_message, deadline=deadline)
 
-        # AI 응답 생성
-        responses = []
+        # AI 선택 (지명된 AI 또는 랜덤 1~3개)
+        selected_ais = select_ais(mentioned_ais)
 
-        if mentioned_ais:
-            # 지명된 AI만 응답
-            for ai_name in mentioned_ais:
-                response = await ai_manager.get_response(
-                    ai_name,
-                    clean_message,
-                    context=None,  # 기존 문자열 컨텍스트는 사용 안함
-                    history=chat_history,
-                    file_search_context=file_search_context  # File Search Store 컨텍스트
-                )
-                responses.append({
-                    "ai_name": ai_name,
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "has_context": file_search_context is not None
-                })
-        else:
-            # 랜덤으로 1~3개 AI 선택
-            import random
-            available_ais = ai_manager.get_available_ais()
-            selected_ais = random.sample(available_ais, k=random.randint(1, len(available_ais)))
-
-            for ai_name in selected_ais:
-                response = await ai_manager.get_response(
-                    ai_name,
-                    clean_message,
-                    context=None,
-                    history=chat_history,
-                    file_search_context=file_search_context
-                )
-                responses.append({
-                    "ai_name": ai_name,
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "has_context": file_search_context is not None
-                })
+        # 모든 AI를 동시에 호출 - gather는 입력 순서대로 결과를 반환
+        history_text = render_history(session_id)
+        responses = await asyncio.gather(*[
+            get_ai_response(ai_name, clean_message, history_text, file_search_context, deadline)
+            for ai_name in selected_ais
+        ])
         
-        # 응답 히스토리에 추가
+        # 응답 히스토리에 추가 (선택 순서 유지, 실패한 응답은 제외)
         for resp in responses:
-            chat_history.append({
+            if resp.get("error"):
+                continue
+            conversation_store.append(session_id, {
                 "type": "ai",
                 "ai_name": resp["ai_name"],
                 "message": resp["response"],
                 "timestamp": resp["timestamp"]
             })
+
+        # 오래된 대화 요약 갱신 (백그라운드)
+        conversation_summarizer.schedule(session_id)
         
         return {
             "success": True,
+            "session_id": session_id,
             "user_message": clean_message,
             "mentioned_ais": mentioned_ais,
-            "responses": responses
+            "responses": list(responses)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"채팅 처리 실패: {str(e)}")
 
 # ==================== 스트리밍 채팅 ====================
 
+def sse_event(payload: Dict[str, Any]) -> str:
+    """SSE 이벤트 한 건 직렬화"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def multiplex_streams(
+    selected_ais: List[str],
+    clean_message: str,
+    history_text: str,
+    file_search_context: Optional[dict],
+    full_responses: Dict[str, List[str]],
+    deadline: Deadline,
+    completed: Set[str]
+) -> AsyncGenerator[str, None]:
+    """
+    선택된 모든 AI 스트림을 동시에 열고, 도착하는 순서대로 청크를 섞어서 전달
+    각 AI의 텍스트는 full_responses[ai_name]에 순서대로 누적,
+    오류 없이 끝까지 받은 AI만 completed에 추가
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(ai_name: str):
+        """AI 하나의 스트림을 읽어 공용 큐로 전달"""
+        try:
+            await queue.put({"type": "start", "ai_name": ai_name})
+            async for chunk in ai_manager.get_response_stream(
+                ai_name,
+                clean_message,
+                context=None,
+                file_search_context=file_search_context,
+                history_text=history_text,
+                deadline=deadline
+            ):
+                full_responses[ai_name].append(chunk)
+                await queue.put({"type": "chunk", "ai_name": ai_name, "text": chunk})
+            completed.add(ai_name)
+        except Exception as e:
+            print(f"⚠️ {ai_name} 스트리밍 실패: {e}")
+            await queue.put({"type": "error", "ai_name": ai_name, "message": str(e)})
+        finally:
+            await queue.put({"type": "done", "ai_name": ai_name})
+
+    tasks = [asyncio.create_task(pump(ai_name)) for ai_name in selected_ais]
+    remaining = len(tasks)
+
+    try:
+        while remaining:
+            event = await queue.get()
+            if event["type"] == "done":
+                remaining -= 1
+            yield sse_event(event)
+    finally:
+        # 클라이언트 연결 종료 등으로 중단되면 남은 스트림 정리
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
 @app.post("/api/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, x_request_timeout: Optional[str] = Header(None)):
     """
     채팅 요청 처리 (스트리밍 응답)
+    stream_mode="multiplex"이면 모든 AI를 동시에 스트리밍 (이벤트는 ai_name으로 구분)
+    요청 데드라인은 각 AI의 첫 응답까지 적용 (시작된 답변은 끝까지 전달)
     """
+    session_id = resolve_session_id(request.session_id)
+    deadline = Deadline.from_header(x_request_timeout)
+
     async def generate():
         try:
             # 메시지 파싱
             clean_message, mentioned_ais = parse_message(request.message)
+            await conversation_store.ensure_loaded(session_id)
+            await conversation_summarizer.ensure_loaded(session_id)
             
             # 사용자 메시지 히스토리에 추가
-            chat_history.append({
+            conversation_store.append(session_id, {
                 "type": "user",
                 "message": request.message,
                 "timestamp": datetime.now().isoformat()
@@ -257,64 +849,225 @@ async def chat_stream(request: ChatRequest):
             # File Search 컨텍스트
             file_search_context = None
             if request.include_context:
-                file_search_context = await file_search_manager.get_context(clean_message)
+                file_search_context = await file_search_manager.get_context(clean_message, deadline=deadline)
 
             # AI 선택
-            if mentioned_ais:
-                selected_ais = mentioned_ais
-            else:
-                import random
-                available_ais = ai_manager.get_available_ais()
-                selected_ais = random.sample(available_ais, k=random.randint(1, len(available_ais)))
+            selected_ais = select_ais(mentioned_ais)
 
-            # 각 AI별로 스트리밍 응답
-            for ai_name in selected_ais:
-                yield f"data: {json.dumps({'type': 'start', 'ai_name': ai_name})}\n\n"
+            if request.stream_mode == "multiplex":
+                # 모든 AI 동시 스트리밍
+                full_responses: Dict[str, List[str]] = {ai_name: [] for ai_name in selected_ais}
+                completed: Set[str] = set()
+                history_text = render_history(session_id)
 
-                full_response = ""
-                async for chunk in ai_manager.get_response_stream(
-                    ai_name,
+                async for event in multiplex_streams(
+                    selected_ais,
                     clean_message,
-                    context=None,
-                    history=chat_history,
-                    file_search_context=file_search_context
+                    history_text,
+                    file_search_context,
+                    full_responses,
+                    deadline,
+                    completed
                 ):
-                    full_response += chunk
-                    yield f"data: {json.dumps({'type': 'chunk', 'ai_name': ai_name, 'text': chunk})}\n\n"
-
-                yield f"data: {json.dumps({'type': 'done', 'ai_name': ai_name})}\n\n"
-                
-                # 히스토리에 추가
-                chat_history.append({
-                    "type": "ai",
-                    "ai_name": ai_name,
-                    "message": full_response,
-                    "timestamp": datetime.now().isoformat()
-                })
+                    yield event
+
+                # 히스토리에 추가 (선택 순서 유지, 실패했거나 빈 응답은 제외)
+                for ai_name in selected_ais:
+                    full_response = "".join(full_responses[ai_name])
+                    if ai_name not in completed or not full_response.strip():
+                        continue
+                    conversation_store.append(session_id, {
+                        "type": "ai",
+                        "ai_name": ai_name,
+                        "message": full_response,
+                        "timestamp": datetime.now().isoformat()
+                    })
+            else:
+                # 각 AI별로 순서대로 스트리밍 응답
+                for ai_name in selected_ais:
+                    if deadline.expired():
+                        # 남은 예산이 없으면 나머지 AI는 건너뜀
+                        yield sse_event({'type': 'error', 'ai_name': ai_name, 'message': '요청 시간이 초과되었습니다'})
+                        continue
+
+                    yield sse_event({'type': 'start', 'ai_name': ai_name})
+
+                    full_response = ""
+                    try:
+                        async for chunk in ai_manager.get_response_stream(
+                            ai_name,
+                            clean_message,
+                            context=None,
+                            file_search_context=file_search_context,
+                            # 앞선 AI의 답변까지 포함 (렌더링된 메시지는 캐시 재사용)
+                            history_text=render_history(session_id),
+                            deadline=deadline
+                        ):
+                            full_response += chunk
+                            yield sse_event({'type': 'chunk', 'ai_name': ai_name, 'text': chunk})
+                    except Exception as e:
+                        print(f"⚠️ {ai_name} 스트리밍 실패: {e}")
+                        yield sse_event({'type': 'error', 'ai_name': ai_name, 'message': str(e)})
+                        full_response = ""
+
+                    yield sse_event({'type': 'done', 'ai_name': ai_name})
+                    
+                    # 히스토리에 추가 (실패했거나 빈 응답은 제외)
+                    if not full_response.strip():
+                        continue
+                    conversation_store.append(session_id, {
+                        "type": "ai",
+                        "ai_name": ai_name,
+                        "message": full_response,
+                        "timestamp": datetime.now().isoformat()
+                    })
             
+            # 오래된 대화 요약 갱신 (백그라운드)
+            conversation_summarizer.schedule(session_id)
+
             yield "data: [COMPLETE]\n\n"
             
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'message': str(e)})
     
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 # ==================== 대화 히스토리 ====================
 
+def strip_file_info(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """file_info 페이로드 제외한 메시지 목록"""
+    return [
+        {k: v for k, v in msg.items() if k != "file_info"} if "file_info" in msg else msg
+        for msg in messages
+    ]
+
 @app.get("/api/history")
-async def get_history():
-    """대화 히스토리 조회"""
-    return {
-        "success": True,
-        "history": chat_history,
-        "count": len(chat_history)
-    }
+async def get_history(
+    session_id: Optional[str] = None,
+    since: Optional[int] = Query(None, description="이 ID 이후의 메시지만 (증분 조회)"),
+    before: Optional[int] = Query(None, description="이 ID 이전의 메시지 (이전 페이지)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="최대 메시지 수"),
+    include_file_info: bool = True,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    대화 히스토리 조회
+    - since: 증분 조회 (since 이후 메시지를 오래된 순으로 limit개, next_cursor로 이어서 조회)
+    - before: 이전 페이지 (before 이전 메시지 중 최근 limit개)
+    - 변경이 없으면 ETag/If-None-Match로 304 응답
+    - since 커서가 메모리 창(세션당 최근 메시지) 밖이면 놓친 메시지가 있으므로 410 (커서 없이 다시 조회)
+    - before 페이지가 메모리 창 밖으로 넘어가면 영구 저장소에서 이어서 조회
+    """
+    session_id = resolve_session_id(session_id)
+    await conversation_store.ensure_loaded(session_id)
+
+    floor_id = conversation_store.floor_id(session_id)
+    if since is not None and since < floor_id:
+        raise HTTPException(410, "since 커서가 보관 범위를 벗어났습니다. 커서 없이 다시 조회하세요")
+
+    # 세션 + 세션 버전 + 조회 조건이 같으면 응답도 같음
+    session_tag = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:16]
+    etag = (
+        f'W/"{session_tag}-{conversation_store.version(session_id)}'
+        f'-{since}-{before}-{limit}-{int(include_file_info)}"'
+    )
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # limit+1개를 읽어서 다음 페이지 존재 여부 확인
+    fetch = limit + 1 if limit else None
+    has_more = False
+    if since is not None:
+        history = conversation_store.since(session_id, since, fetch)
+        if limit and len(history) > limit:
+            history = history[:limit]
+            has_more = True
+    else:
+        if before is not None:
+            history = conversation_store.before(session_id, before, fetch)
+        else:
+            history = conversation_store.window(session_id, fetch)
+
+        # 메모리 창을 다 읽었는데 창 밖에 이전 메시지가 남아 있으면 DB에서 이어서 읽음
+        if (fetch is None or len(history) < fetch) and floor_id:
+            if history_persistence is not None and before is not None:
+                older = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    history_persistence.load_before,
+                    session_id,
+                    history[0]["id"] if history else before,
+                    fetch - len(history) if fetch else None
+                )
+                history = older + history
+            elif history_persistence is not None:
+                # 첫 페이지는 메모리 창에서만, 이전 페이지 커서로 DB 조회
+                has_more = bool(history)
+
+        if limit and len(history) > limit:
+            history = history[1:]
+            has_more = True
+
+    if not include_file_info:
+        history = strip_file_info(history)
+
+    if since is not None:
+        # 다음 증분 조회 커서 (새 메시지가 없으면 그대로 유지)
+        next_cursor = history[-1]["id"] if history else since
+    else:
+        # 이전 페이지 커서
+        next_cursor = history[0]["id"] if history and has_more else None
+
+    return JSONResponse(
+        {
+            "success": True,
+            "session_id": session_id,
+            "history": history,
+            "count": len(history),
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        },
+        headers={"ETag": etag}
+    )
+
+@app.get("/api/history/export")
+async def export_history(session_id: Optional[str] = None):
+    """
+    대화 히스토리 전체 내보내기 (NDJSON 스트리밍)
+    영구 저장소가 있으면 DB에서 페이지 단위로 읽어 메모리 창 밖의 메시지까지 포함
+    """
+    session_id = resolve_session_id(session_id)
+
+    async def generate():
+        if history_persistence is None:
+            await conversation_store.ensure_loaded(session_id)
+            for msg in conversation_store.window(session_id):
+                yield json.dumps(msg, ensure_ascii=False, default=str) + "\n"
+            return
+
+        loop = asyncio.get_event_loop()
+        after_row = 0
+        while True:
+            rows = await loop.run_in_executor(
+                None, history_persistence.load_page, session_id, after_row
+            )
+            if not rows:
+                break
+            # DB에는 이미 JSON으로 저장되어 있으므로 재직렬화 없이 전달
+            yield "".join(payload + "\n" for _, payload in rows)
+            after_row = rows[-1][0]
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="history-{session_id}.ndjson"'}
+    )
 
 @app.delete("/api/history")
-async def clear_history():
+async def clear_history(session_id: Optional[str] = None):
     """대화 히스토리 초기화"""
-    global chat_history
-    chat_history = []
+    session_id = resolve_session_id(session_id)
+    conversation_store.clear(session_id)
+    conversation_summarizer.clear(session_id)
     return {
         "success": True,
         "message": "대화 히스토리가 초기화되었습니다"
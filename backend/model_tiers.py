@@ -0,0 +1,126 @@
+"""
+Model Tiers - 턴 복잡도에 따른 페르소나별 모델 등급 선택
+인사·짧은 잡담은 빠른 모델(fast), 문서 기반 답변·긴 질문·분석 요청은 상위 모델(full)
+페르소나 시스템 프롬프트는 같으므로 말투는 그대로 유지
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from retrieval_gate import SMALL_TALK_PATTERNS
+from token_utils import estimate_tokens
+
+FAST = "fast"
+FULL = "full"
+
+# 페르소나별 기본 모델 ({AI}_FAST_MODEL, {AI}_FULL_MODEL로 변경 가능)
+DEFAULT_MODELS: Dict[str, Dict[str, str]] = {
+    "GPT": {FAST: "gpt-4o-mini", FULL: "gpt-4o"},
+    "Claude": {FAST: "claude-3-5-haiku-latest", FULL: "claude-sonnet-4-20250514"},
+    "Gemini": {FAST: "gemini-2.5-flash-lite", FULL: "gemini-2.5-flash"},
+}
+
+# 상위 모델이 필요한 요청 (설명·분석·비교·코드·작성 등)
+COMPLEX_PATTERNS = [
+    r"(왜|설명|분석|비교|차이|장단점|원리|이유|방법|단계|전략|계획|설계|구현|최적화|증명|추천해|검토)",
+    r"(코드|함수|에러|오류|버그|쿼리|알고리즘|수식|계산)",
+    r"(작성해|써 ?줘|만들어 ?줘|번역|요약|정리해)",
+    r"```",
+    r"\b(explain|analy[sz]e|compare|why|design|implement|debug|code|write|translate|summari[sz]e|step)\b",
+]
+
+# 앞 대화에 기대는 짧은 후속 질문
+FOLLOW_UP_PATTERN = r"^(그럼|그러면|그래서|그건|그거|그게|이건|이거|저건|더|또|아까|방금|위에|and|so|then|what about)\b"
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """모델 등급"""
+
+    name: str
+    model: str
+    max_tokens: int
+
+
+class TierClassifier:
+    """로컬 휴리스틱 복잡도 분류기 (네트워크 호출 없음)"""
+
+    def __init__(self):
+        # 모드: auto(휴리스틱) / fast(항상 빠른 모델) / full(항상 상위 모델)
+        self.mode = os.getenv("MODEL_TIER_MODE", "auto").lower()
+        # 이 토큰 수를 넘는 질문은 상위 모델
+        self.full_min_tokens = int(os.getenv("MODEL_TIER_FULL_MIN_TOKENS", "80"))
+        # 이 토큰 수 이하이고 복잡한 요청이 아니면 빠른 모델
+        self.fast_max_tokens = int(os.getenv("MODEL_TIER_FAST_MAX_TOKENS", "30"))
+        # 히스토리가 이보다 길면 짧은 후속 질문도 상위 모델
+        self.follow_up_history_tokens = int(os.getenv("MODEL_TIER_FOLLOW_UP_HISTORY_TOKENS", "600"))
+
+        fast_max_output = int(os.getenv("FAST_TIER_MAX_TOKENS", "800"))
+        full_max_output = int(os.getenv("FULL_TIER_MAX_TOKENS", "3000"))
+        self.tiers: Dict[str, Dict[str, ModelTier]] = {
+            ai_name: {
+                FAST: ModelTier(FAST, os.getenv(f"{ai_name.upper()}_FAST_MODEL", models[FAST]), fast_max_output),
+                FULL: ModelTier(FULL, os.getenv(f"{ai_name.upper()}_FULL_MODEL", models[FULL]), full_max_output),
+            }
+            for ai_name, models in DEFAULT_MODELS.items()
+        }
+        self.counts = {FAST: 0, FULL: 0}
+
+    def classify(
+        self,
+        message: str,
+        has_document_context: bool = False,
+        history_text: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """(등급, 이유)"""
+        if self.mode in (FAST, FULL):
+            return self.mode, "고정 설정"
+
+        text = message.strip().lower()
+        tokens = estimate_tokens(text)
+
+        if has_document_context:
+            return FULL, "문서 컨텍스트 사용"
+        if tokens > self.full_min_tokens:
+            return FULL, f"긴 질문 ({tokens} 토큰)"
+        if any(re.search(pattern, text) for pattern in COMPLEX_PATTERNS):
+            return FULL, "복잡한 요청"
+        if any(re.search(pattern, text) for pattern in SMALL_TALK_PATTERNS):
+            return FAST, "일상 대화"
+        if (
+            re.search(FOLLOW_UP_PATTERN, text)
+            and estimate_tokens(history_text) > self.follow_up_history_tokens
+        ):
+            return FULL, "긴 대화의 후속 질문"
+        if tokens <= self.fast_max_tokens:
+            return FAST, "짧은 메시지"
+        return FULL, "기본값"
+
+    def select(
+        self,
+        ai_name: str,
+        message: str,
+        has_document_context: bool = False,
+        history_text: Optional[str] = None
+    ) -> ModelTier:
+        """페르소나의 이번 턴 모델 등급"""
+        tier_name, reason = self.classify(message, has_document_context, history_text)
+        self.counts[tier_name] += 1
+        tier = self.tiers[ai_name][tier_name]
+        print(f"🎚️ {ai_name} 모델 등급: {tier_name} ({tier.model}) - {reason}")
+        return tier
+
+    def full_tier(self, ai_name: str) -> ModelTier:
+        return self.tiers[ai_name][FULL]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "counts": dict(self.counts),
+            "models": {
+                ai_name: {name: tier.model for name, tier in tiers.items()}
+                for ai_name, tiers in self.tiers.items()
+            }
+        }
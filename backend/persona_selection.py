@@ -0,0 +1,208 @@
+"""
+Persona Selection - @지명이 없을 때 응답할 AI 선택 정책
+공급자별 첫 토큰 지연(TTFT)과 오류율의 EWMA를 추적해서
+빠르고 정상인 AI를 더 자주 고르되, 일정 비율은 고르게 섞어 페르소나 다양성을 유지
+"""
+
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+class ProviderHealth:
+    """
+    AI별 지연 시간/오류율 EWMA (retry_policy가 시도마다 기록)
+    스트리밍의 첫 토큰 지연(TTFT)과 일반 호출의 전체 응답 시간은 성격이 달라 따로 추적
+    """
+
+    def __init__(self, alpha: Optional[float] = None):
+        # 최근 값 반영 비율 (0~1, 클수록 최근 값 위주)
+        self.alpha = alpha or float(os.getenv("PERSONA_EWMA_ALPHA", "0.3"))
+        self.ttft: Dict[str, float] = {}
+        self.response_time: Dict[str, float] = {}
+        self.error_rate: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}
+
+    def _update(self, table: Dict[str, float], ai_name: str, value: float):
+        previous = table.get(ai_name)
+        table[ai_name] = value if previous is None else self.alpha * value + (1 - self.alpha) * previous
+
+    def tracker(self, ai_name: str) -> "HealthTracker":
+        """retry_policy에 넘길 AI별 기록기"""
+        return HealthTracker(self, ai_name)
+
+    def record_success(self, ai_name: str, latency: float, first_token: bool = True):
+        """성공한 시도 (first_token=True면 스트림의 첫 청크까지, False면 일반 호출의 전체 응답 시간)"""
+        self._update(self.ttft if first_token else self.response_time, ai_name, latency)
+        self._update(self.error_rate, ai_name, 0.0)
+        self.samples[ai_name] = self.samples.get(ai_name, 0) + 1
+
+    def record_failure(self, ai_name: str, latency: float = 0.0):
+        """공급자 장애성 오류로 실패한 시도"""
+        self._update(self.error_rate, ai_name, 1.0)
+        self.samples[ai_name] = self.samples.get(ai_name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            ai_name: {
+                "ttft_ewma": round(self.ttft[ai_name], 3) if ai_name in self.ttft else None,
+                "response_time_ewma": (
+                    round(self.response_time[ai_name], 3) if ai_name in self.response_time else None
+                ),
+                "error_ewma": round(self.error_rate.get(ai_name, 0.0), 3),
+                "samples": count
+            }
+            for ai_name, count in self.samples.items()
+        }
+
+
+class HealthTracker:
+    """특정 AI에 대한 ProviderHealth 기록기 (CircuitBreaker와 같은 기록 인터페이스)"""
+
+    def __init__(self, health: ProviderHealth, ai_name: str):
+        self.health = health
+        self.ai_name = ai_name
+
+    def record_success(self, latency: float, first_token: bool = True):
+        self.health.record_success(self.ai_name, latency, first_token)
+
+    def record_failure(self, latency: float = 0.0):
+        self.health.record_failure(self.ai_name, latency)
+
+
+class SelectionPolicy(ABC):
+    """선택 정책 기본 클래스 - select()를 구현해서 SELECTION_POLICIES에 등록"""
+
+    name = "base"
+
+    @abstractmethod
+    def select(self, available_ais: List[str], rng: random.Random) -> List[str]:
+        """응답할 AI 목록 (순서 = 응답 순서)"""
+
+    def stats(self, available_ais: List[str]) -> Dict[str, Any]:
+        return {}
+
+
+class UniformSelectionPolicy(SelectionPolicy):
+    """기존 방식: 1~N개를 균등 확률로 랜덤 선택"""
+
+    name = "uniform"
+
+    def select(self, available_ais: List[str], rng: random.Random) -> List[str]:
+        if not available_ais:
+            return []
+        return rng.sample(available_ais, k=rng.randint(1, len(available_ais)))
+
+
+class LatencyAwareSelectionPolicy(SelectionPolicy):
+    """
+    지연/오류 가중 선택
+    가중치 = (1 - 오류율 EWMA) / 지연 EWMA 를 정규화한 뒤 exploration 비율만큼 균등 분포와 섞음
+    지연은 한 종류만 비교: 모두 TTFT 기록이 있으면 TTFT, 아니면 모두 전체 응답 시간 기록이 있으면 그것,
+    둘 다 아니면 TTFT (기록 없는 AI는 평균값으로 채움)
+    응답할 AI 수는 기존처럼 1~N 중 랜덤, 뽑힌 순서가 응답 순서 (빠른 AI가 먼저 나오기 쉬움)
+    """
+
+    name = "latency"
+
+    def __init__(self, health: ProviderHealth):
+        self.health = health
+        # 균등 선택 비율 (0이면 가중치만, 1이면 기존 균등 선택과 같음)
+        self.exploration = float(os.getenv("PERSONA_EXPLORATION", "0.2"))
+        # 기록이 없는 AI의 기본 TTFT (초) 및 하한
+        self.default_latency = float(os.getenv("PERSONA_DEFAULT_TTFT", "2.0"))
+        self.min_latency = 0.05
+
+    def latency_table(self, available_ais: List[str]) -> Dict[str, float]:
+        """비교에 쓸 지연 기록 (TTFT와 전체 응답 시간을 섞지 않음)"""
+        for table in (self.health.ttft, self.health.response_time):
+            if all(ai_name in table for ai_name in available_ais):
+                return table
+        return self.health.ttft
+
+    def weights(self, available_ais: List[str]) -> Dict[str, float]:
+        """AI별 선택 가중치 (합계 1)"""
+        if not available_ais:
+            return {}
+        table = self.latency_table(available_ais)
+        known = [table[ai] for ai in available_ais if ai in table]
+        # 기록이 없는 AI는 다른 AI들의 평균으로 취급 (처음부터 밀려나지 않도록)
+        prior = sum(known) / len(known) if known else self.default_latency
+
+        scores = {}
+        for ai_name in available_ais:
+            latency = max(table.get(ai_name, prior), self.min_latency)
+            success = 1.0 - self.health.error_rate.get(ai_name, 0.0)
+            scores[ai_name] = max(success, 0.0) / latency
+
+        total = sum(scores.values())
+        uniform = 1.0 / len(available_ais)
+        if total <= 0:
+            return {ai_name: uniform for ai_name in available_ais}
+        return {
+            ai_name: (1 - self.exploration) * score / total + self.exploration * uniform
+            for ai_name, score in scores.items()
+        }
+
+    def select(self, available_ais: List[str], rng: random.Random) -> List[str]:
+        if not available_ais:
+            return []
+        k = rng.randint(1, len(available_ais))
+        weights = self.weights(available_ais)
+
+        # 가중치 비복원 추출
+        remaining = list(available_ais)
+        selected = []
+        while remaining and len(selected) < k:
+            total = sum(weights[ai_name] for ai_name in remaining)
+            point = rng.random() * total
+            for ai_name in remaining:
+                point -= weights[ai_name]
+                if point <= 0:
+                    break
+            selected.append(ai_name)
+            remaining.remove(ai_name)
+        return selected
+
+    def stats(self, available_ais: List[str]) -> Dict[str, Any]:
+        return {"weights": {ai: round(w, 3) for ai, w in self.weights(available_ais).items()}}
+
+
+# 정책 이름 -> 생성 함수 (새 정책은 여기에 등록)
+SELECTION_POLICIES = {
+    UniformSelectionPolicy.name: lambda health: UniformSelectionPolicy(),
+    LatencyAwareSelectionPolicy.name: LatencyAwareSelectionPolicy,
+}
+
+
+class PersonaSelector:
+    """선택 정책 + 난수 생성기 (seed를 주면 선택 결과가 재현됨)"""
+
+    def __init__(
+        self,
+        health: ProviderHealth,
+        policy: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        policy = policy or os.getenv("PERSONA_SELECTION_POLICY", "latency")
+        if policy not in SELECTION_POLICIES:
+            print(f"⚠️ 알 수 없는 선택 정책 '{policy}', latency 사용")
+            policy = LatencyAwareSelectionPolicy.name
+        self.health = health
+        self.policy: SelectionPolicy = SELECTION_POLICIES[policy](health)
+
+        if seed is None and os.getenv("PERSONA_SELECTION_SEED"):
+            seed = int(os.getenv("PERSONA_SELECTION_SEED"))
+        self.rng = random.Random(seed)
+
+    def select(self, available_ais: List[str]) -> List[str]:
+        """응답할 AI 목록 (순서 = 응답 순서)"""
+        return self.policy.select(list(available_ais), self.rng)
+
+    def stats(self, available_ais: List[str]) -> Dict[str, Any]:
+        return {
+            "policy": self.policy.name,
+            "providers": self.health.stats(),
+            **self.policy.stats(list(available_ais))
+        }
@@ -0,0 +1,136 @@
+"""
+Prompt Builder - 공급자 측 프롬프트 프리픽스 캐시를 고려한 프롬프트 구성
+변하지 않는 부분부터 순서대로 배치: 페르소나 → 지침 → 문서 컨텍스트 → 히스토리 → 질문
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from token_utils import estimate_tokens
+
+
+# 페르소나 시스템 프롬프트 (모듈 로드 시 한 번만 구성)
+PERSONAS: Dict[str, str] = {
+    "GPT": "당신은 젊고 스마트한 남자 AI 어시스턴트입니다. 말투는 젊은 박사처럼 현대적이고 똑부러지며 명확하게 답변합니다. '~습니다', '~입니다' 같은 딱딱한 표현보다는 '~네요', '~예요', '~거든요' 같은 자연스러운 구어체를 사용하세요. 전문적이지만 친근하게, 자신감 있게 답변하세요.",
+    "Claude": "당신은 젊고 활기찬 여자 AI 어시스턴트입니다. 밝고 긍정적인 에너지를 가지고 있으며, 이모티콘(😊, ✨, 💡, 🎉, 👍 등)을 자연스럽게 사용합니다. 말투는 친근하고 다정하며 '~해요!', '~네요~', '~할게요!' 같은 밝은 어조를 사용하세요. 열정적이고 도움이 되고 싶어하는 성격을 표현하되, 과하지 않게 자연스럽게 답변하세요.",
+    "Gemini": "당신은 연륜 있고 지혜로운 노년의 현자입니다. 오랜 경험과 깊은 통찰력을 바탕으로 답변하며, 말투는 점잖고 무게감 있습니다. '~하시게', '~하네', '~이지', '~하오' 같은 어르신 특유의 말투를 사용하세요. 차분하고 사려 깊게, 때로는 인생의 지혜를 담아 답변하되, 이해하기 쉽게 설명하세요. 권위적이지 않고 따뜻하며 포용력 있는 태도를 유지하세요.",
+}
+
+# 문서 활용 지침 (문서 유무와 관계없이 항상 같은 위치에 두어 프리픽스를 고정)
+INSTRUCTIONS = """**중요 지침:**
+- <참고 문서 내용>이 주어지면 참고용으로만 사용하세요. 사용자의 질문이 문서 내용과 관련이 있을 때만 활용하세요.
+- 질문이 일반적인 내용(인사, 날씨, 일상 대화 등)이라면 문서 내용을 무시하고 자연스럽게 답변하세요.
+- 사용자가 명시적으로 "문서에서", "파일에서", "업로드한 자료에서" 등의 표현을 사용하거나, 문서 내용과 명확히 관련된 질문일 때만 문서를 참조하세요.
+- 문서를 참조할 때는 출처를 명시해주세요.
+- <이전 대화 요약>과 <이전 대화>는 대화 맥락 파악에만 사용하고, 마지막 사용자 질문에 답변하세요."""
+
+# 페르소나별 시스템 프롬프트 (페르소나 + 지침)
+SYSTEM_PROMPTS: Dict[str, str] = {
+    ai_name: f"{persona}\n\n{INSTRUCTIONS}" for ai_name, persona in PERSONAS.items()
+}
+
+# Claude cache_control 블록
+_EPHEMERAL = {"type": "ephemeral"}
+
+# Claude가 캐시하는 최소 프리픽스 길이 (토큰, Haiku 2048 / 그 외 1024) - 이보다 짧으면 브레이크포인트가 무시됨
+CLAUDE_CACHE_MIN_TOKENS = int(os.getenv("CLAUDE_CACHE_MIN_TOKENS", "1024"))
+CLAUDE_HAIKU_CACHE_MIN_TOKENS = int(os.getenv("CLAUDE_HAIKU_CACHE_MIN_TOKENS", "2048"))
+
+
+def claude_cache_min_tokens(model: Optional[str]) -> int:
+    """모델별 최소 캐시 길이"""
+    if model and "haiku" in model.lower():
+        return CLAUDE_HAIKU_CACHE_MIN_TOKENS
+    return CLAUDE_CACHE_MIN_TOKENS
+
+
+@dataclass
+class PromptParts:
+    """변하는 정도에 따라 나눈 프롬프트 구성 요소"""
+
+    system: str
+    document_context: str = ""
+    history: str = ""
+    question: str = ""
+
+    def user_blocks(self) -> List[str]:
+        """system 이후 순서대로 배치할 사용자 입력 블록 (빈 블록 제외)"""
+        return [block for block in (self.document_context, self.history, self.question) if block]
+
+    def user_text(self) -> str:
+        """사용자 입력 전체 텍스트 (토큰 추정 등)"""
+        return "\n\n".join(self.user_blocks())
+
+    def openai_messages(self) -> List[Dict[str, Any]]:
+        """
+        OpenAI 메시지 (자동 프리픽스 캐시)
+        고정된 system → 문서 컨텍스트 → 히스토리 + 질문 순서
+        """
+        messages = [{"role": "system", "content": self.system}]
+        if self.document_context:
+            messages.append({"role": "system", "content": self.document_context})
+        messages.append({
+            "role": "user",
+            "content": "\n\n".join(block for block in (self.history, self.question) if block)
+        })
+        return messages
+
+    def anthropic_system(self, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Claude system 블록
+        턴마다 같은 system(페르소나 + 지침)에만 캐시 브레이크포인트를 둠
+        모델의 최소 캐시 길이보다 짧으면 캐시되지 않으므로 브레이크포인트를 생략
+        """
+        block: Dict[str, Any] = {"type": "text", "text": self.system}
+        if estimate_tokens(self.system) >= claude_cache_min_tokens(model):
+            block["cache_control"] = _EPHEMERAL
+        return [block]
+
+    def anthropic_messages(self) -> List[Dict[str, Any]]:
+        """
+        Claude 메시지 (캐시 브레이크포인트 없음)
+        문서 컨텍스트는 검색마다, 히스토리는 턴마다 바뀌어서 캐시를 써도 읽히지 않고 쓰기 비용만 듦
+        """
+        content = [
+            {"type": "text", "text": block}
+            for block in (self.document_context, self.history, self.question) if block
+        ]
+        return [{"role": "user", "content": content}]
+
+    def gemini_contents(self) -> List[Dict[str, Any]]:
+        """Gemini contents (system_instruction은 별도, 암묵적 프리픽스 캐시)"""
+        return [{"role": "user", "parts": [{"text": block} for block in self.user_blocks()]}]
+
+
+def format_document_context(
+    file_search_context: Optional[dict] = None,
+    context: Optional[str] = None
+) -> str:
+    """검색된 문서 내용 블록"""
+    parts = []
+    if file_search_context and file_search_context.get("searched_context"):
+        parts.append(
+            f"<참고 문서 내용>\n{file_search_context['searched_context']}\n</참고 문서 내용>"
+        )
+    if context:
+        parts.append(f"<업로드된 파일 정보>\n{context}\n</업로드된 파일 정보>")
+    return "\n\n".join(parts)
+
+
+def build_prompt(
+    ai_name: str,
+    question: str,
+    history_text: str = "",
+    file_search_context: Optional[dict] = None,
+    context: Optional[str] = None
+) -> PromptParts:
+    """페르소나별 프롬프트 구성"""
+    if ai_name not in SYSTEM_PROMPTS:
+        raise ValueError(f"알 수 없는 AI: {ai_name}")
+    return PromptParts(
+        system=SYSTEM_PROMPTS[ai_name],
+        document_context=format_document_context(file_search_context, context),
+        history=(history_text or "").strip(),
+        question=f"사용자 질문: {question}"
+    )
@@ -0,0 +1,209 @@
+"""
+Rate Limiter - 공급자·모델별 클라이언트 측 요청 속도 제한 (토큰 버킷)
+분당 요청 수(RPM)와 분당 추정 토큰 수(TPM)를 로컬에서 맞춰서
+몰리는 요청이 공급자 429로 거절되기 전에 잠깐 기다리게 함
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+class RateLimitWaitError(Exception):
+    """한도를 채우려면 허용된 대기 시간보다 오래 기다려야 함"""
+
+    def __init__(self, key: str, wait: float):
+        super().__init__(f"{key} 요청 한도 초과 ({wait:.1f}초 대기 필요)")
+        self.wait = wait
+
+
+class TokenBucket:
+    """분당 한도를 연속적으로 채우는 토큰 버킷"""
+
+    def __init__(self, limit_per_minute: float):
+        self.capacity = float(limit_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """초당 충전량"""
+        return self.capacity / 60.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        amount만큼 예약하고, 사용 가능해질 때까지 기다려야 할 시간(초)을 반환
+        잔량이 음수가 될 수 있음 (먼저 예약한 요청부터 순서대로 대기)
+        """
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def cancel(self, amount: float):
+        """예약 취소"""
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def set_limit(self, limit_per_minute: float, remaining: Optional[float] = None):
+        """공급자가 알려준 한도/잔량 반영"""
+        self._refill()
+        if limit_per_minute > 0:
+            self.capacity = float(limit_per_minute)
+            self.tokens = min(self.tokens, self.capacity)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+
+# 응답 헤더 이름 (한도, 잔량) - OpenAI / Anthropic
+_REQUEST_HEADERS = [
+    ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+    ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+]
+_TOKEN_HEADERS = [
+    ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),
+    # Anthropic은 입력 토큰 한도를 따로 보냄 (추정치도 입력 토큰 기준)
+    ("anthropic-ratelimit-input-tokens-limit", "anthropic-ratelimit-input-tokens-remaining"),
+    ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),
+]
+
+
+def _header_pair(headers: Mapping[str, str], names) -> Tuple[Optional[float], Optional[float]]:
+    """(한도, 잔량) 헤더 값, 없으면 (None, None)"""
+    for limit_name, remaining_name in names:
+        limit = headers.get(limit_name)
+        if limit is None:
+            continue
+        remaining = headers.get(remaining_name)
+        try:
+            return float(limit), float(remaining) if remaining is not None else None
+        except ValueError:
+            continue
+    return None, None
+
+
+class RateLimiter:
+    """공급자·모델별 RPM/TPM 토큰 버킷 관리자"""
+
+    # 기본 한도 (RPM, TPM) - 응답 헤더를 받으면 실제 값으로 갱신
+    DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+        "GPT": (500, 30000),
+        "Claude": (50, 30000),
+        "Gemini": (1000, 1000000),
+    }
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+        # 한도를 기다리는 최대 시간 (초), 넘으면 RateLimitWaitError
+        self.max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+
+        # 공급자별 기본값 ({AI}_RPM, {AI}_TPM)
+        self.provider_limits = {
+            ai_name: (
+                int(os.getenv(f"{ai_name.upper()}_RPM", rpm)),
+                int(os.getenv(f"{ai_name.upper()}_TPM", tpm))
+            )
+            for ai_name, (rpm, tpm) in self.DEFAULT_LIMITS.items()
+        }
+        # 모델별 재정의 (예: RATE_LIMITS='{"GPT:gpt-4o": {"rpm": 500, "tpm": 30000}}')
+        self.model_limits: Dict[str, Dict[str, int]] = {}
+        raw_limits = os.getenv("RATE_LIMITS")
+        if raw_limits:
+            try:
+                self.model_limits = json.loads(raw_limits)
+            except ValueError as e:
+                print(f"⚠️ RATE_LIMITS 형식 오류, 무시: {e}")
+
+        # "AI:모델" -> (RPM 버킷, TPM 버킷)
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self.counters: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _key(ai_name: str, model: str) -> str:
+        return f"{ai_name}:{model}"
+
+    def _get_buckets(self, ai_name: str, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        key = self._key(ai_name, model)
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            rpm, tpm = self.provider_limits.get(ai_name, (0, 0))
+            override = self.model_limits.get(key, {})
+            rpm, tpm = override.get("rpm", rpm), override.get("tpm", tpm)
+            # 0 이하는 제한 없음
+            buckets = (
+                TokenBucket(rpm) if rpm > 0 else None,
+                TokenBucket(tpm) if tpm > 0 else None
+            )
+            self._buckets[key] = buckets
+        return buckets
+
+    async def acquire(self, ai_name: str, model: str, tokens: int = 0):
+        """
+        요청 1건과 추정 토큰 tokens개를 사용할 수 있을 때까지 대기
+        max_wait 안에 확보할 수 없으면 예약을 취소하고 RateLimitWaitError
+        """
+        if not self.enabled:
+            return
+        key = self._key(ai_name, model)
+        request_bucket, token_bucket = self._get_buckets(ai_name, model)
+
+        reserved = []
+        wait = 0.0
+        for bucket, amount in ((request_bucket, 1), (token_bucket, tokens)):
+            if bucket is not None and amount > 0:
+                wait = max(wait, bucket.reserve(amount))
+                reserved.append((bucket, amount))
+
+        counter = self.counters.setdefault(key, {"requests": 0, "waits": 0, "wait_seconds": 0.0, "rejected": 0})
+        if wait > self.max_wait:
+            for bucket, amount in reserved:
+                bucket.cancel(amount)
+            counter["rejected"] += 1
+            raise RateLimitWaitError(key, wait)
+
+        counter["requests"] += 1
+        if wait > 0:
+            counter["waits"] += 1
+            counter["wait_seconds"] = round(counter["wait_seconds"] + wait, 3)
+            print(f"⏳ {key} 요청 한도 대기 {wait:.1f}초")
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, ai_name: str, model: str, headers: Optional[Mapping[str, str]]):
+        """응답의 rate limit 헤더로 한도와 잔량 갱신 (OpenAI, Anthropic)"""
+        if not self.enabled or not headers:
+            return
+        request_bucket, token_bucket = self._get_buckets(ai_name, model)
+        key = self._key(ai_name, model)
+
+        limit, remaining = _header_pair(headers, _REQUEST_HEADERS)
+        if limit is not None:
+            if request_bucket is None:
+                request_bucket = TokenBucket(limit)
+            request_bucket.set_limit(limit, remaining)
+        limit, remaining = _header_pair(headers, _TOKEN_HEADERS)
+        if limit is not None:
+            if token_bucket is None:
+                token_bucket = TokenBucket(limit)
+            token_bucket.set_limit(limit, remaining)
+        self._buckets[key] = (request_bucket, token_bucket)
+
+    def stats(self) -> Dict[str, Any]:
+        """버킷별 한도와 잔량"""
+        result = {}
+        for key, (request_bucket, token_bucket) in self._buckets.items():
+            entry: Dict[str, Any] = dict(self.counters.get(key, {}))
+            for name, bucket in (("rpm", request_bucket), ("tpm", token_bucket)):
+                if bucket is not None:
+                    bucket._refill()
+                    entry[name] = {"limit": int(bucket.capacity), "available": int(bucket.tokens)}
+            result[key] = entry
+        return result
+
+
+# 프로세스 전역 (AIManager와 FileSearchManager가 Gemini 한도를 공유)
+rate_limiter = RateLimiter()
@@ -0,0 +1,307 @@
+"""
+Resumable Uploads - tus 방식 이어 올리기 업로드
+생성(POST) → 오프셋 지정 PATCH로 바이트 구간 전송 → 완료(finalize) 순서
+받은 데이터는 로컬 디스크(data/uploads/partial)에 두고, 끊기면 HEAD로 오프셋을 확인해 이어서 전송
+오래 방치된 업로드는 TTL 정리 작업이 삭제하고, 완료 시 SHA-256을 검증한 뒤 인덱싱 작업으로 넘김
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+
+from file_search_manager import file_sha256
+from upload_utils import ALLOWED_EXTENSIONS, UPLOAD_MAX_BYTES, size_limit_message
+
+TUS_VERSION = "1.0.0"
+
+# 마지막 PATCH 이후 이 시간(초)이 지나면 미완료 업로드 삭제
+RESUMABLE_UPLOAD_TTL = float(os.getenv("RESUMABLE_UPLOAD_TTL", str(24 * 3600)))
+# 만료 업로드 정리 주기 (초)
+RESUMABLE_SWEEP_INTERVAL = float(os.getenv("RESUMABLE_SWEEP_INTERVAL", "600"))
+
+
+def parse_upload_metadata(header: Optional[str]) -> Dict[str, str]:
+    """tus Upload-Metadata 헤더 파싱 ("key base64값,key2 base64값2")"""
+    metadata: Dict[str, str] = {}
+    if not header:
+        return metadata
+    for pair in header.split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            value = base64.b64decode(parts[1], validate=True).decode("utf-8") if len(parts) == 2 else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(400, f"잘못된 Upload-Metadata 값: {parts[0]}")
+        metadata[parts[0]] = value
+    return metadata
+
+
+def parse_checksum(header: Optional[str]) -> Optional[bytes]:
+    """tus Upload-Checksum 헤더 ("sha256 base64다이제스트") → 다이제스트 바이트"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise HTTPException(400, f"지원하지 않는 체크섬 알고리즘: {algorithm} (sha256만 지원)")
+    try:
+        return base64.b64decode(value, validate=True)
+    except binascii.Error:
+        raise HTTPException(400, "잘못된 Upload-Checksum 값")
+
+
+class ResumableUploadStore:
+    """미완료 업로드 저장소 (업로드마다 .part 데이터 파일 + .json 상태 파일)"""
+
+    def __init__(self, directory: Path, ttl: float = RESUMABLE_UPLOAD_TTL, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # 요청을 처리 중인 업로드 (같은 업로드에 대한 동시 PATCH/finalize 방지)
+        # 요청이 끝나면 바로 빠지므로 진행 중인 요청 수만큼만 유지됨
+        self._active: Set[str] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.expired = 0
+
+    def _data_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def _info_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def _save_info(self, info: Dict[str, Any]):
+        tmp_file = self._info_path(info["id"]).with_suffix(".json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self._info_path(info["id"]))
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """업로드 상태 (없거나 만료되면 404)"""
+        # 업로드 ID는 uuid hex만 허용 (경로 조작 방지)
+        if len(upload_id) != 32 or any(c not in "0123456789abcdef" for c in upload_id):
+            raise HTTPException(404, f"업로드를 찾을 수 없음: {upload_id}")
+        try:
+            with open(self._info_path(upload_id), 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            raise HTTPException(404, f"업로드를 찾을 수 없음: {upload_id}")
+        if info["expires_at"] <= time.time():
+            self.remove(upload_id)
+            raise HTTPException(404, f"만료된 업로드: {upload_id}")
+        return info
+
+    def create(self, length: int, metadata: Dict[str, str]) -> Dict[str, Any]:
+        """
+        업로드 생성
+        metadata: filename(필수), sha256(필수, 전체 파일의 hex 다이제스트), session_id, replace
+        """
+        if length < 0:
+            raise HTTPException(400, "Upload-Length는 0 이상이어야 합니다")
+        if length > self.max_bytes:
+            raise HTTPException(413, size_limit_message(self.max_bytes))
+
+        filename = metadata.get("filename")
+        if not filename:
+            raise HTTPException(400, "Upload-Metadata에 filename이 필요합니다")
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            raise HTTPException(400, f"지원하지 않는 파일 형식: {file_ext}")
+
+        sha256 = metadata.get("sha256", "").lower()
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise HTTPException(400, "Upload-Metadata에 전체 파일의 sha256(hex)이 필요합니다")
+
+        now = time.time()
+        info = {
+            "id": uuid.uuid4().hex,
+            "filename": filename,
+            "length": length,
+            "offset": 0,
+            "sha256": sha256,
+            "session_id": metadata.get("session_id"),
+            "replace": metadata.get("replace", "").lower() in ("1", "true", "yes"),
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + self.ttl
+        }
+        self._data_path(info["id"]).touch()
+        self._save_info(info)
+        print(f"📝 이어 올리기 업로드 생성: {filename} ({length} bytes, upload={info['id']})")
+        return info
+
+    @contextmanager
+    def _lock(self, upload_id: str) -> Iterator[None]:
+        """업로드 단위 배타 구간 (기다리지 않고 다른 요청이 진행 중이면 409)"""
+        if upload_id in self._active:
+            raise HTTPException(409, "같은 업로드에 대한 다른 요청이 진행 중입니다")
+        self._active.add(upload_id)
+        try:
+            yield
+        finally:
+            self._active.discard(upload_id)
+
+    async def append(
+        self,
+        upload_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+        checksum: Optional[bytes] = None
+    ) -> Dict[str, Any]:
+        """
+        offset 위치부터 데이터 이어 쓰기 (offset이 현재 위치와 다르면 409)
+        연결이 끊겨도 받은 만큼은 저장되어 다음 PATCH에서 이어 씀
+        checksum이 주어지면 이번 구간의 SHA-256을 검증하고, 틀리면 구간을 버리고 460
+        """
+        self.get(upload_id)
+        with self._lock(upload_id):
+            info = self.get(upload_id)
+            if offset != info["offset"]:
+                raise HTTPException(409, f"Upload-Offset 불일치 (현재 {info['offset']})")
+
+            loop = asyncio.get_event_loop()
+            digest = hashlib.sha256()
+            written = 0
+            disconnected = None
+            f = open(self._data_path(upload_id), 'r+b')
+            try:
+                # 이전에 끊긴 PATCH가 남긴 기록되지 않은 꼬리 제거
+                f.truncate(offset)
+                f.seek(offset)
+                try:
+                    async for chunk in chunks:
+                        if not chunk:
+                            continue
+                        if offset + written + len(chunk) > info["length"]:
+                            raise HTTPException(413, "Upload-Length를 넘는 데이터")
+                        digest.update(chunk)
+                        await loop.run_in_executor(None, f.write, chunk)
+                        written += len(chunk)
+                except HTTPException:
+                    f.truncate(offset)
+                    raise
+                except ClientDisconnect as e:
+                    # 클라이언트 연결 끊김 - 받은 부분까지만 반영
+                    disconnected = e
+
+                if checksum is not None and disconnected is None and digest.digest() != checksum:
+                    f.truncate(offset)
+                    raise HTTPException(460, "Upload-Checksum 불일치")
+                if checksum is not None and disconnected is not None:
+                    # 체크섬은 구간 전체 기준이라 끊긴 구간은 검증할 수 없음
+                    f.truncate(offset)
+                    written = 0
+            finally:
+                f.close()
+
+            now = time.time()
+            info.update(offset=offset + written, updated_at=now, expires_at=now + self.ttl)
+            self._save_info(info)
+
+        if disconnected is not None:
+            print(f"⚠️ 이어 올리기 PATCH 연결 끊김 (upload={upload_id}, offset={info['offset']})")
+        return info
+
+    async def finalize(self, upload_id: str, destination: Path) -> Tuple[Dict[str, Any], str, int]:
+        """
+        전체 데이터를 받은 업로드를 SHA-256 검증 후 destination 폴더로 이동
+        Returns: (업로드 정보, 이동한 파일 경로, 파일 크기)
+        """
+        self.get(upload_id)
+        with self._lock(upload_id):
+            info = self.get(upload_id)
+            if info["offset"] != info["length"]:
+                raise HTTPException(409, f"업로드가 끝나지 않음 ({info['offset']}/{info['length']} bytes)")
+
+            data_path = self._data_path(upload_id)
+            loop = asyncio.get_event_loop()
+            actual = await loop.run_in_executor(None, file_sha256, str(data_path))
+            if actual != info["sha256"]:
+                self.remove(upload_id)
+                raise HTTPException(422, f"SHA-256 불일치 (예상 {info['sha256'][:12]}, 실제 {actual[:12]}), 업로드 삭제")
+
+            file_ext = os.path.splitext(info["filename"])[1].lower()
+            target = Path(destination) / f"{upload_id}{file_ext}"
+            os.replace(data_path, target)
+            self.remove(upload_id)
+            print(f"✅ 이어 올리기 업로드 검증 완료: {info['filename']} (sha256={actual[:12]})")
+            return info, str(target), info["length"]
+
+    def restore(self, info: Dict[str, Any], path: str):
+        """finalize로 옮긴 파일을 미완료 업로드로 되돌림 (인덱싱 작업 등록 실패 시 다시 finalize 가능)"""
+        os.replace(path, self._data_path(info["id"]))
+        now = time.time()
+        info.update(updated_at=now, expires_at=now + self.ttl)
+        self._save_info(info)
+        print(f"↩️ 이어 올리기 업로드 복구: {info['filename']} (upload={info['id']})")
+
+    def remove(self, upload_id: str):
+        """업로드 데이터/상태 파일 삭제"""
+        for path in (self._data_path(upload_id), self._info_path(upload_id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def sweep(self) -> int:
+        """만료된 업로드 삭제, 삭제한 수 반환"""
+        now = time.time()
+        removed = 0
+        for info_path in self.directory.glob("*.json"):
+            upload_id = info_path.stem
+            if upload_id in self._active:
+                continue
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    expires_at = json.load(f)["expires_at"]
+            except (OSError, ValueError, KeyError):
+                expires_at = 0
+            if expires_at <= now:
+                self.remove(upload_id)
+                removed += 1
+        # 상태 파일 없이 남은 데이터 파일 정리
+        for data_path in self.directory.glob("*.part"):
+            if not self._info_path(data_path.stem).exists():
+                data_path.unlink(missing_ok=True)
+        if removed:
+            self.expired += removed
+            print(f"🧹 만료된 이어 올리기 업로드 {removed}개 삭제")
+        return removed
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(RESUMABLE_SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 이어 올리기 업로드 정리 실패: {e}")
+
+    def start(self):
+        """TTL 정리 작업 시작 (시작 시 한 번 바로 정리)"""
+        if self._sweeper is None:
+            self.sweep()
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(1 for _ in self.directory.glob("*.json")),
+            "expired": self.expired,
+            "ttl": self.ttl
+        }
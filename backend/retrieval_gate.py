@@ -0,0 +1,208 @@
+"""
+Retrieval Gate - RAG 검색 필요 여부를 로컬에서 빠르게 판단
+네트워크 호출 없이 키워드/의도 규칙과 문서 제목·검색 결과 용어 유사도로 결정
+"""
+
+import os
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+
+# 문서 참조를 명시적으로 요청하는 표현
+DOCUMENT_KEYWORDS = [
+    "문서", "파일", "자료", "업로드", "첨부", "pdf", "보고서", "페이지", "출처", "내용에서",
+    "요약", "정리해", "찾아", "인용", "몇 쪽", "표에서",
+    "document", "file", "upload", "attachment", "according to", "summarize", "source",
+]
+
+# 문서가 필요 없는 일상 대화 패턴
+SMALL_TALK_PATTERNS = [
+    r"^(안녕|하이|헬로|반가워|반갑|좋은 ?(아침|저녁|밤)|잘 ?자|굿모닝|ㅎㅇ)",
+    r"^(고마워|고맙|감사|땡큐|ㄱㅅ|수고)",
+    r"^(ㅋ|ㅎ|ㅠ|ㅜ|ㄷ|ㅇㅋ|오케이|넵|네|응|그래|아하|오호|와우)+[\s!?.~]*$",
+    r"(날씨|기온|비 ?와|눈 ?와|미세먼지)",
+    r"(심심|배고파|졸려|기분|뭐 ?해|뭐하니|잘 ?지내)",
+    r"(너는|넌|당신은) ?(누구|뭐야|몇 ?살)",
+    r"^(hi|hello|hey|thanks|thank you|good (morning|night|evening)|bye)\b",
+    r"\b(weather|how are you)\b",
+]
+
+# 정보를 묻는 질문 의도 (규칙으로 판단이 안 될 때 사용)
+QUESTION_PATTERN = r"(\?|얼마|언제|어디|누가|누구|무엇|몇|어떤|어떻게|왜|인가요|나요|까요|니\b|냐\b|\b(what|when|where|who|which|how much|how many)\b)"
+
+# 한국어 조사 (용어 비교 시 제거)
+KOREAN_PARTICLES = (
+    "으로", "에서", "에게", "까지", "부터", "처럼", "보다", "이랑",
+    "은", "는", "이", "가", "을", "를", "에", "의", "로", "와", "과", "도", "만", "랑",
+)
+
+# 의미 없는 흔한 단어
+STOPWORDS = {
+    "그리고", "그래서", "하지만", "그런데", "그러나", "또한", "또는", "및", "등", "즉", "특히",
+    "이거", "저거", "그거", "이것", "저것", "그것", "여기", "거기", "저기", "이런", "그런", "저런",
+    "무엇", "뭐야", "어떻게", "어떤", "모든", "각각", "가장", "매우", "아주", "많이", "모두", "다른",
+    "알려줘", "알려", "주세요", "해줘", "있어", "없어", "좀", "정말", "진짜", "그냥", "먼저",
+    "관련", "정보", "내용", "대한", "대해", "대해서", "위한", "위해", "통해", "따라", "따른", "때문",
+    "경우", "때문에", "같은", "같이", "있는", "없는", "하는", "되는", "있다", "없다", "한다", "된다",
+    "있습니다", "없습니다", "합니다", "됩니다", "입니다", "했습니다", "있으며", "하며", "이며",
+    "질문", "다음", "위의", "아래", "설명", "문서", "자료", "파일", "결과", "검색",
+    "the", "and", "for", "with", "what", "how", "is", "are", "was", "were", "be", "been",
+    "this", "that", "these", "those", "it", "its", "of", "to", "in", "on", "at", "by", "as",
+    "an", "or", "not", "from", "can", "will", "would", "should", "about", "which", "also",
+    "there", "their", "they", "has", "have", "had", "more", "most", "such", "into", "than",
+    "document", "file", "based", "provided", "information",
+}
+
+# 검색 결과에서 제목으로 취급하는 줄 (마크다운 헤더, 굵은 글씨)
+HEADING_PATTERN = r"^\s*#{1,6}\s+(.+)$|\*\*([^*\n]+)\*\*"
+
+# 문서 참조 표현이 단어 일부로 들어간 경우는 제외 ("file" ⊄ "profile", "페이지" ⊄ "홈페이지")
+# 한국어는 뒤에 조사/어미가 붙으므로 앞쪽 경계만, 영어는 복수형/활용형 어미까지 허용
+KEYWORD_PREFIX = r"(?<![0-9a-z가-힣])"
+ENGLISH_KEYWORD_SUFFIX = r"(?:s|es|d|ed|ing)?(?![0-9a-z])"
+
+
+def tokenize(text: str) -> List[str]:
+    """간단한 토크나이저 (소문자화, 조사 제거, 2글자 이상)"""
+    tokens = []
+    for raw in re.findall(r"[0-9A-Za-z가-힣]+", text.lower()):
+        token = raw
+        for particle in KOREAN_PARTICLES:
+            if len(token) > len(particle) + 1 and token.endswith(particle):
+                token = token[: -len(particle)]
+                break
+        if len(token) >= 2 and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def keyword_pattern(keyword: str) -> Pattern:
+    """문서 참조 표현 → 단어 경계를 지키는 정규식"""
+    pattern = KEYWORD_PREFIX + re.escape(keyword)
+    if re.search(r"[a-z0-9]$", keyword):
+        pattern += ENGLISH_KEYWORD_SUFFIX
+    return re.compile(pattern, re.IGNORECASE)
+
+
+class RetrievalGate:
+    """RAG 검색 게이트 (검색 전 로컬 판단)"""
+
+    def __init__(self):
+        # 모드: auto(규칙 기반) / always(항상 검색) / never(검색 안함)
+        self.mode = os.getenv("RAG_GATE_MODE", "auto").lower()
+        # 규칙으로 판단이 안 될 때의 기본 동작: question(질문일 때만 검색) / retrieve / skip
+        self.default_action = os.getenv("RAG_GATE_DEFAULT", "question").lower()
+        # 이 길이 미만의 메시지는 검색하지 않음
+        self.min_length = int(os.getenv("RAG_GATE_MIN_LENGTH", "4"))
+        # 문서 제목/검색 결과 용어와 이 개수 이상 겹치면 검색
+        self.min_overlap = int(os.getenv("RAG_GATE_MIN_OVERLAP", "1"))
+        # 검색 결과에서 학습하는 용어 최대 개수
+        self.max_learned_terms = int(os.getenv("RAG_GATE_MAX_TERMS", "1000"))
+        # 검색 결과 하나에서 학습하는 용어 수 (제목 용어 + 반복 등장하는 상위 용어)
+        self.terms_per_result = int(os.getenv("RAG_GATE_TERMS_PER_RESULT", "20"))
+        # 검색 결과 하나 안에서 이 횟수 이상 나온 용어만 핵심 용어로 취급
+        self.min_term_frequency = int(os.getenv("RAG_GATE_MIN_TERM_FREQ", "2"))
+        # 학습한 검색 결과 중 이 비율 넘게 등장한 용어는 흔한 말로 보고 판단에서 제외
+        self.max_document_frequency = float(os.getenv("RAG_GATE_MAX_DF", "0.5"))
+        # 문서 빈도 제외는 이 개수 이상의 검색 결과를 학습한 뒤부터 적용
+        self.min_documents_for_df = int(os.getenv("RAG_GATE_MIN_DF_DOCS", "4"))
+
+        extra_keywords = os.getenv("RAG_GATE_KEYWORDS", "")
+        self.document_keywords = DOCUMENT_KEYWORDS + [
+            k.strip().lower() for k in extra_keywords.split(",") if k.strip()
+        ]
+        self.keyword_patterns = [(k, keyword_pattern(k)) for k in self.document_keywords]
+        self.small_talk_patterns = [re.compile(p, re.IGNORECASE) for p in SMALL_TALK_PATTERNS]
+        self.question_pattern = re.compile(QUESTION_PATTERN, re.IGNORECASE)
+        self.heading_pattern = re.compile(HEADING_PATTERN, re.MULTILINE)
+
+        # 검색 결과에서 수집한 핵심 용어 → 등장한 검색 결과 수 (LRU)
+        self.learned_terms: "OrderedDict[str, int]" = OrderedDict()
+        self.learned_documents = 0
+
+    def salient_terms(self, text: str) -> Set[str]:
+        """검색 결과의 핵심 용어 (제목/굵은 글씨 용어 + 여러 번 등장한 상위 용어)"""
+        terms: Set[str] = set()
+        for match in self.heading_pattern.finditer(text):
+            terms.update(tokenize(match.group(1) or match.group(2)))
+
+        counts = Counter(tokenize(text))
+        for token, count in counts.most_common():
+            if len(terms) >= self.terms_per_result or count < self.min_term_frequency:
+                break
+            terms.add(token)
+        return terms
+
+    def learn(self, text: Optional[str]):
+        """검색된 문서 내용의 핵심 용어를 캐시 (다음 판단에 사용)"""
+        if not text:
+            return
+        self.learned_documents += 1
+        for token in self.salient_terms(text):
+            self.learned_terms[token] = self.learned_terms.get(token, 0) + 1
+            self.learned_terms.move_to_end(token)
+        while len(self.learned_terms) > self.max_learned_terms:
+            self.learned_terms.popitem(last=False)
+
+    def _is_distinctive(self, term: str) -> bool:
+        """학습한 용어 중 대부분의 검색 결과에 나오는 흔한 용어가 아닌지"""
+        count = self.learned_terms.get(term)
+        if not count:
+            return False
+        if self.learned_documents < self.min_documents_for_df:
+            return True
+        return count / self.learned_documents <= self.max_document_frequency
+
+    def _title_terms(self, files: Iterable[Dict]) -> Set[str]:
+        """문서 제목에서 용어 추출 (확장자 제외)"""
+        terms: Set[str] = set()
+        for f in files:
+            name = os.path.splitext(f.get("display_name", ""))[0]
+            terms.update(tokenize(name))
+        return terms
+
+    def evaluate(self, query: str, files: Iterable[Dict]) -> Tuple[bool, str]:
+        """
+        검색 필요 여부 판단
+
+        Returns:
+            (검색 여부, 판단 이유)
+        """
+        if self.mode == "always":
+            return True, "mode=always"
+        if self.mode == "never":
+            return False, "mode=never"
+
+        text = query.strip().lower()
+        if len(text) < self.min_length:
+            return False, "too_short"
+
+        for keyword, pattern in self.keyword_patterns:
+            if pattern.search(text):
+                return True, f"keyword:{keyword}"
+
+        for pattern in self.small_talk_patterns:
+            if pattern.search(text):
+                return False, "small_talk"
+
+        query_terms = set(tokenize(text))
+        overlap = query_terms & self._title_terms(files)
+        if len(overlap) >= self.min_overlap:
+            return True, f"title_overlap:{','.join(sorted(overlap)[:3])}"
+
+        overlap = {t for t in query_terms if self._is_distinctive(t)}
+        if len(overlap) >= self.min_overlap:
+            return True, f"term_overlap:{','.join(sorted(overlap)[:3])}"
+
+        if self.default_action == "question":
+            if self.question_pattern.search(text):
+                return True, "default:question"
+            return False, "default:statement"
+        return self.default_action == "retrieve", f"default:{self.default_action}"
+
+    def should_retrieve(self, query: str, files: Iterable[Dict]) -> bool:
+        """검색 필요 여부 판단 + 로그"""
+        retrieve, reason = self.evaluate(query, files)
+        print(f"🚦 RAG 게이트: {'검색' if retrieve else '건너뜀'} ({reason}) - {query[:30]}")
+        return retrieve
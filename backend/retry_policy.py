@@ -0,0 +1,306 @@
+"""
+Retry Policy - AI API 호출 공통 재시도 정책
+SDK 예외 타입과 HTTP 상태 코드로 재시도 여부를 판단하고,
+full jitter 지수 백오프 + Retry-After + 전체 데드라인을 적용
+"""
+
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from deadline import DeadlineExceeded
+
+if TYPE_CHECKING:
+    from circuit_breaker import CircuitBreaker
+    from persona_selection import HealthTracker
+
+T = TypeVar("T")
+
+# 재시도할 HTTP 상태 코드 (429 rate limit, 5xx 서버 오류, 529 Anthropic 과부하)
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# 재시도할 네트워크/타임아웃 예외 (설치된 SDK만 포함)
+_TRANSIENT_ERRORS: Tuple[type, ...] = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+)
+try:
+    import openai
+    _TRANSIENT_ERRORS += (openai.APIConnectionError,)
+except ImportError:
+    pass
+try:
+    import anthropic
+    _TRANSIENT_ERRORS += (anthropic.APIConnectionError,)
+except ImportError:
+    pass
+try:
+    import httpx2
+    _TRANSIENT_ERRORS += (httpx2.TimeoutException, httpx2.TransportError)
+except ImportError:
+    pass
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """
+    예외의 HTTP 상태 코드
+    OpenAI/Anthropic: status_code, google-genai: code
+    """
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """응답 헤더의 Retry-After (초), 없으면 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    # OpenAI/Anthropic은 밀리초 단위 헤더도 보냄
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP 날짜 형식
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """재시도해서 성공할 수 있는 오류인지 (인증·요청 형식 오류 등은 False)"""
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    status = status_code_of(error)
+    return status in RETRYABLE_STATUS_CODES
+
+
+class RetryPolicy:
+    """공통 재시도 정책"""
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        total_timeout: Optional[float] = None
+    ):
+        # 최대 시도 횟수 (첫 시도 포함)
+        self.max_attempts = max_attempts or int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+        # 백오프 기준/최대 대기 시간 (초)
+        self.base_delay = base_delay or float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+        self.max_delay = max_delay or float(os.getenv("RETRY_MAX_DELAY", "20"))
+        # 재시도 포함 전체 시간 상한 (초)
+        self.total_timeout = total_timeout or float(os.getenv("RETRY_DEADLINE", "60"))
+
+        # 이름별 재시도/포기 횟수
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        attempt번째 실패 후 대기 시간
+        full jitter: 0 ~ min(max_delay, base_delay * 2^attempt) 사이 무작위,
+        서버가 Retry-After를 주면 그보다 먼저 재시도하지 않음
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _count(self, name: str, key: str):
+        counter = self.counters.setdefault(name, {"retries": 0, "giveups": 0})
+        counter[key] += 1
+
+    def next_delay(
+        self, name: str, error: BaseException, attempt: int, deadline: float
+    ) -> Optional[float]:
+        """
+        재시도 전 대기 시간, 재시도하지 않아야 하면 None
+        attempt: 지금까지 실패한 횟수 - 1 (0부터)
+        """
+        if not is_retryable(error):
+            return None
+        if attempt + 1 >= self.max_attempts:
+            self._count(name, "giveups")
+            return None
+
+        delay = self.backoff(attempt, retry_after_of(error))
+        if time.monotonic() + delay >= deadline:
+            # 기다려도 데드라인 안에 끝낼 수 없음
+            self._count(name, "giveups")
+            return None
+
+        self._count(name, "retries")
+        status = status_code_of(error)
+        reason = status if status is not None else type(error).__name__
+        print(f"⚠️ {name} API 오류 ({reason}), {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_attempts - 1})")
+        return delay
+
+    def deadline_from(self, deadline: Optional[float] = None) -> float:
+        """절대 데드라인 (time.monotonic 기준), 없으면 지금부터 total_timeout"""
+        default = time.monotonic() + self.total_timeout
+        return default if deadline is None else min(deadline, default)
+
+    async def call(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None,
+        breaker: Optional["CircuitBreaker"] = None,
+        tracker: Optional["HealthTracker"] = None
+    ) -> T:
+        """
+        func()를 재시도 정책에 따라 실행 (매 시도마다 새로 호출)
+        재시도할 수 없거나 횟수/데드라인을 넘기면 마지막 예외를 그대로 던짐
+        breaker: 시도마다 차단 여부를 확인하고 결과를 기록 (차단 중이면 CircuitOpenError)
+        tracker: 시도별 지연 시간/실패를 기록 (페르소나 선택용)
+        """
+        # 각 시도는 남은 시간(호출자 데드라인과 RETRY_DEADLINE 중 이른 쪽) 안에서만 실행
+        deadline = self.deadline_from(deadline)
+        monitors = [m for m in (breaker, tracker) if m is not None]
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.check()
+            started = time.monotonic()
+            try:
+                result = await self._within(name, func(), deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self._record_failure(monitors, e, started)
+                if breaker and breaker.state != "closed":
+                    # 이번 실패로 서킷이 열렸으면 더 기다리지 않음
+                    raise
+                delay = self.next_delay(name, e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                # 전체 응답 시간이라 느린 호출 판정에는 쓰지 않음 (긴 답변 ≠ 장애)
+                self._record_success(monitors, started, first_token=False)
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream(
+        self,
+        name: str,
+        factory: Callable[[], AsyncIterator[T]],
+        deadline: Optional[float] = None,
+        breaker: Optional["CircuitBreaker"] = None,
+        tracker: Optional["HealthTracker"] = None
+    ) -> AsyncIterator[T]:
+        """
+        스트림을 재시도 정책에 따라 실행
+        첫 청크를 내보낸 뒤의 오류는 재시도하지 않음 (이미 보낸 텍스트가 중복되지 않도록)
+        breaker/tracker에는 첫 청크까지의 시간(TTFT)을 지연 시간으로 기록
+        """
+        deadline = self.deadline_from(deadline)
+        monitors = [m for m in (breaker, tracker) if m is not None]
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.check()
+            started = time.monotonic()
+            first_chunk = False
+            try:
+                # 데드라인은 첫 청크까지만 적용 (시작된 답변은 끝까지 전달)
+                remaining = self._remaining(name, deadline)
+                try:
+                    async with asyncio.timeout(remaining) as scope:
+                        async for item in factory():
+                            if not first_chunk:
+                                first_chunk = True
+                                scope.reschedule(None)
+                                self._record_success(monitors, started, first_token=True)
+                            yield item
+                except TimeoutError:
+                    # 공급자 쪽 타임아웃은 그대로 (재시도 대상), 데드라인 만료만 변환
+                    if first_chunk or not scope.expired():
+                        raise
+                    raise DeadlineExceeded(f"{name} 첫 응답 전 요청 시간 초과")
+                return
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if first_chunk:
+                    self._record_failure(monitors, e, time.monotonic())
+                    raise
+                self._record_failure(monitors, e, started)
+                if breaker and breaker.state != "closed":
+                    # 이번 실패로 서킷이 열렸으면 더 기다리지 않음
+                    raise
+                delay = self.next_delay(name, e, attempt, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _remaining(name: str, deadline: float) -> float:
+        """남은 시간, 이미 지났으면 DeadlineExceeded"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{name} 요청 시간 초과")
+        return remaining
+
+    async def _within(self, name: str, awaitable: Awaitable[T], deadline: float) -> T:
+        """데드라인 안에서 실행"""
+        try:
+            remaining = self._remaining(name, deadline)
+        except DeadlineExceeded:
+            # 실행하지 않는 코루틴 정리
+            awaitable.close()
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{name} 요청 시간 초과")
+
+    @staticmethod
+    def _record_success(monitors: List[Any], started: float, first_token: bool):
+        """성공 기록 (first_token: latency가 TTFT인지, 전체 응답 시간인지)"""
+        latency = time.monotonic() - started
+        for monitor in monitors:
+            monitor.record_success(latency, first_token=first_token)
+
+    @staticmethod
+    def _record_failure(monitors: List[Any], error: BaseException, started: float):
+        """공급자 장애성 오류만 실패로 기록 (요청 형식 오류 등은 제외)"""
+        if not is_retryable(error):
+            return
+        latency = time.monotonic() - started
+        for monitor in monitors:
+            monitor.record_failure(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """재시도 통계"""
+        return {
+            "max_attempts": self.max_attempts,
+            "deadline": self.total_timeout,
+            "counters": self.counters
+        }
@@ -1,6 +1,6 @@
 """Perplexity API 검색 도구"""
 import os
-from typing import Literal
+from typing import Literal, Optional
 import httpx
 from langchain_core.tools import tool
 
@@ -8,6 +8,25 @@ PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
 
 
+# 백엔드 앱에서는 공유 연결 풀 사용, LangGraph 단독 실행 시에는 모듈 전역 클라이언트 사용
+try:
+    from http_clients import client_registry
+except ImportError:
+    client_registry = None
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """keep-alive 연결을 재사용하는 Perplexity HTTP 클라이언트"""
+    global _client
+    if client_registry is not None:
+        return client_registry.get_async_client("perplexity")
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=60.0)
+    return _client
+
+
 @tool
 async def perplexity_search(
     query: str,
@@ -56,22 +75,22 @@ async def perplexity_search(
     }
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                PERPLEXITY_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "content": result["choices"][0]["message"]["content"],
-                "citations": result.get("citations", []),
-                "related_questions": result.get("related_questions", []),
-                "model": result.get("model", "unknown"),
-                "usage": result.get("usage", {})
-            }
+        response = await _get_client().post(
+            PERPLEXITY_URL,
+            headers=headers,
+            json=payload,
+            timeout=60.0
+        )
+        response.raise_for_status()
+        result = response.json()
+        
+        return {
+            "content": result["choices"][0]["message"]["content"],
+            "citations": result.get("citations", []),
+            "related_questions": result.get("related_questions", []),
+            "model": result.get("model", "unknown"),
+            "usage": result.get("usage", {})
+        }
             
     except httpx.HTTPStatusError as e:
         error_detail = ""
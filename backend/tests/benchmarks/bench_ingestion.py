@@ -0,0 +1,136 @@
+"""
+일괄 업로드 처리량 벤치마크 (files/min)
+로컬 File Search API 대역(LocalFileSearch)으로 /api/upload/batch를 실행해
+인덱싱 워커 수에 따른 처리량을 비교 (워커 1개 = 기존 순차 업로드와 같은 처리량)
+
+사용법 (backend 폴더에서):
+    python tests/benchmarks/bench_ingestion.py --files 20 --workers 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_DIR))
+
+STORE_NAME = "fileSearchStores/benchmark"
+
+
+class LocalFileSearch:
+    """
+    google-genai aio 클라이언트의 File Search 부분만 흉내내는 로컬 대역
+    업로드는 고정 지연 + 대역폭, 인덱싱은 operation 생성 후 index_seconds 뒤 완료
+    """
+
+    def __init__(self, upload_latency: float, bandwidth: float, index_seconds: float):
+        self.upload_latency = upload_latency
+        self.bandwidth = bandwidth
+        self.index_seconds = index_seconds
+        self.operations = {}
+        self.polls = 0
+        self.aio = SimpleNamespace(
+            file_search_stores=SimpleNamespace(upload_to_file_search_store=self._upload),
+            operations=SimpleNamespace(get=self._get_operation)
+        )
+
+    async def _upload(self, file, file_search_store_name, config=None):
+        await asyncio.sleep(self.upload_latency + os.path.getsize(file) / self.bandwidth)
+        name = f"operations/{len(self.operations)}"
+        self.operations[name] = time.monotonic() + self.index_seconds
+        return self._operation(name)
+
+    async def _get_operation(self, operation):
+        self.polls += 1
+        return self._operation(operation.name)
+
+    def _operation(self, name: str):
+        done = time.monotonic() >= self.operations[name]
+        return SimpleNamespace(
+            name=name,
+            done=done,
+            error=None,
+            response=SimpleNamespace(document_name=f"{STORE_NAME}/documents/{name.split('/')[-1]}")
+        )
+
+
+def make_zip(count: int, size: int, round_id: int) -> bytes:
+    """서로 다른 내용의 txt 파일 count개를 담은 zip"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for index in range(count):
+            header = f"round {round_id} document {index}\n".encode()
+            archive.writestr(f"doc_{index:03d}.txt", header + b"x" * max(0, size - len(header)))
+    return buffer.getvalue()
+
+
+def run(args):
+    # data/ 폴더가 실제 메타데이터를 건드리지 않도록 임시 폴더에서 실행
+    os.chdir(tempfile.mkdtemp(prefix="bench_ingestion_"))
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["CHAT_HISTORY_PERSISTENCE"] = "false"
+    os.environ["WARMUP_ENABLED"] = "false"
+    os.environ["INGEST_POLL_INITIAL"] = str(args.poll_initial)
+
+    from fastapi.testclient import TestClient
+
+    import main
+
+    fake = LocalFileSearch(args.upload_latency, args.bandwidth, args.index_seconds)
+    manager = main.file_search_manager
+    manager.client = fake
+    manager.store_name = STORE_NAME
+    manager._initialized = True
+
+    print(
+        f"📊 파일 {args.files}개 x {args.size} bytes, 업로드 {args.upload_latency}s, "
+        f"인덱싱 {args.index_seconds}s"
+    )
+    print(f"{'workers':>8} {'elapsed(s)':>11} {'files/min':>10} {'completed':>10} {'polls':>6}")
+
+    for round_id, workers in enumerate(args.workers):
+        main.ingestion_queue.worker_count = workers
+        fake.polls = 0
+        archive = make_zip(args.files, args.size, round_id)
+
+        with TestClient(main.app) as client:
+            with client.stream(
+                "POST",
+                "/api/upload/batch",
+                files=[("files", ("corpus.zip", archive, "application/zip"))]
+            ) as response:
+                summary = None
+                for line in response.iter_lines():
+                    if line:
+                        event = json.loads(line)
+                        if event["type"] == "summary":
+                            summary = event
+
+        print(
+            f"{workers:>8} {summary['elapsed']:>11.2f} {summary['files_per_minute']:>10.1f} "
+            f"{summary['completed']:>10} {fake.polls:>6}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="일괄 업로드 처리량 벤치마크")
+    parser.add_argument("--files", type=int, default=20, help="파일 수")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="파일 크기 (bytes)")
+    parser.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4, 8])
+    parser.add_argument("--upload-latency", type=float, default=0.1, help="업로드 고정 지연 (초)")
+    parser.add_argument("--bandwidth", type=float, default=50 * 1024 * 1024, help="업로드 대역폭 (bytes/s)")
+    parser.add_argument("--index-seconds", type=float, default=0.5, help="인덱싱 소요 시간 (초)")
+    parser.add_argument("--poll-initial", type=float, default=0.1, help="첫 폴링 간격 (초)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
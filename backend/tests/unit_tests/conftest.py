@@ -0,0 +1,29 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+# API 테스트용 설정 (실제 공급자 호출/영구 저장 없음)
+APP_ENV = {
+    "OPENAI_API_KEY": "test",
+    "ANTHROPIC_API_KEY": "test",
+    "GEMINI_API_KEY": "test",
+    "CHAT_HISTORY_PERSISTENCE": "false",
+    "WARMUP_ENABLED": "false",
+}
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """main 모듈 (data/ 폴더는 임시 폴더 안에 생성)"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("app"))
+        for key, value in APP_ENV.items():
+            patch.setenv(key, value)
+        yield importlib.import_module("main")
+
+
+@pytest.fixture
+def client(app_module):
+    with TestClient(app_module.app) as client:
+        yield client
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai_manager import AIManager, AIResponseError
+from circuit_breaker import CircuitBreaker
+from prompt_builder import build_prompt
+
+
+class SlowGeminiStream:
+    """File Search API 없이 느린 Gemini 스트림을 흉내내는 async iterator"""
+
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(text=f"chunk{i} ")
+
+
+class FakeAsyncModels:
+    def __init__(self, chunks: int = 10, delay: float = 0.05):
+        self.chunks = chunks
+        self.delay = delay
+        self.calls = []
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        self.calls.append(("stream", model, contents, config))
+        return SlowGeminiStream(self.chunks, self.delay)
+
+    async def generate_content(self, *, model, contents, config=None):
+        self.calls.append(("generate", model, contents, config))
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(text="full response")
+
+
+class FailingSyncModels:
+    """동기 API가 호출되면 테스트 실패"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"sync Gemini API used: models.{name}")
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GEMINI_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    manager = AIManager()
+    manager.gemini_client = SimpleNamespace(
+        aio=SimpleNamespace(models=FakeAsyncModels()),
+        models=FailingSyncModels(),
+    )
+    return manager
+
+
+def test_gemini_stream_does_not_block_event_loop(manager):
+    async def run():
+        ticks = []
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            # 다른 요청을 대신하는 작업: 스트리밍 도중에도 계속 실행되어야 함
+            while not stop.is_set():
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        started = time.monotonic()
+        chunks = [c async for c in manager._get_gemini_response_stream(build_prompt("Gemini", "hello"))]
+        elapsed = time.monotonic() - started
+        stop.set()
+        await beat
+        return chunks, elapsed, ticks
+
+    chunks, elapsed, ticks = asyncio.run(run())
+
+    assert "".join(chunks) == "".join(f"chunk{i} " for i in range(10))
+    # 스트림은 약 0.5초 동안 이어지고, 그동안 heartbeat가 꾸준히 실행됨
+    assert elapsed >= 0.45
+    assert len(ticks) >= 20
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    assert max(gaps) < 0.2
+
+
+def test_gemini_stream_has_no_artificial_delay(manager):
+    manager.gemini_client.aio.models = FakeAsyncModels(chunks=200, delay=0)
+
+    async def run():
+        started = time.monotonic()
+        chunks = [c async for c in manager._get_gemini_response_stream(build_prompt("Gemini", "hello"))]
+        return chunks, time.monotonic() - started
+
+    chunks, elapsed = asyncio.run(run())
+
+    assert len(chunks) == 200
+    # 청크당 고정 sleep(0.01)이 있었다면 2초 이상 걸림
+    assert elapsed < 0.5
+
+
+def test_gemini_response_uses_async_client(manager):
+    response = asyncio.run(manager._get_gemini_response(build_prompt("Gemini", "hello")))
+
+    assert response == "full response"
+    kind, model, contents, _ = manager.gemini_client.aio.models.calls[0]
+    assert (kind, model) == ("generate", "gemini-2.5-flash")
+    assert contents == [{"role": "user", "parts": [{"text": "사용자 질문: hello"}]}]
+
+
+def test_gemini_config_adds_file_search_tool(manager):
+    prompt = build_prompt("Gemini", "hello")
+    config = manager._get_gemini_config(prompt, {"store_name": "fileSearchStores/test"})
+
+    assert config.tools[0].file_search.file_search_store_names == ["fileSearchStores/test"]
+    assert manager._get_gemini_config(prompt, None).tools is None
+
+
+class BrokenAsyncModels(FakeAsyncModels):
+    async def generate_content_stream(self, *, model, contents, config=None):
+        raise ValueError("400 invalid argument")
+
+
+def test_gemini_stream_failure_raises_instead_of_yielding_text(manager):
+    manager.gemini_client.aio.models = BrokenAsyncModels()
+
+    async def run():
+        return [c async for c in manager._get_gemini_response_stream(build_prompt("Gemini", "hello"))]
+
+    with pytest.raises(AIResponseError) as error:
+        asyncio.run(run())
+
+    assert error.value.reason == "provider_error"
+    assert str(error.value) == "Gemini 오류: 400 invalid argument"
+
+
+def test_missing_client_raises_unavailable(manager):
+    with pytest.raises(AIResponseError) as error:
+        asyncio.run(manager.get_response("GPT", "hello"))
+
+    assert error.value.reason == "unavailable"
+
+
+def test_gemini_response_failure_raises_provider_error(manager):
+    class BrokenModels(FakeAsyncModels):
+        async def generate_content(self, *, model, contents, config=None):
+            raise ValueError("500 internal")
+
+    manager.gemini_client.aio.models = BrokenModels()
+
+    with pytest.raises(AIResponseError) as error:
+        asyncio.run(manager.get_response("Gemini", "hello"))
+
+    assert error.value.reason == "provider_error"
+    assert str(error.value) == "Gemini 오류: 500 internal"
+
+
+def test_open_circuit_raises_without_calling_provider(manager):
+    breaker = CircuitBreaker("Gemini")
+    breaker._open()
+    manager.circuit_breakers["Gemini"] = breaker
+
+    with pytest.raises(AIResponseError) as error:
+        asyncio.run(manager.get_response("Gemini", "hello"))
+
+    assert error.value.reason == "circuit_open"
+    assert manager.gemini_client.aio.models.calls == []
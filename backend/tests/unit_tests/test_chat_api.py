@@ -0,0 +1,78 @@
+import json
+import uuid
+
+import pytest
+
+from ai_manager import AIResponseError
+
+
+@pytest.fixture
+def session_id():
+    return uuid.uuid4().hex
+
+
+@pytest.fixture
+def fake_streams(app_module, monkeypatch):
+    """GPT는 정상 응답, Claude는 청크 일부를 보낸 뒤 401로 실패"""
+
+    async def get_response_stream(ai_name, message, **kwargs):
+        if ai_name == "Claude":
+            yield "partial "
+            raise AIResponseError("Claude", "provider_error", "Claude 오류: 401 bad key")
+        yield "hello "
+        yield "there"
+
+    monkeypatch.setattr(app_module.ai_manager, "get_response_stream", get_response_stream)
+    monkeypatch.setattr(app_module, "select_ais", lambda mentioned: ["GPT", "Claude"])
+
+
+def read_events(response):
+    return [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: {")
+    ]
+
+
+@pytest.mark.parametrize("stream_mode", ["sequential", "multiplex"])
+def test_stream_error_is_sent_as_error_event_and_kept_out_of_history(
+    app_module, client, fake_streams, session_id, stream_mode
+):
+    response = client.post("/api/chat/stream", json={
+        "message": "안녕", "include_context": False, "session_id": session_id, "stream_mode": stream_mode
+    })
+
+    events = read_events(response)
+    errors = [e for e in events if e["type"] == "error"]
+    assert errors == [{"type": "error", "ai_name": "Claude", "message": "Claude 오류: 401 bad key"}]
+    assert not any(e["type"] == "chunk" and "오류" in e["text"] for e in events)
+
+    history = app_module.conversation_store.window(session_id, 10)
+    assert [(m["type"], m.get("ai_name"), m["message"]) for m in history] == [
+        ("user", None, "안녕"),
+        ("ai", "GPT", "hello there"),
+    ]
+
+
+def test_provider_error_is_flagged_and_kept_out_of_history(app_module, client, session_id, monkeypatch):
+    async def get_response(ai_name, message, **kwargs):
+        if ai_name == "GPT":
+            raise AIResponseError("GPT", "provider_error", "GPT 오류: 401 bad key")
+        return "반가워"
+
+    monkeypatch.setattr(app_module.ai_manager, "get_response", get_response)
+    monkeypatch.setattr(app_module, "select_ais", lambda mentioned: ["GPT", "Gemini"])
+
+    response = client.post("/api/chat", json={
+        "message": "안녕", "include_context": False, "session_id": session_id
+    })
+
+    gpt, gemini = response.json()["responses"]
+    assert (gpt["error"], gpt["response"]) == ("provider_error", "GPT 오류: 401 bad key")
+    assert "error" not in gemini
+
+    history = app_module.conversation_store.window(session_id, 10)
+    assert [(m["type"], m.get("ai_name"), m["message"]) for m in history] == [
+        ("user", None, "안녕"),
+        ("ai", "Gemini", "반가워"),
+    ]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from retry_policy import RetryPolicy
+
+
+def make_breaker():
+    breaker = CircuitBreaker("GPT")
+    breaker.slow_call_seconds = 0.01
+    breaker.min_calls = 3
+    return breaker
+
+
+def test_slow_successful_call_does_not_trip_breaker():
+    breaker = make_breaker()
+    policy = RetryPolicy()
+
+    async def long_answer():
+        # 긴 답변 생성: 전체 응답 시간이 느린 호출 기준을 넘음
+        await asyncio.sleep(0.03)
+        return "long answer"
+
+    async def run():
+        return [await policy.call("GPT", long_answer, breaker=breaker) for _ in range(5)]
+
+    assert asyncio.run(run()) == ["long answer"] * 5
+    assert breaker.state == CLOSED
+    assert breaker.error_rate() == 0.0
+
+
+def test_slow_first_token_trips_breaker():
+    breaker = make_breaker()
+    policy = RetryPolicy()
+
+    async def slow_stream():
+        await asyncio.sleep(0.03)
+        yield "chunk"
+
+    async def run():
+        for _ in range(3):
+            async for _ in policy.stream("GPT", slow_stream, breaker=breaker):
+                pass
+
+    asyncio.run(run())
+
+    assert breaker.state == OPEN
+
+
+def open_breaker():
+    breaker = make_breaker()
+    breaker.open_seconds = breaker._current_open_seconds = 0.05
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_half_open_lets_one_real_request_through():
+    breaker = open_breaker()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    # 시험 요청 결과가 나오기 전에는 다른 요청은 거절
+    assert not breaker.allow_request()
+    breaker.record_success(0.001)
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens_with_longer_wait():
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.retry_in() > 0.05
+
+
+def test_trial_through_retry_policy_closes_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    async def answer():
+        return "ok"
+
+    assert asyncio.run(RetryPolicy().call("GPT", answer, breaker=breaker)) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_very_slow_full_response_counts_as_failure():
+    breaker = make_breaker()
+    breaker.slow_response_seconds = 0.01
+    policy = RetryPolicy()
+
+    async def stuck_answer():
+        await asyncio.sleep(0.03)
+        return "late"
+
+    async def run():
+        for _ in range(3):
+            await policy.call("GPT", stuck_answer, breaker=breaker)
+
+    asyncio.run(run())
+
+    assert breaker.state == OPEN
@@ -0,0 +1,116 @@
+import asyncio
+
+from conversation_store import ConversationStore
+from conversation_summarizer import ConversationSummarizer
+from history_persistence import HistoryPersistence
+
+
+class FakeAIManager:
+    """최근 keep개 메시지만 프롬프트에 남기고, 요약 호출은 기록만 함"""
+
+    def __init__(self, keep: int = 2):
+        self.keep = keep
+        self.summarize_calls = []
+
+    def build_history(self, window, session_id=None, summary=None):
+        if len(window) <= self.keep:
+            return "", None
+        return "", window[-self.keep]["id"]
+
+    async def summarize(self, text, max_tokens=None):
+        self.summarize_calls.append(text)
+        return f"LLM 요약 {len(self.summarize_calls)}"
+
+
+def make_summarizer(ai_manager, persistence=None, min_messages=4):
+    store = ConversationStore(persistence=persistence)
+    summarizer = ConversationSummarizer(ai_manager, store, window_size=50, persistence=persistence)
+    summarizer.min_messages = min_messages
+    return store, summarizer
+
+
+async def add_turn(store, summarizer, session_id, text):
+    store.append(session_id, {"type": "user", "message": text})
+    summarizer.schedule(session_id)
+    await asyncio.gather(*summarizer._tasks.values())
+
+
+def test_evicted_turns_are_summarized_below_min_messages():
+    ai_manager = FakeAIManager(keep=2)
+    store, summarizer = make_summarizer(ai_manager)
+
+    async def run():
+        for i in range(3):
+            await add_turn(store, summarizer, "s1", f"질문 {i}.")
+
+    asyncio.run(run())
+
+    # 프롬프트에서 빠진 메시지(질문 0)는 min_messages 미만이어도 요약에 들어감
+    assert "질문 0." in summarizer.get_summary("s1")
+    assert ai_manager.summarize_calls == []
+
+
+def test_llm_summary_runs_once_enough_messages_have_aged():
+    ai_manager = FakeAIManager(keep=2)
+    store, summarizer = make_summarizer(ai_manager, min_messages=3)
+
+    async def run():
+        for i in range(6):
+            await add_turn(store, summarizer, "s1", f"질문 {i}.")
+
+    asyncio.run(run())
+
+    # 질문 0, 1은 추출 요약으로 바로 반영되고, 질문 2가 밀려날 때 LLM이 한 번에 다시 요약
+    assert len(ai_manager.summarize_calls) == 1
+    assert "질문 1." in ai_manager.summarize_calls[0]
+    assert summarizer.get_summary("s1").startswith("LLM 요약 1")
+
+
+def test_summary_is_persisted_and_restored_after_restart(tmp_path):
+    db_path = tmp_path / "chat.db"
+    persistence = HistoryPersistence(db_path=str(db_path))
+    persistence.start()
+    store, summarizer = make_summarizer(FakeAIManager(keep=2), persistence)
+
+    async def first_run():
+        for i in range(4):
+            await add_turn(store, summarizer, "s1", f"질문 {i}.")
+
+    asyncio.run(first_run())
+    before_restart = summarizer.get_summary("s1")
+    covered_id = summarizer._summaries["s1"].covered_id
+    persistence.close()
+
+    # 재시작: 새 저장소/요약기가 DB에서 요약을 이어받아 다시 요약하지 않음
+    persistence = HistoryPersistence(db_path=str(db_path))
+    persistence.start()
+    ai_manager = FakeAIManager(keep=2)
+    store, summarizer = make_summarizer(ai_manager, persistence)
+
+    async def second_run():
+        await store.ensure_loaded("s1")
+        await summarizer.ensure_loaded("s1")
+        summarizer.schedule("s1")
+        return list(summarizer._tasks.values())
+
+    try:
+        pending = asyncio.run(second_run())
+    finally:
+        persistence.close()
+
+    assert summarizer.get_summary("s1") == before_restart
+    assert summarizer._summaries["s1"].covered_id == covered_id
+    assert pending == []
+
+
+def test_clearing_history_deletes_persisted_summary(tmp_path):
+    persistence = HistoryPersistence(db_path=str(tmp_path / "chat.db"))
+    persistence.start()
+    try:
+        persistence.enqueue_summary("s1", "요약", 42)
+        assert persistence.load_summary("s1") == ("요약", 42)
+
+        persistence.enqueue_clear("s1")
+        assert persistence.load_summary("s1") is None
+    finally:
+        persistence.close()
@@ -0,0 +1,17 @@
+import pytest
+
+from deadline import MAX_REQUEST_DEADLINE, MIN_REQUEST_DEADLINE, REQUEST_DEADLINE, Deadline
+
+
+@pytest.mark.parametrize("value", [None, "", "abc", "nan", "NaN", "inf", "-inf"])
+def test_invalid_header_falls_back_to_default(value):
+    deadline = Deadline.from_header(value)
+
+    assert deadline.budget == REQUEST_DEADLINE
+    assert not deadline.expired()
+
+
+def test_header_is_clamped_to_allowed_range():
+    assert Deadline.from_header("0").budget == MIN_REQUEST_DEADLINE
+    assert Deadline.from_header("1e9").budget == MAX_REQUEST_DEADLINE
+    assert Deadline.from_header("5").budget == 5.0
@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from deadline import Deadline
+from file_search_manager import FileSearchManager
+
+
+class FailingSyncAPI:
+    """동기 API가 호출되면 테스트 실패"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        raise AssertionError(f"sync Gemini API used: {self.prefix}.{name}")
+
+
+class FakeAsyncModels:
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+        self.config = None
+
+    async def generate_content(self, *, model, contents, config=None):
+        self.config = config
+        self.started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class FakeAsyncDocuments:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete(self, *, name, config=None):
+        self.deleted.append((name, config))
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    manager = FileSearchManager()
+    manager.client = SimpleNamespace(
+        aio=SimpleNamespace(
+            models=FakeAsyncModels(),
+            file_search_stores=SimpleNamespace(documents=FakeAsyncDocuments()),
+        ),
+        models=FailingSyncAPI("models"),
+        files=FailingSyncAPI("files"),
+        file_search_stores=FailingSyncAPI("file_search_stores"),
+    )
+    manager._initialized = True
+    manager.store_name = "fileSearchStores/test"
+    return manager
+
+
+def test_cancelling_search_cancels_the_request(manager):
+    models = manager.client.aio.models
+
+    async def run():
+        task = asyncio.create_task(manager._search_context("연차 규정?", ("연차 규정?", 0, 5), [], 5))
+        await models.started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert models.cancelled
+
+
+def test_delete_uses_async_document_api(manager):
+    manager.metadata["uploaded_files"] = [
+        {"name": "fileSearchStores/test/documents/a", "display_name": "a.txt"},
+        {"name": "fileSearchStores/test/documents/b", "display_name": "b.txt"},
+    ]
+
+    asyncio.run(manager.delete_document("fileSearchStores/test/documents/a"))
+    result = asyncio.run(manager.clear_all_documents())
+
+    assert result["deleted_count"] == 1
+    assert manager.client.aio.file_search_stores.documents.deleted == [
+        ("fileSearchStores/test/documents/a", {"force": True}),
+        ("fileSearchStores/test/documents/b", {"force": True}),
+    ]
+
+
+def test_request_deadline_cancels_search(manager):
+    manager.metadata["uploaded_files"] = [{"name": "fileSearchStores/test/documents/a", "display_name": "규정.pdf"}]
+    models = manager.client.aio.models
+
+    async def run():
+        result = await manager.get_context("문서에서 연차 규정 찾아줘", deadline=Deadline(0.1))
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) is None
+    assert models.cancelled
+    # 검색 요청에도 RAG 몫의 HTTP 타임아웃 적용
+    assert 0 < models.config.http_options.timeout <= 100
+    assert manager.timeouts == 1
+    assert manager._inflight == {} and manager._inflight_waiters == {}
@@ -0,0 +1,103 @@
+import uuid
+
+import pytest
+
+from conversation_store import ConversationStore
+from history_persistence import HistoryPersistence
+
+
+def new_session():
+    return uuid.uuid4().hex
+
+
+def add_messages(store, session_id, count):
+    return [
+        store.append(session_id, {"type": "user", "message": f"메시지 {i}"})["id"]
+        for i in range(count)
+    ]
+
+
+def test_etag_returns_304_until_session_changes(app_module, client):
+    session_id = new_session()
+    add_messages(app_module.conversation_store, session_id, 2)
+
+    first = client.get("/api/history", params={"session_id": session_id})
+    etag = first.headers["ETag"]
+    cached = client.get(
+        "/api/history", params={"session_id": session_id}, headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+
+    add_messages(app_module.conversation_store, session_id, 1)
+    changed = client.get(
+        "/api/history", params={"session_id": session_id}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.json()["count"] == 3
+
+
+def test_etag_differs_between_sessions(client):
+    # 빈 세션은 버전이 같으므로 세션 ID가 없으면 ETag가 겹침
+    a = client.get("/api/history", params={"session_id": new_session()})
+    b = client.get(
+        "/api/history",
+        params={"session_id": new_session()},
+        headers={"If-None-Match": a.headers["ETag"]}
+    )
+    assert b.status_code == 200
+    assert a.headers["ETag"] != b.headers["ETag"]
+
+
+@pytest.fixture
+def small_store(app_module, monkeypatch, tmp_path):
+    """세션당 3개만 메모리에 두고 나머지는 SQLite에 있는 저장소"""
+    persistence = HistoryPersistence(db_path=str(tmp_path / "chat.db"))
+    persistence.start()
+    store = ConversationStore(max_messages_per_session=3, persistence=persistence)
+    monkeypatch.setattr(app_module, "history_persistence", persistence)
+    monkeypatch.setattr(app_module, "conversation_store", store)
+    yield store
+    persistence.close()
+
+
+def test_since_cursor_outside_window_returns_410(client, small_store):
+    session_id = new_session()
+    ids = add_messages(small_store, session_id, 6)
+
+    expired = client.get("/api/history", params={"session_id": session_id, "since": ids[0]})
+    assert expired.status_code == 410
+
+    # 창 안쪽 커서는 그대로 동작
+    fresh = client.get("/api/history", params={"session_id": session_id, "since": ids[2]})
+    assert [m["id"] for m in fresh.json()["history"]] == ids[3:]
+
+
+def test_before_pages_past_memory_window_from_db(client, small_store):
+    session_id = new_session()
+    ids = add_messages(small_store, session_id, 7)
+
+    page = client.get("/api/history", params={"session_id": session_id, "limit": 3}).json()
+    assert [m["id"] for m in page["history"]] == ids[4:]
+    assert page["has_more"] is True
+
+    seen = [m["id"] for m in page["history"]]
+    while page["has_more"]:
+        page = client.get(
+            "/api/history",
+            params={"session_id": session_id, "before": page["next_cursor"], "limit": 3}
+        ).json()
+        seen = [m["id"] for m in page["history"]] + seen
+
+    assert seen == ids
+
+
+def test_restored_session_knows_older_messages_exist(client, small_store):
+    session_id = new_session()
+    ids = add_messages(small_store, session_id, 5)
+    small_store.sessions.pop(session_id)
+    small_store.persistence.flush()
+
+    page = client.get(
+        "/api/history", params={"session_id": session_id, "since": ids[0]}
+    )
+    assert page.status_code == 410
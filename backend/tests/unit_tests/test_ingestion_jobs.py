@@ -0,0 +1,38 @@
+import asyncio
+
+from ingestion_jobs import COMPLETED, IngestionQueue
+
+
+class SlowFileSearch:
+    """인덱싱에 시간이 걸리는 FileSearchManager 대역"""
+
+    def find_by_hash(self, sha256):
+        return None
+
+    async def upload_file(self, file_path, display_name, **kwargs):
+        await asyncio.sleep(0.05)
+        return {"display_name": display_name}
+
+
+def test_waiter_sees_terminal_state_even_with_no_history(tmp_path):
+    queue = IngestionQueue(SlowFileSearch(), data_dir=tmp_path, workers=2)
+    queue.history_limit = 0
+
+    async def run():
+        await queue.start()
+        try:
+            jobs = []
+            for index in range(3):
+                path = queue.upload_dir / f"{index}.txt"
+                path.write_text("hello")
+                jobs.append(await queue.submit(str(path), f"{index}.txt", sha256=str(index), file_size=5))
+            return await asyncio.gather(*(queue.wait(job["id"]) for job in jobs))
+        finally:
+            await queue.stop()
+
+    results = asyncio.run(run())
+
+    assert [job["status"] for job in results] == [COMPLETED] * 3
+    # 구독이 끝난 작업은 다음 정리 때 삭제됨
+    queue._prune()
+    assert queue.jobs == {}
@@ -0,0 +1,52 @@
+from collections import Counter
+
+from persona_selection import PersonaSelector, ProviderHealth
+
+AIS = ["GPT", "Claude", "Gemini"]
+
+
+def test_same_seed_gives_same_selection():
+    health = ProviderHealth()
+    first = PersonaSelector(health, policy="latency", seed=42)
+    second = PersonaSelector(health, policy="latency", seed=42)
+
+    assert [first.select(AIS) for _ in range(50)] == [second.select(AIS) for _ in range(50)]
+
+
+def test_latency_policy_favors_fast_healthy_provider():
+    health = ProviderHealth()
+    for _ in range(5):
+        health.record_success("GPT", 0.3)
+        health.record_success("Claude", 3.0)
+        health.record_failure("Gemini")
+    selector = PersonaSelector(health, policy="latency", seed=7)
+
+    first_picks = Counter(selector.select(AIS)[0] for _ in range(2000))
+
+    assert first_picks["GPT"] > first_picks["Claude"] > first_picks["Gemini"]
+    # exploration 비율만큼은 모든 페르소나가 계속 선택됨
+    assert first_picks["Gemini"] > 0
+
+
+def test_uniform_policy_keeps_previous_behavior():
+    selector = PersonaSelector(ProviderHealth(), policy="uniform", seed=1)
+
+    for _ in range(20):
+        selected = selector.select(AIS)
+        assert 1 <= len(selected) <= len(AIS)
+        assert len(set(selected)) == len(selected)
+
+
+def test_full_response_time_does_not_skew_ttft_ranking():
+    health = ProviderHealth()
+    for _ in range(5):
+        # GPT는 첫 토큰이 빠르지만 긴 답변의 전체 응답 시간이 김
+        health.record_success("GPT", 0.2)
+        health.record_success("GPT", 20.0, first_token=False)
+        health.record_success("Claude", 2.0)
+    selector = PersonaSelector(health, policy="latency", seed=3)
+
+    weights = selector.policy.weights(["GPT", "Claude"])
+
+    assert weights["GPT"] > weights["Claude"]
+    assert health.stats()["GPT"]["ttft_ewma"] < 1.0
@@ -0,0 +1,27 @@
+from prompt_builder import PromptParts, build_prompt
+
+
+def test_claude_messages_have_no_cache_breakpoints():
+    prompt = build_prompt(
+        "Claude", "연차는?", "<이전 대화>\nUser: 안녕\n</이전 대화>",
+        {"searched_context": "연차 규정"}
+    )
+
+    blocks = prompt.anthropic_messages()[0]["content"]
+
+    assert [b["text"] for b in blocks] == [prompt.document_context, prompt.history, prompt.question]
+    assert not any("cache_control" in b for b in blocks)
+
+
+def test_short_system_prefix_is_not_marked_for_caching():
+    prompt = build_prompt("Claude", "안녕")
+
+    assert "cache_control" not in prompt.anthropic_system("claude-sonnet-4-5")[0]
+
+
+def test_long_system_prefix_is_cached_above_model_minimum():
+    prompt = PromptParts(system="가" * 1500, question="사용자 질문: 안녕")
+
+    assert prompt.anthropic_system("claude-sonnet-4-5")[0]["cache_control"] == {"type": "ephemeral"}
+    # Haiku는 최소 2048 토큰
+    assert "cache_control" not in prompt.anthropic_system("claude-3-5-haiku-latest")[0]
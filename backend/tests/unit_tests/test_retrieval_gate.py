@@ -0,0 +1,35 @@
+from retrieval_gate import RetrievalGate
+
+SEARCH_RESULT = """## 연차 휴가 규정
+입사 1년 미만 직원은 매월 1일의 연차가 발생합니다. 연차는 다음 해로 이월할 수 없습니다.
+**병가 신청** 절차는 인사팀에 문의하세요. 연차 사용은 팀장 승인이 필요합니다.
+"""
+
+
+def test_keyword_match_respects_word_boundaries():
+    gate = RetrievalGate()
+
+    assert gate.evaluate("update my profile picture", [])[1] != "keyword:file"
+    assert gate.evaluate("홈페이지 디자인 예쁘다", [])[1] != "keyword:페이지"
+    assert gate.evaluate("업로드한 files 보여줘", []) == (True, "keyword:업로드")
+    assert gate.evaluate("summarize the uploaded files", []) == (True, "keyword:file")
+
+
+def test_learns_only_salient_terms():
+    gate = RetrievalGate()
+    gate.learn(SEARCH_RESULT)
+
+    assert {"연차", "휴가", "규정", "병가", "신청"} <= set(gate.learned_terms)
+    # 한 번만 나온 일반 용어나 불용어는 학습하지 않음
+    assert "직원" not in gate.learned_terms
+    assert "다음" not in gate.learned_terms
+    assert gate.evaluate("병가 쓰려면 어디에 말해야 해", [])[1].startswith("term_overlap")
+
+
+def test_terms_common_to_most_results_are_ignored():
+    gate = RetrievalGate()
+    for index in range(4):
+        gate.learn(f"## 회사 안내 {index}\n회사 회사 주제{index} 주제{index}")
+
+    assert not gate.evaluate("우리 회사 좋다", [])[0]
+    assert gate.evaluate("주제1 어때", [])[1].startswith("term_overlap")
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded
+from retry_policy import RetryPolicy
+
+
+def test_total_deadline_caps_hung_call_without_explicit_deadline():
+    policy = RetryPolicy(total_timeout=0.1)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(policy.call("GPT", hang))
+    assert time.monotonic() - started < 1
+
+
+def test_total_deadline_caps_stream_until_first_chunk():
+    policy = RetryPolicy(total_timeout=0.1)
+
+    async def hung_stream():
+        await asyncio.sleep(10)
+        yield "never"
+
+    async def run():
+        return [chunk async for chunk in policy.stream("GPT", hung_stream)]
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert time.monotonic() - started < 1
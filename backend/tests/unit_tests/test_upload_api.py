@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+from resumable_uploads import ResumableUploadStore
+
+
+class FakeFileSearch:
+    """인덱싱 대역 - known 해시는 이미 올라간 문서로 취급"""
+
+    def __init__(self):
+        self.known = set()
+        self.data_dir = None
+
+    def find_by_hash(self, sha256):
+        return {"display_name": "existing"} if sha256 in self.known else None
+
+    async def upload_file(self, file_path, display_name, sha256=None, **kwargs):
+        if sha256 in self.known:
+            return {"display_name": display_name, "duplicate": True}
+        await asyncio.sleep(0.01)
+        self.known.add(sha256)
+        return {"display_name": display_name}
+
+
+@pytest.fixture
+def file_search(app_module, monkeypatch):
+    fake = FakeFileSearch()
+    monkeypatch.setattr(app_module.ingestion_queue, "file_search_manager", fake)
+    # 끝난 작업을 바로 정리해도 결과가 빠지지 않아야 함
+    monkeypatch.setattr(app_module.ingestion_queue, "history_limit", 0)
+    return fake
+
+
+def leftover_files(app_module):
+    return [p.name for p in app_module.ingestion_queue.upload_dir.iterdir() if p.is_file()]
+
+
+def zip_bytes(entries, corrupt=None, encrypted=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    data = bytearray(buffer.getvalue())
+    if corrupt:
+        # 내용 바이트를 바꿔서 CRC 오류 유발
+        start = data.find(entries[corrupt])
+        data[start:start + len(entries[corrupt])] = entries[corrupt].upper()
+    if encrypted:
+        # zipfile은 쓸 때 암호화 플래그를 지우므로 로컬 헤더/중앙 디렉터리의 플래그 비트를 직접 설정
+        name = encrypted.encode()
+        for signature, flag_offset, name_offset in ((b"PK\x03\x04", 6, 30), (b"PK\x01\x02", 8, 46)):
+            index = data.find(signature)
+            while index != -1:
+                if data[index + name_offset:index + name_offset + len(name)] == name:
+                    data[index + flag_offset] |= 0x1
+                index = data.find(signature, index + 1)
+    return bytes(data)
+
+
+def post_batch(client, files):
+    response = client.post("/api/upload/batch", files=[("files", f) for f in files])
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_skips_broken_zip_members_and_cleans_up(app_module, client, file_search):
+    archive = zip_bytes(
+        {"good.txt": b"good document", "bad.txt": b"corrupted member", "secret.txt": b"encrypted member"},
+        corrupt="bad.txt",
+        encrypted="secret.txt"
+    )
+
+    events = post_batch(client, [("docs.zip", archive, "application/zip")])
+
+    rejected = {e["filename"]: e["error"] for e in events if e["type"] == "rejected"}
+    assert set(rejected) == {"docs.zip/bad.txt", "docs.zip/secret.txt"}
+    assert [e["filename"] for e in events if e["type"] == "accepted"] == ["good.txt"]
+    assert events[-1]["completed"] == 1
+    assert leftover_files(app_module) == []
+
+
+def test_batch_rejects_invalid_zip_without_500(app_module, client, file_search):
+    events = post_batch(client, [("broken.zip", b"not a zip", "application/zip")])
+
+    assert events[0] == {"type": "rejected", "filename": "broken.zip", "error": "올바른 zip 파일이 아님"}
+    assert events[-1]["total"] == 0
+    assert leftover_files(app_module) == []
+
+
+def test_batch_reports_inline_duplicates(app_module, client, file_search):
+    file_search.known.add(hashlib.sha256(b"already indexed").hexdigest())
+
+    events = post_batch(client, [
+        ("old.txt", b"already indexed", "text/plain"),
+        ("new.txt", b"brand new", "text/plain"),
+    ])
+
+    results = {e["filename"]: e for e in events if e["type"] == "result"}
+    assert set(results) == {"old.txt", "new.txt"}
+    assert results["old.txt"]["result"]["duplicate"]
+    summary = events[-1]
+    assert (summary["total"], summary["completed"], summary["duplicates"]) == (2, 2, 1)
+    assert app_module.ingestion_queue._watchers == {}
+
+
+def test_batch_cleans_up_when_submit_fails(app_module, client, file_search, monkeypatch):
+    async def broken_submit(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app_module.ingestion_queue, "submit", broken_submit)
+
+    events = post_batch(client, [("a.txt", b"hello", "text/plain")])
+
+    assert events[0]["type"] == "rejected"
+    assert "disk full" in events[0]["error"]
+    assert leftover_files(app_module) == []
+
+
+def b64(value):
+    return base64.b64encode(value.encode()).decode()
+
+
+def create_resumable(client, data, sha256=None):
+    metadata = f"filename {b64('notes.txt')},sha256 {b64(sha256 or hashlib.sha256(data).hexdigest())}"
+    response = client.post(
+        "/api/upload/resumable",
+        headers={"Upload-Length": str(len(data)), "Upload-Metadata": metadata}
+    )
+    assert response.status_code == 201
+    return response.json()["upload_id"]
+
+
+def patch_resumable(client, upload_id, offset, chunk):
+    return client.patch(
+        f"/api/upload/resumable/{upload_id}",
+        content=chunk,
+        headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"}
+    )
+
+
+def test_resumable_upload_finalize_submits_job_and_releases_lock(app_module, client, file_search):
+    data = b"resumable document body"
+    upload_id = create_resumable(client, data)
+
+    assert patch_resumable(client, upload_id, 0, data[:10]).status_code == 204
+    assert client.head(f"/api/upload/resumable/{upload_id}").headers["Upload-Offset"] == "10"
+    assert patch_resumable(client, upload_id, 10, data[10:]).status_code == 204
+
+    response = client.post(f"/api/upload/resumable/{upload_id}/finalize")
+
+    assert response.status_code == 202
+    assert response.json()["filename"] == "notes.txt"
+    assert client.head(f"/api/upload/resumable/{upload_id}").status_code == 404
+    assert app_module.resumable_uploads._active == set()
+
+
+def test_resumable_finalize_rejects_checksum_mismatch(app_module, client, file_search):
+    data = b"tampered body"
+    upload_id = create_resumable(client, data, sha256=hashlib.sha256(b"original").hexdigest())
+    patch_resumable(client, upload_id, 0, data)
+
+    response = client.post(f"/api/upload/resumable/{upload_id}/finalize")
+
+    assert response.status_code == 422
+    assert client.head(f"/api/upload/resumable/{upload_id}").status_code == 404
+    assert app_module.resumable_uploads._active == set()
+
+
+def test_resumable_lock_is_per_request_and_not_retained(tmp_path):
+    store = ResumableUploadStore(tmp_path, ttl=60)
+    info = store.create(4, {"filename": "a.txt", "sha256": hashlib.sha256(b"abcd").hexdigest()})
+
+    async def chunks():
+        yield b"ab"
+        # 전송 도중 같은 업로드에 대한 다른 요청은 기다리지 않고 409
+        with pytest.raises(HTTPException) as error:
+            await store.finalize(info["id"], tmp_path)
+        assert error.value.status_code == 409
+        yield b"cd"
+
+    asyncio.run(store.append(info["id"], 0, chunks()))
+    assert store._active == set()
+
+    done = tmp_path / "done"
+    done.mkdir()
+    _, path, size = asyncio.run(store.finalize(info["id"], done))
+    assert size == 4 and open(path, "rb").read() == b"abcd"
+    assert store._active == set()
+
+    # 만료된 업로드는 정리되고 잠금 상태도 남지 않음
+    expired = store.create(4, {"filename": "b.txt", "sha256": hashlib.sha256(b"abcd").hexdigest()})
+    store.ttl = -1
+    asyncio.run(store.append(expired["id"], 0, chunks_of(b"ab")))
+    assert store.sweep() == 1
+    assert store._active == set()
+    assert [p.name for p in tmp_path.iterdir()] == ["done"]
+
+
+async def chunks_of(data):
+    yield data
+
+
+def test_raw_upload_streams_body_to_job(client, file_search):
+    data = b"raw body document"
+    response = client.post(
+        "/api/upload/raw",
+        params={"filename": "raw.txt"},
+        content=data,
+        headers={"Content-Type": "application/octet-stream"}
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["filename"] == "raw.txt"
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_raw_upload_over_limit_leaves_no_file(app_module, client, file_search, monkeypatch):
+    from upload_utils import save_stream
+
+    async def small_limit(chunks, **kwargs):
+        return await save_stream(chunks, **{**kwargs, "max_bytes": 4})
+
+    monkeypatch.setattr(app_module, "save_stream", small_limit)
+
+    response = client.post("/api/upload/raw", params={"filename": "big.txt"}, content=b"too large")
+
+    assert response.status_code == 413
+    assert leftover_files(app_module) == []
@@ -0,0 +1,30 @@
+"""
+Token Utils - 로컬 토큰 수 추정
+토크나이저 없이 빠르게 근사 (ASCII는 약 4자당 1토큰, 한글 등 비ASCII는 1자당 1토큰)
+"""
+
+from typing import Optional
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """텍스트 토큰 수 추정 (보수적으로 약간 크게 계산)"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    non_ascii_chars = len(text) - ascii_chars
+    return (ascii_chars + 3) // 4 + non_ascii_chars
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """추정 토큰 수가 max_tokens 이하가 되도록 뒤를 자름"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 비ASCII 기준(1자=1토큰)으로 자르면 항상 예산 이하
+    low, high = max_tokens, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
@@ -0,0 +1,276 @@
+"""
+Upload Utils - 업로드 파일을 고정 크기 청크로 디스크에 스트리밍 저장
+청크를 쓰는 동안 SHA-256을 함께 계산하고, 크기 제한을 넘는 순간 중단
+업로드당 메모리는 청크 버퍼 하나로 제한됨
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+# 업로드 파일 최대 크기 (바이트, 기본 100MB)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# 한 번에 읽고 쓰는 청크 크기 (바이트, 기본 1MB)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# 여러 파일 업로드 요청 전체의 최대 크기 (바이트, 기본 500MB)
+UPLOAD_BATCH_MAX_BYTES = int(os.getenv("UPLOAD_BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+# zip 압축 해제 제한 (파일 수, 해제 후 전체 크기)
+UPLOAD_ZIP_MAX_FILES = int(os.getenv("UPLOAD_ZIP_MAX_FILES", "200"))
+UPLOAD_ZIP_MAX_BYTES = int(os.getenv("UPLOAD_ZIP_MAX_BYTES", str(1024 * 1024 * 1024)))
+# multipart 경계/헤더/폼 필드용 여유분 (요청 본문 크기 검사에 사용)
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.txt', '.json', '.png', '.jpg', '.jpeg'}
+
+
+def size_limit_message(max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    return f"파일 크기는 {max_bytes // (1024 * 1024)}MB 이하여야 합니다"
+
+
+@dataclass
+class StoredUpload:
+    """디스크에 저장된 업로드 파일"""
+
+    path: str
+    size: int
+    sha256: str
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_upload(
+    upload: UploadFile,
+    suffix: str = "",
+    directory: Optional[str] = None,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    UploadFile을 청크 단위로 임시 파일(directory 안, 기본은 시스템 임시 폴더)에 저장하면서 SHA-256 계산
+    max_bytes를 넘으면 그 자리에서 중단하고 413 (부분 파일은 삭제)
+    multipart 본문은 Starlette가 핸들러 실행 전에 이미 SpooledTemporaryFile로 받아 두므로
+    여기서 한 번 더 복사됨 (복사 없이 받으려면 save_stream + request.stream() 사용)
+    """
+    async def chunks() -> AsyncIterator[bytes]:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    return await save_stream(chunks(), suffix=suffix, directory=directory, max_bytes=max_bytes)
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    suffix: str = "",
+    directory: Optional[str] = None,
+    max_bytes: int = UPLOAD_MAX_BYTES
+) -> StoredUpload:
+    """
+    바이트 청크 스트림(예: request.stream())을 임시 파일에 저장하면서 SHA-256 계산
+    요청 본문을 받는 대로 바로 쓰므로 디스크 기록은 한 번뿐
+    max_bytes를 넘으면 그 자리에서 중단하고 413 (부분 파일은 삭제)
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(413, size_limit_message(max_bytes))
+            digest.update(chunk)
+            # 디스크 쓰기는 이벤트 루프를 막지 않도록 스레드에서
+            await loop.run_in_executor(None, tmp.write, chunk)
+        tmp.close()
+    except BaseException:
+        tmp.close()
+        os.unlink(tmp.name)
+        raise
+
+    return StoredUpload(path=tmp.name, size=size, sha256=digest.hexdigest())
+
+
+def extract_zip(
+    archive_path: str,
+    directory: str,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[List[Tuple[str, StoredUpload]], List[Tuple[str, str]]]:
+    """
+    zip 안의 지원 형식 파일을 directory에 풀면서 SHA-256 계산 (동기 함수, 스레드에서 실행)
+    헤더의 크기 정보는 믿지 않고 실제로 푼 바이트 수로 제한 검사 (zip이 아니면 ValueError)
+    손상(CRC 오류)/암호화/지원하지 않는 압축 방식의 항목은 건너뛰고,
+    예외로 중단되면 그때까지 푼 파일을 모두 삭제
+
+    Returns:
+        (저장된 파일 [(이름, StoredUpload)], 건너뛴 항목 [(이름, 이유)])
+    """
+    stored: List[Tuple[str, StoredUpload]] = []
+    skipped: List[Tuple[str, str]] = []
+
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile:
+        raise ValueError("올바른 zip 파일이 아님")
+
+    try:
+        with archive:
+            _extract_members(archive, directory, max_bytes, chunk_size, stored, skipped)
+    except BaseException:
+        for _, item in stored:
+            item.remove()
+        raise
+    return stored, skipped
+
+
+def _extract_members(
+    archive: zipfile.ZipFile,
+    directory: str,
+    max_bytes: int,
+    chunk_size: int,
+    stored: List[Tuple[str, StoredUpload]],
+    skipped: List[Tuple[str, str]]
+):
+    """extract_zip의 항목별 압축 해제 (결과는 stored/skipped에 추가)"""
+    total = 0
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or info.filename.startswith("__MACOSX/") or name.startswith("."):
+            continue
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            skipped.append((info.filename, f"지원하지 않는 파일 형식: {ext}"))
+            continue
+        if len(stored) >= UPLOAD_ZIP_MAX_FILES:
+            skipped.append((info.filename, f"zip 파일 수 제한 초과 ({UPLOAD_ZIP_MAX_FILES}개)"))
+            continue
+        if info.flag_bits & 0x1:
+            skipped.append((info.filename, "암호화된 항목은 지원하지 않음"))
+            continue
+
+        digest = hashlib.sha256()
+        size = 0
+        reason = None
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=ext, dir=directory)
+        try:
+            with tmp, archive.open(info) as source:
+                for chunk in iter(lambda: source.read(chunk_size), b""):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        reason = size_limit_message(max_bytes)
+                        break
+                    if total + size > UPLOAD_ZIP_MAX_BYTES:
+                        reason = "zip 압축 해제 크기 제한 초과"
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+        except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+            reason = f"손상된 항목: {e}"
+        except (RuntimeError, NotImplementedError) as e:
+            # 암호가 필요한 항목, 지원하지 않는 압축 방식
+            reason = f"압축을 풀 수 없는 항목: {e}"
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+        if reason:
+            os.unlink(tmp.name)
+            skipped.append((info.filename, reason))
+            continue
+        total += size
+        stored.append((name, StoredUpload(path=tmp.name, size=size, sha256=digest.hexdigest())))
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+# 경로 접두사별 요청 본문 제한 (앞에서부터 처음 맞는 항목 적용)
+UPLOAD_PATH_LIMITS = (
+    ("/api/upload/batch", UPLOAD_BATCH_MAX_BYTES),
+    ("/api/upload", UPLOAD_MAX_BYTES),
+)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    업로드 경로의 요청 본문 크기 제한 (ASGI 미들웨어)
+    Content-Length가 제한을 넘으면 본문을 받기 전에 413,
+    chunked 전송이면 받은 바이트를 세다가 제한을 넘는 순간 413
+    (multipart 파싱이 끝난 뒤가 아니라 수신 도중에 끊음)
+    """
+
+    def __init__(self, app, limits: Sequence[Tuple[str, int]] = UPLOAD_PATH_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for prefix, max_bytes in self.limits:
+            if path.startswith(prefix):
+                return max_bytes
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        max_body = limit + UPLOAD_FORM_OVERHEAD
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body:
+            await self._reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # 본문 파싱 오류로 바뀐 앱 응답(400 등)은 버리고 413으로 대신 응답
+            if not too_large:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if too_large:
+            await self._reject(scope, receive, send, limit)
+
+    async def _reject(self, scope, receive, send, limit: int):
+        print(f"🚫 업로드 크기 제한 초과: {scope['path']}")
+        response = JSONResponse(
+            {"detail": size_limit_message(limit)},
+            status_code=413,
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
@@ -65,10 +65,21 @@ function App() {
         const formData = new FormData()
         formData.append('file', fileToUpload)
 
-        await axios.post(`${API_BASE_URL}/api/upload`, formData, {
+        const uploadResponse = await axios.post(`${API_BASE_URL}/api/upload`, formData, {
           headers: { 'Content-Type': 'multipart/form-data' }
         })
 
+        // 인덱싱은 백그라운드 작업 - 완료될 때까지 상태 확인
+        let job = uploadResponse.data
+        while (job.status === 'queued' || job.status === 'processing') {
+          setUploadProgress(job.status === 'queued' ? '인덱싱 대기 중...' : '문서 인덱싱 중...')
+          await new Promise(resolve => setTimeout(resolve, 1000))
+          job = (await axios.get(`${API_BASE_URL}/api/upload/jobs/${job.job_id ?? job.id}`)).data
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error || '인덱싱 실패')
+        }
+
         setMessages(prev => [...prev, {
           type: 'system',
           content: `📎 파일 업로드 완료: ${fileToUpload.name}`,